@@ -8,8 +8,9 @@ from werkzeug.exceptions import RequestEntityTooLarge
 from routes.main import main_bp
 from routes.api import api_bp
 
-# Importar las utilidades de ayuda
-from utils.web_helpers import register_template_filters
+# Importar las utilidades de ayuda y el contenedor de servicios compartidos
+from services.container import ServiceContainer, init_services
+from utils.web_helpers import register_compression, register_template_filters
 
 # Configurar el logging
 logging.basicConfig(
@@ -21,40 +22,22 @@ logging.basicConfig(
     ]
 )
 
-# Inicializar la aplicación Flask
-app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
-app.config['DEBUG'] = os.environ.get('FLASK_ENV', '') == 'development'
-
-# Registrar los Blueprints
-app.register_blueprint(main_bp)
-app.register_blueprint(api_bp, url_prefix='/api')
-
-# Registrar los filtros de plantilla
-register_template_filters(app)
-
 # ------------------------
 # Handlers de errores
 # ------------------------
-@app.errorhandler(404)
 def not_found_error(error):
     return "Página no encontrada", 404
 
-@app.errorhandler(500)
 def internal_error(error):
     logging.error(f"Error interno: {error}")
     return "Error interno del servidor", 500
 
-@app.errorhandler(503)
 def service_unavailable(error):
     return "Servicio no disponible", 503
 
-@app.errorhandler(RequestEntityTooLarge)
 def too_large(e):
     return "Archivo demasiado grande", 413
 
-@app.errorhandler(429)
 def ratelimit_handler(e):
     return "Demasiadas solicitudes", 429
 
@@ -62,11 +45,43 @@ def ratelimit_handler(e):
 # ------------------------
 # Contexto global para templates
 # ------------------------
-@app.context_processor
 def inject_global_vars():
     return {'current_year': datetime.datetime.now().year, 'app_version': '2.0.1', 'last_updated': datetime.datetime.now().strftime('%Y-%m-%d')}
 
 
+def create_app(services: ServiceContainer = None) -> Flask:
+    """Construye la aplicación Flask con un único contenedor de servicios por proceso."""
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
+    app.config['DEBUG'] = os.environ.get('FLASK_ENV', '') == 'development'
+
+    # Buscador, cache y sesiones HTTP compartidos por la web y la API
+    init_services(app, services)
+
+    # Registrar los Blueprints
+    app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    # Registrar los filtros de plantilla
+    register_template_filters(app)
+
+    # Compresión de las respuestas JSON y HTML
+    register_compression(app)
+
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(500, internal_error)
+    app.register_error_handler(503, service_unavailable)
+    app.register_error_handler(RequestEntityTooLarge, too_large)
+    app.register_error_handler(429, ratelimit_handler)
+    app.context_processor(inject_global_vars)
+    return app
+
+
+# Aplicación por defecto para `gunicorn app:app` y el servidor de desarrollo
+app = create_app()
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=app.config['DEBUG'])
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""Utilidades compartidas por los benchmarks: medición, fixtures y comparación con la línea base."""
+import contextlib
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.stub_server import FIXTURES_DIR
+
+
+def load_fixture(name: str, mode: str = 'rb'):
+    """Lee un fichero de benchmarks/fixtures."""
+    encoding = None if 'b' in mode else 'utf-8'
+    with open(os.path.join(FIXTURES_DIR, name), mode, encoding=encoding) as f:
+        return f.read()
+
+
+@contextlib.contextmanager
+def skipped_sleeps():
+    """
+    Sustituye time.sleep por una versión que no espera y acumula los segundos
+    pedidos, para medir el coste del código sin las pausas de rate limiting.
+    """
+    requested = {'seconds': 0.0}
+    original_sleep = time.sleep
+
+    def fake_sleep(seconds):
+        requested['seconds'] += seconds
+
+    time.sleep = fake_sleep
+    try:
+        yield requested
+    finally:
+        time.sleep = original_sleep
+
+
+def measure(func: Callable, repeat: int = 3, setup: Callable = None) -> Dict:
+    """
+    Ejecuta func `repeat` veces y devuelve la mediana de tiempo de pared y CPU,
+    más el pico de memoria de una ejecución adicional bajo tracemalloc.
+    """
+    wall_times: List[float] = []
+    cpu_times: List[float] = []
+    sleep_requested = 0.0
+
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with skipped_sleeps() as requested:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            func()
+            wall_times.append(time.perf_counter() - wall_start)
+            cpu_times.append(time.process_time() - cpu_start)
+        sleep_requested = requested['seconds']
+
+    # El pico de memoria se mide aparte: tracemalloc distorsiona los tiempos
+    if setup:
+        setup()
+    with skipped_sleeps():
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'wall_s': round(statistics.median(wall_times), 6),
+        'cpu_s': round(statistics.median(cpu_times), 6),
+        'peak_kib': round(peak / 1024, 1),
+        'sleep_skipped_s': round(sleep_requested, 2),
+    }
+
+
+# Holguras absolutas por métrica: por debajo de ellas el ruido domina
+ABSOLUTE_SLACK = {'wall_s': 0.005, 'cpu_s': 0.005, 'peak_kib': 64.0}
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict, tolerance: float):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'tolerance': tolerance, 'stages': results}, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Devuelve la lista de regresiones (métricas por encima de la línea base + tolerancia)."""
+    regressions = []
+    stages = baseline.get('stages', {})
+    for stage, metrics in results.items():
+        reference = stages.get(stage)
+        if not reference:
+            continue
+        for metric, slack in ABSOLUTE_SLACK.items():
+            if metric not in metrics or metric not in reference:
+                continue
+            limit = reference[metric] * (1 + tolerance) + slack
+            if metrics[metric] > limit:
+                regressions.append(
+                    f"{stage}.{metric}: {metrics[metric]} > {round(limit, 6)} (línea base {reference[metric]})"
+                )
+    return regressions
+
+
+def print_report(results: Dict, baseline: Dict):
+    """Imprime una tabla con cada etapa y su variación frente a la línea base."""
+    stages = baseline.get('stages', {})
+    header = f"{'etapa':<40} {'pared (s)':>12} {'CPU (s)':>12} {'pico (KiB)':>12} {'pausas (s)':>11} {'vs base':>9}"
+    print(header)
+    print('-' * len(header))
+    for stage, metrics in results.items():
+        reference = stages.get(stage, {})
+        delta = ''
+        if reference.get('wall_s'):
+            delta = f"{(metrics['wall_s'] / reference['wall_s'] - 1) * 100:+.0f}%"
+        print(f"{stage:<40} {metrics['wall_s']:>12.4f} {metrics['cpu_s']:>12.4f} {metrics['peak_kib']:>12.1f} {metrics.get('sleep_skipped_s', 0):>11.1f} {delta:>9}")
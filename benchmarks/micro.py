@@ -0,0 +1,251 @@
+"""
+Microbenchmarks de las funciones de parseo, extracción, deduplicación y
+ranking más costosas en CPU, tal como las usa el pipeline de búsqueda.
+
+Uso:
+    python -m benchmarks.micro                       # compara con benchmarks/micro_thresholds.json
+    python -m benchmarks.micro --update-thresholds   # regraba los umbrales
+    python -m benchmarks.micro --case idae.deadline  # solo un caso
+
+Cada función se mide con tres tamaños de entrada: 'small' (mínima),
+'typical' (los fixtures grabados) y 'pathological' (varios MB generados para
+forzar el peor caso de selectores y expresiones regulares). El proceso
+termina con código 1 si algún caso supera su umbral almacenado.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict
+
+from benchmarks.common import load_fixture
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro_thresholds.json')
+SIZES = ('small', 'typical', 'pathological')
+
+SMALL_HTML = (
+    '<html><body><div class="contenido"><p>Corto.</p>'
+    '<p><a href="/programas/neotec">Programa NEOTEC de ayudas</a></p></div></body></html>'
+)
+
+
+def pathological_html(size_bytes: int) -> str:
+    """
+    Página de varios MB con miles de enlaces y párrafos cortos que contienen
+    palabras clave, importes sin moneda y fechas pasadas: ningún extractor
+    encuentra coincidencia pronto y todos recorren el documento completo.
+    """
+    rng = random.Random(42)
+    lines = []
+    size = 0
+    n = 0
+    while size < size_bytes:
+        line = (
+            f'<p>Importe {rng.randint(1, 999)}.{rng.randint(100, 999)} dotación plazo '
+            f'{n % 28 + 1}/{n % 12 + 1}/20{n % 20:02d} '
+            f'<a href="/programas/programa-{n}">Programa de ayuda número {n}</a></p>'
+        )
+        lines.append(line)
+        size += len(line) + 1
+        n += 1
+    return '<html><body><main><div class="contenido">' + '\n'.join(lines) + '</div></main></body></html>'
+
+
+def _grants(count: int):
+    """Lista sintética de subvenciones con títulos y fuentes repetidos para deduplicar."""
+    from scraper.grant import Grant
+
+    rng = random.Random(7)
+    sources = ['BOE - Boletín Oficial del Estado', 'Comisión Europea - Funding & Tenders Portal',
+               'CDTI - Centro para el Desarrollo Tecnológico Industrial',
+               'IDAE - Instituto para la Diversificación y Ahorro de la Energía']
+    grants = []
+    for i in range(count):
+        n = rng.randint(0, max(1, count // 2))
+        grants.append(Grant(
+            title=f"Convocatoria de ayudas a la innovación número {n}",
+            description="Convocatoria oficial publicada en BOE.",
+            sector='Todos', location='España', region='Todas', company_type='Todos',
+            amount=f"Hasta {n}.000€",
+            deadline=f"2030-{n % 12 + 1:02d}-{n % 28 + 1:02d}",
+            publication_date=f"2029-{n % 12 + 1:02d}-{n % 28 + 1:02d}",
+            source=sources[n % len(sources)],
+            link=f"https://example.org/{n}",
+            relevance_score=n % 10,
+            identifier=f"ID_{n}" if i % 3 else None,
+        ))
+    return grants
+
+
+def _boe_sumario(count: int):
+    """Sumario del BOE con `count` anuncios tomados cíclicamente del fixture grabado."""
+    sumario = json.loads(load_fixture('boe_sumario.json', 'r'))
+    items = [item for seccion in sumario['sumario']['secciones']
+             for subseccion in seccion['secciones'] for item in subseccion['items']]
+    return {'sumario': {'secciones': [{'secciones': [{'items': [items[i % len(items)] for i in range(count)]}]}]}}
+
+
+def _indexed_candidates(grant_api, grants):
+    """Candidatos como los deja _fetch_candidates: deduplicados e indexados para texto y facetas."""
+    from scraper.grant import GrantList
+
+    candidates = GrantList(grant_api.dedup.deduplicate(grants))
+    grant_api.search_index.add(candidates)
+    grant_api.facets.add(candidates)
+    grant_api.ranker.index(candidates)
+    return candidates
+
+
+def build_cases(pathological_mb: float) -> Dict[str, Dict[str, Callable]]:
+    """Construye {caso: {tamaño: func}} con las entradas ya preparadas."""
+    import requests
+    from bs4 import BeautifulSoup
+    from scraper.api_client import RealGrantAPI
+    from scraper.api.boe import BoeScraper
+    from scraper.dedup import DedupEngine
+    from services.store import LocalStore
+    from scraper.web.cdti import CdtiScraper
+    from scraper.web.idae import IdaeScraper
+
+    grant_api = RealGrantAPI()
+    # Clústeres en un almacén en memoria, sin tocar el de la aplicación
+    grant_api.dedup = DedupEngine(LocalStore(':memory:'))
+    logger = grant_api.logger
+    regions = grant_api.spanish_regions
+    cdti = CdtiScraper(requests.Session(), grant_api.apis['cdti_web'], regions, logger)
+    idae = IdaeScraper(requests.Session(), grant_api.apis['idae_web'], regions, logger)
+    boe = BoeScraper(requests.Session(), grant_api.apis['boe'], regions, logger)
+
+    big_html = pathological_html(int(pathological_mb * 1024 * 1024))
+    soups = {
+        'small': BeautifulSoup(SMALL_HTML, 'html.parser'),
+        'cdti_section': BeautifulSoup(load_fixture('cdti_section.html'), 'html.parser'),
+        'cdti_detail': BeautifulSoup(load_fixture('cdti_detail.html'), 'html.parser'),
+        'idae_section': BeautifulSoup(load_fixture('idae_section.html'), 'html.parser'),
+        'idae_detail': BeautifulSoup(load_fixture('idae_detail.html'), 'html.parser'),
+        'pathological': BeautifulSoup(big_html, 'html.parser'),
+    }
+
+    def soup_case(func, typical, *args):
+        return {
+            'small': lambda: func(soups['small'], *args),
+            'typical': lambda: func(soups[typical], *args),
+            'pathological': lambda: func(soups['pathological'], *args),
+        }
+
+    sumarios = {'small': _boe_sumario(3), 'typical': _boe_sumario(16), 'pathological': _boe_sumario(20000)}
+    catalog_rows = {size: boe._extract_catalog_items(sumario, '20300115') for size, sumario in sumarios.items()}
+    grant_lists = {'small': _grants(10), 'typical': _grants(200), 'pathological': _grants(50000)}
+    candidates = {size: _indexed_candidates(grant_api, _grants(len(grants))) for size, grants in grant_lists.items()}
+    criteria = ('Todos', 'Todas', 'Todos', 'Todas')
+
+    return {
+        'cdti.find_program_links': soup_case(cdti._find_program_links, 'cdti_section'),
+        'idae.find_program_links': soup_case(idae._find_program_links, 'idae_section'),
+        'cdti.extract_amount': soup_case(cdti._extract_amount_from_page, 'cdti_detail'),
+        'idae.extract_amount': soup_case(idae._extract_amount_from_idae_page, 'idae_detail'),
+        'idae.extract_deadline': soup_case(idae._extract_deadline_from_idae_page, 'idae_detail'),
+        'idae.extract_description': soup_case(idae._extract_description_from_idae_page, 'idae_detail', 'Programa'),
+        'boe.extract_catalog_items': {
+            size: (lambda sumario=sumario: boe._extract_catalog_items(sumario, '20300115'))
+            for size, sumario in sumarios.items()
+        },
+        'boe.grant_from_item': {
+            size: (lambda rows=rows: [boe._grant_from_item(titulo, url, *criteria, fecha)
+                                      for _, fecha, _, titulo, url in rows])
+            for size, rows in catalog_rows.items()
+        },
+        'dedup.deduplicate': {
+            size: (lambda grants=grants: grant_api.dedup.deduplicate(grants))
+            for size, grants in grant_lists.items()
+        },
+        'api_client.rank_results': {
+            size: (lambda grants=grants: grant_api._rank_results(grants, [], []))
+            for size, grants in candidates.items()
+        },
+    }
+
+
+def time_call(func: Callable, min_time: float = 0.2, repeat: int = 3) -> float:
+    """Tiempo mínimo por llamada (segundos), al estilo de timeit con autocalibrado."""
+    # Llamada de calentamiento: cachés y clústeres persistidos se miden en su estado habitual
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 10000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de parsers y extractores con umbrales de regresión.")
+    parser.add_argument('--case', action='append', help="ejecutar solo este caso (repetible)")
+    parser.add_argument('--size', action='append', choices=SIZES, help="ejecutar solo este tamaño (repetible)")
+    parser.add_argument('--pathological-mb', type=float, default=2.0, help="tamaño de la entrada patológica en MB")
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH)
+    parser.add_argument('--update-thresholds', action='store_true')
+    parser.add_argument('--headroom', type=float, default=2.0, help="factor aplicado al regrabar umbrales")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    thresholds = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds, 'r', encoding='utf-8') as f:
+            thresholds = json.load(f)
+
+    cases = build_cases(args.pathological_mb)
+    results = {}
+    failures = []
+    print(f"{'caso':<32} {'tamaño':<13} {'tiempo (ms)':>12} {'umbral (ms)':>12}")
+    print('-' * 72)
+    for name, sizes in cases.items():
+        if args.case and name not in args.case:
+            continue
+        for size, func in sizes.items():
+            if args.size and size not in args.size:
+                continue
+            seconds = time_call(func, repeat=1 if size == 'pathological' else 3)
+            results.setdefault(name, {})[size] = seconds
+            limit = thresholds.get(name, {}).get(size)
+            flag = ''
+            if limit is not None and seconds > limit:
+                failures.append(f"{name}[{size}]: {seconds * 1000:.3f} ms > {limit * 1000:.3f} ms")
+                flag = '  REGRESIÓN'
+            limit_text = f"{limit * 1000:.3f}" if limit is not None else '-'
+            print(f"{name:<32} {size:<13} {seconds * 1000:>12.3f} {limit_text:>12}{flag}")
+    logging.disable(logging.NOTSET)
+
+    if args.update_thresholds:
+        for name, sizes in results.items():
+            for size, seconds in sizes.items():
+                thresholds.setdefault(name, {})[size] = round(seconds * args.headroom, 6)
+        with open(args.thresholds, 'w', encoding='utf-8') as f:
+            json.dump(thresholds, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nUmbrales actualizados en {args.thresholds}")
+        return 0
+
+    if failures:
+        print("\nRegresiones detectadas:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark de extremo a extremo del pipeline de búsqueda con fixtures grabados.
+
+Uso:
+    python -m benchmarks.pipeline                    # compara con benchmarks/baseline.json
+    python -m benchmarks.pipeline --update-baseline  # regraba la línea base
+
+Cada etapa (scrapers, RealGrantAPI.search_grants y process_grants_data) se
+mide en tiempo de pared, CPU y pico de memoria contra un servidor stub local.
+Las pausas de rate limiting (time.sleep) no se esperan; se informan aparte.
+El proceso termina con código 1 si alguna métrica supera la línea base.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from benchmarks.common import (compare_with_baseline, load_baseline, measure,
+                               print_report, save_baseline, skipped_sleeps)
+from benchmarks.stub_server import install_stub, start_stub_server
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_CRITERIA = ('Todos', 'Todas', 'Todos', 'Todas')
+
+
+def build_stages(port: int, grants_count: int):
+    """Construye las etapas a medir como {nombre: (func, setup)}."""
+    from scraper.api_client import RealGrantAPI
+    from scraper.api import boe, eu_funding
+    from scraper.web import cdti, idae
+    from services.grants import process_grants_data
+    from scraper.dedup import DedupEngine
+    from services.store import LocalStore
+
+    grant_api = RealGrantAPI()
+    # Catálogo en memoria: cada búsqueda medida parte de un almacén vacío, como antes de la ingesta incremental
+    grant_api.store = LocalStore(':memory:')
+    grant_api.dedup = DedupEngine(grant_api.store)
+    install_stub(grant_api.session, port)
+    session, apis, regions, logger = grant_api.session, grant_api.apis, grant_api.spanish_regions, grant_api.logger
+    sector, location, company_type, region = DEFAULT_CRITERIA
+
+    def reset_search():
+        grant_api.cache.clear()
+        grant_api.snapshots.clear()
+        grant_api.store = LocalStore(':memory:')
+        grant_api.dedup = DedupEngine(grant_api.store)
+
+    stages = {
+        'boe.search': (lambda: boe.BoeScraper(session, apis['boe'], regions, logger).search(sector, location, company_type, region), None),
+        'eu_funding.search': (lambda: eu_funding.EUFundingScraper(session, apis['eu_funding'], logger).search(sector, location, company_type), None),
+        'cdti.search': (lambda: cdti.CdtiScraper(session, apis['cdti_web'], regions, logger).search(sector, company_type, region), None),
+        'idae.search': (lambda: idae.IdaeScraper(session, apis['idae_web'], regions, logger).search(sector, company_type, region), None),
+        'api_client.search_grants': (lambda: grant_api.search_grants(sector, location, company_type, region), reset_search),
+    }
+
+    # process_grants_data se mide sobre un lote ampliado a partir de resultados reales del pipeline
+    with skipped_sleeps():
+        sample = grant_api.search_grants(sector, location, company_type, region)
+    batch = []
+
+    def reset_batch():
+        batch[:] = [sample[i % len(sample)].copy() for i in range(grants_count)] if sample else []
+
+    stages['services.process_grants_data'] = (lambda: process_grants_data(batch), reset_batch)
+    return stages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de búsqueda con fixtures grabados.")
+    parser.add_argument('--repeat', type=int, default=3, help="repeticiones por etapa (se usa la mediana)")
+    parser.add_argument('--grants', type=int, default=2000, help="tamaño del lote para process_grants_data")
+    parser.add_argument('--stage', action='append', help="medir solo esta etapa (repetible)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=None, help="margen relativo permitido (por defecto, el de la línea base o 0.3)")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', action='store_true', help="imprimir los resultados en JSON")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    baseline = load_baseline(args.baseline)
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get('tolerance', 0.3)
+
+    process, port = start_stub_server()
+    try:
+        stages = build_stages(port, args.grants)
+        results = {}
+        for name, (func, setup) in stages.items():
+            if args.stage and name not in args.stage:
+                continue
+            results[name] = measure(func, repeat=args.repeat, setup=setup)
+    finally:
+        process.terminate()
+        process.wait()
+        logging.disable(logging.NOTSET)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_report(results, baseline)
+
+    if args.update_baseline:
+        stored = baseline.get('stages', {})
+        stored.update(results)
+        save_baseline(args.baseline, stored, tolerance)
+        print(f"\nLínea base actualizada en {args.baseline}")
+        return 0
+
+    regressions = compare_with_baseline(results, baseline, tolerance)
+    if regressions:
+        print("\nRegresiones detectadas:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Informe del arranque de la aplicación: tiempo de importación y memoria en reposo.
+
+Uso:
+    python -m benchmarks.startup                              # resumen estilo -X importtime
+    python -m benchmarks.startup --max-import-ms 300 --max-rss-mb 80
+
+Importa `app` en un proceso nuevo con `python -X importtime`, como hace un
+worker de gunicorn al arrancar, y resume el tiempo total de importación, los
+módulos más lentos (tiempo acumulado), la memoria residente tras el arranque y
+qué dependencias pesadas (pandas, numpy, bs4...) se han cargado sin usarse.
+El proceso termina con código 1 si se supera alguno de los límites indicados.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencias que deben cargarse en su primer uso, no al arrancar el worker
+HEAVY_MODULES = ('pandas', 'numpy', 'xlsxwriter', 'openpyxl', 'bs4', 'lxml', 'html5lib')
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$')
+
+# Se ejecuta en el proceso hijo tras importar la aplicación
+_PROBE = """
+import json, sys
+import {module}
+rss_kb = 0
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+print(json.dumps({{'rss_kb': rss_kb, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """Entradas de -X importtime como {module, self_us, cumulative_us, depth}."""
+    entries = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line.rstrip())
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({'module': module, 'self_us': int(self_us),
+                            'cumulative_us': int(cumulative_us), 'depth': len(indent) // 2})
+    return entries
+
+
+def measure_startup(module: str = 'app') -> Dict:
+    """Importa el módulo en un intérprete nuevo y devuelve tiempos, RSS y módulos cargados."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr[-2000:]}")
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(result.stderr)
+    loaded = set(probe['modules'])
+    return {
+        'module': module,
+        'import_ms': sum(entry['cumulative_us'] for entry in entries
+                         if entry['depth'] == 0 and entry['module'] == module) / 1000,
+        'rss_mb': probe['rss_kb'] / 1024,
+        'entries': entries,
+        'heavy_loaded': [name for name in HEAVY_MODULES if name in loaded],
+    }
+
+
+def print_report(report: Dict, top: int = 15) -> None:
+    print(f"Arranque de '{report['module']}': {report['import_ms']:.1f} ms de importación, "
+          f"{report['rss_mb']:.1f} MB de RSS")
+    print(f"\n{'Módulo':<45}{'propio (ms)':>12}{'acumulado (ms)':>16}")
+    slowest = sorted(report['entries'], key=lambda entry: entry['cumulative_us'], reverse=True)[:top]
+    for entry in slowest:
+        print(f"{entry['module']:<45}{entry['self_us'] / 1000:>12.1f}{entry['cumulative_us'] / 1000:>16.1f}")
+    heavy = ', '.join(report['heavy_loaded']) or 'ninguna'
+    print(f"\nDependencias pesadas cargadas al arrancar: {heavy}")
+
+
+def check_budgets(report: Dict, max_import_ms: Optional[float], max_rss_mb: Optional[float]) -> List[str]:
+    """Mensajes de los límites superados."""
+    failures = []
+    if max_import_ms is not None and report['import_ms'] > max_import_ms:
+        failures.append(f"importación {report['import_ms']:.1f} ms > {max_import_ms:.1f} ms")
+    if max_rss_mb is not None and report['rss_mb'] > max_rss_mb:
+        failures.append(f"RSS {report['rss_mb']:.1f} MB > {max_rss_mb:.1f} MB")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tiempo de importación y memoria en reposo de la aplicación.")
+    parser.add_argument('--module', default='app', help="módulo a importar (por defecto, app)")
+    parser.add_argument('--top', type=int, default=15, help="número de módulos más lentos a mostrar")
+    parser.add_argument('--max-import-ms', type=float, default=None, help="límite del tiempo total de importación")
+    parser.add_argument('--max-rss-mb', type=float, default=None, help="límite de la memoria residente tras arrancar")
+    parser.add_argument('--json', action='store_true', help="imprimir el informe en JSON")
+    args = parser.parse_args(argv)
+
+    report = measure_startup(args.module)
+    if args.json:
+        print(json.dumps({key: value for key, value in report.items() if key != 'entries'}, indent=2))
+    else:
+        print_report(report, args.top)
+
+    failures = check_budgets(report, args.max_import_ms, args.max_rss_mb)
+    if failures:
+        print("\nLímites superados:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
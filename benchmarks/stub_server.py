@@ -0,0 +1,148 @@
+"""
+Servidor HTTP local que sirve las respuestas grabadas en benchmarks/fixtures.
+
+Las peticiones de los scrapers se redirigen aquí mediante StubRedirectAdapter,
+que reescribe https://<host>/<ruta> como http://127.0.0.1:<puerto>/<host>/<ruta>.
+Así se ejecuta el pipeline completo sin acceso a la red.
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (host, patrón de ruta, fichero, content-type). Gana la primera coincidencia.
+ROUTES = [
+    ('www.boe.es', r'^/datosabiertos/api/sumario/\d{8}$', 'boe_sumario.json', 'application/json'),
+    ('api.tech.ec.europa.eu', r'^/search-api/', 'eu_search.json', 'application/json'),
+    ('www.cdti.es', r'^/index\.asp', 'cdti_section.html', 'text/html; charset=utf-8'),
+    ('www.cdti.es', r'^/', 'cdti_detail.html', 'text/html; charset=utf-8'),
+    ('www.idae.es', r'^/ayudas-y-financiacion', 'idae_section.html', 'text/html; charset=utf-8'),
+    ('www.idae.es', r'^/', 'idae_detail.html', 'text/html; charset=utf-8'),
+]
+
+_COMPILED_ROUTES = [(host, re.compile(pattern), name, ctype) for host, pattern, name, ctype in ROUTES]
+_FIXTURE_CACHE = {}
+
+
+def resolve_fixture(host: str, path: str) -> Optional[Tuple[bytes, str]]:
+    """Devuelve (cuerpo, content-type) del fixture asociado a host/ruta."""
+    for route_host, pattern, name, content_type in _COMPILED_ROUTES:
+        if route_host == host and pattern.search(path):
+            if name not in _FIXTURE_CACHE:
+                with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+                    _FIXTURE_CACHE[name] = f.read()
+            return _FIXTURE_CACHE[name], content_type
+    return None
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Handler que resuelve /<host>/<ruta> contra la tabla ROUTES."""
+
+    protocol_version = 'HTTP/1.1'
+    # Evita el retardo de ~40 ms por ACK retrasado entre cabeceras y cuerpo
+    disable_nagle_algorithm = True
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        fixture = resolve_fixture(host, '/' + path)
+        if fixture is None:
+            body, content_type, status = b'Not found', 'text/plain', 404
+        else:
+            (body, content_type), status = fixture, 200
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _serve
+    do_POST = _serve
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRedirectAdapter(HTTPAdapter):
+    """Adaptador de requests que desvía cualquier URL externa al servidor stub."""
+
+    def __init__(self, port: int, **kwargs):
+        self.stub_host = '127.0.0.1'
+        self.stub_port = port
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if parts.hostname != self.stub_host:
+            query = f"?{parts.query}" if parts.query else ''
+            request.url = f"http://{self.stub_host}:{self.stub_port}/{parts.hostname}{parts.path or '/'}{query}"
+        return super().send(request, **kwargs)
+
+
+def install_stub(session, port: int):
+    """Monta el adaptador de redirección en una sesión de requests."""
+    adapter = StubRedirectAdapter(port)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_stub_server(timeout: float = 10.0) -> Tuple[subprocess.Popen, int]:
+    """
+    Arranca el servidor en un subproceso para que su CPU y memoria no se
+    mezclen con las mediciones del proceso de benchmark.
+    """
+    port = _free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.stub_server', '--port', str(port)],
+        cwd=root
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"El servidor stub no arrancó en el puerto {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP con respuestas grabadas para benchmarks.")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubRequestHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Configuración de gunicorn (se carga automáticamente con `gunicorn app:app`).
+
+La aplicación se importa en el proceso maestro (preload_app) y, antes de crear
+los workers, se precalientan ahí las búsquedas de WARMUP_SEARCHES (por defecto
+"*", la búsqueda sin filtros; p. ej. "*;Energía|Todas|Todos|Todas"; vacío lo
+desactiva): las fuentes se consultan una sola vez para todos los workers, que
+arrancan con las instantáneas, la cache y el catálogo ya llenos y comparten
+esas páginas de memoria con el maestro (copy-on-write, tras gc.freeze()). Sin
+preload_app cada worker precalienta por su cuenta, en un hilo aparte.
+
+Por defecto los workers son gthread: cada búsqueda ocupa un hilo y el parseo
+HTML (CPU) no bloquea al resto. GUNICORN_WORKER_CLASS=gevent activa workers
+cooperativos, que solo compensan en despliegues dominados por la espera a las
+fuentes: una búsqueda que espera cede el worker a otras, hasta
+worker_connections a la vez, pero mientras una parsea HTML ninguna otra avanza
+y el perfilado bajo demanda queda desactivado. El monkey patching se aplica
+aquí, antes de precargar la aplicación, para que los locks, sockets y pausas
+creados en el maestro también sean cooperativos.
+"""
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from services.container import parse_warm_up_searches
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 500))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))  # solo con gthread
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+
+def _services(server):
+    return server.app.wsgi().extensions['grant_services']
+
+
+def _warm_up_searches():
+    return parse_warm_up_searches(os.environ.get('WARMUP_SEARCHES', '*'))
+
+
+def when_ready(server):
+    """En el maestro, tras cargar la aplicación y antes de crear los workers."""
+    if server.cfg.preload_app:
+        _services(server).warm_up(_warm_up_searches(), freeze=True)
+
+
+def post_fork(server, worker):
+    """En cada worker: sesiones HTTP y conexiones SQLite propias."""
+    services = _services(server)
+    services.after_fork()
+    if not server.cfg.preload_app:
+        services.warm_up_in_background(_warm_up_searches())
@@ -1,66 +1,260 @@
 import datetime
+import functools
+import hashlib
+import importlib.util
 import logging
 import io
 import json
 import os
-from flask import Blueprint, request, jsonify, send_file
+import time
+from flask import Blueprint, Response, request, jsonify, send_file
+from services.container import get_services
 from services.grants import process_grants_data
-from scraper.api_client import RealGrantAPI  # <-- Línea corregida
+from scraper.grant import grants_to_json
+from utils.profiling import profiled
+from utils.tracing import traced
+from utils.dates import reference_day
+from utils.web_helpers import matching_etag, multi_value
 
-# Detectar disponibilidad de pandas
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+# Detectar disponibilidad de pandas sin importarlo: solo lo usa la exportación
+PANDAS_AVAILABLE = importlib.util.find_spec('pandas') is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _pandas():
+    """Importa pandas en la primera exportación en lugar de al arrancar el worker."""
+    import pandas
+    return pandas
 
 api_bp = Blueprint('api', __name__)
-grant_api = RealGrantAPI()
+
+# Valores admitidos en ?sort= y su orden por importe
+AMOUNT_SORTS = {'amount': 'desc', 'amount_desc': 'desc', 'amount_asc': 'asc'}
+
+
+# Conjuntos de criterios admitidos en una petición a /api/search/batch
+BATCH_MAX_SEARCHES = 100
+
+
+def _optional_float(value, name: str):
+    """Convierte un valor numérico opcional; lanza ValueError si no es un número."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    value = str(value if value is not None else '').strip()
+    if not value:
+        return None
+    try:
+        return float(value.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"El parámetro '{name}' debe ser numérico")
+
+
+def _optional_float_arg(name: str):
+    """Lee un parámetro numérico opcional; lanza ValueError si no es un número."""
+    return _optional_float(request.args.get(name, ''), name)
+
+def _result_etag(grants) -> str:
+    """ETag fuerte: versión de todo el contenido de los resultados, parámetros de la petición y día de referencia."""
+    today, offset = reference_day()
+    params = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    digest = hashlib.blake2b(f"{grants.version}|{today + offset}|{params}".encode('utf-8'), digest_size=12)
+    return digest.hexdigest()
+
+
+def _max_age(grants) -> int:
+    """Segundos que faltan para que caduquen en cache los datos de las fuentes (o cambie el día)."""
+    fetched_at = getattr(grants, 'fetched_at', None)
+    if not fetched_at:
+        return 0
+    now = datetime.datetime.now()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return max(0, int(min(fetched_at + get_services().grant_api.cache_timeout - time.time(), (midnight - now).total_seconds())))
 
 @api_bp.route("/search", methods=["GET"])
+@traced('GET /api/search', root=True)
+@profiled('api.search')
 def api_search():
     """API endpoint para búsquedas directas."""
     start_time = datetime.datetime.now()
     try:
-        sector = request.args.get("sector", "Todos")
-        location = request.args.get("location", "Todas") 
-        company_type = request.args.get("company_type", "Todos")
-        region = request.args.get("region", "Todas")
+        # Cada criterio admite varios valores: ?sector=Energía&sector=Industria
+        sector = multi_value(request.args.getlist("sector"), "Todos")
+        location = multi_value(request.args.getlist("location"), "Todas")
+        company_type = multi_value(request.args.getlist("company_type"), "Todos")
+        region = multi_value(request.args.getlist("region"), "Todas")
+        query = request.args.get("q", "").strip()
+        sort = request.args.get("sort", "")
+
+        try:
+            min_amount = _optional_float_arg("min_amount")
+            max_amount = _optional_float_arg("max_amount")
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e), "timestamp": datetime.datetime.now().isoformat()}), 400
         
-        raw_grants = grant_api.search_grants(sector, location, company_type, region)
+        # Filtros y orden por importe sobre todos los candidatos, antes de quedarse con los 25 primeros
+        raw_grants = get_services().grant_api.search_grants(sector, location, company_type, region, query,
+                                                            min_amount, max_amount, AMOUNT_SORTS.get(sort))
+
+        # Mismo conjunto de resultados, mismos parámetros y mismo día: el cliente ya tiene la respuesta
+        etag = _result_etag(raw_grants)
+        max_age = _max_age(raw_grants)
+        cached_variant = matching_etag(etag)
+        if cached_variant:
+            response = Response(status=304)
+            response.set_etag(cached_variant)
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.vary.add('Accept-Encoding')
+            return response
+
         grants, _ = process_grants_data(raw_grants, start_time)
+        facet_counts = getattr(raw_grants, 'facet_counts', {})
         
-        return jsonify({
-            "success": True,
-            "results": len(grants),
-            "grants": grants,
-            "search_criteria": {
-                "sector": sector, "location": location, "region": region, "company_type": company_type
+        # La marca de tiempo es la de la consulta a las fuentes, para que el cuerpo solo cambie con los datos
+        fetched_at = getattr(raw_grants, 'fetched_at', None)
+        timestamp = datetime.datetime.fromtimestamp(fetched_at) if fetched_at else datetime.datetime.now()
+        body = grants_to_json(
+            grants,
+            success=True,
+            results=len(grants),
+            search_criteria={
+                "sector": sector, "location": location, "region": region, "company_type": company_type,
+                "q": query or None, "min_amount": min_amount, "max_amount": max_amount, "sort": sort or None
             },
-            "timestamp": datetime.datetime.now().isoformat()
-        })
+            facets=facet_counts,
+            timestamp=timestamp.isoformat()
+        )
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
         
     except Exception as e:
         logging.error(f"Error en API search: {e}")
         return jsonify({"success": False, "error": str(e), "timestamp": datetime.datetime.now().isoformat()}), 500
 
+def _batch_value(search: dict, name: str, default: str):
+    """Criterio de un conjunto del lote: texto o lista de textos, como los parámetros repetidos de /api/search."""
+    value = search.get(name)
+    if isinstance(value, list):
+        return multi_value([str(item).strip() for item in value if item is not None], default)
+    return multi_value([str(value).strip()] if value is not None else [], default)
+
+
+@api_bp.route("/search/batch", methods=["POST"])
+@traced('POST /api/search/batch', root=True)
+@profiled('api.search_batch')
+def api_search_batch():
+    """
+    Varias búsquedas en una petición: {"searches": [{"id": ..., "sector": ...,
+    "q": ..., "min_amount": ...}, ...]}. Cada una devuelve lo mismo que
+    /api/search, pero cada combinación de criterios se consulta una sola vez;
+    los resultados se devuelven por id.
+    """
+    start_time = datetime.datetime.now()
+    try:
+        payload = request.get_json(silent=True)
+        searches = payload.get("searches") if isinstance(payload, dict) else None
+        if not isinstance(searches, list) or not searches:
+            return jsonify({"success": False, "error": "Se esperaba un objeto JSON con una lista 'searches'",
+                            "timestamp": datetime.datetime.now().isoformat()}), 400
+        if len(searches) > BATCH_MAX_SEARCHES:
+            return jsonify({"success": False, "error": f"Como máximo {BATCH_MAX_SEARCHES} búsquedas por petición",
+                            "timestamp": datetime.datetime.now().isoformat()}), 400
+
+        requests_by_id = {}
+        for position, search in enumerate(searches):
+            if not isinstance(search, dict):
+                return jsonify({"success": False, "error": f"La búsqueda {position} no es un objeto",
+                                "timestamp": datetime.datetime.now().isoformat()}), 400
+            search_id = str(search.get("id", position))
+            if search_id in requests_by_id:
+                return jsonify({"success": False, "error": f"Id de búsqueda repetido: {search_id}",
+                                "timestamp": datetime.datetime.now().isoformat()}), 400
+            try:
+                min_amount = _optional_float(search.get("min_amount"), "min_amount")
+                max_amount = _optional_float(search.get("max_amount"), "max_amount")
+            except ValueError as e:
+                return jsonify({"success": False, "error": f"Búsqueda {search_id}: {e}",
+                                "timestamp": datetime.datetime.now().isoformat()}), 400
+            requests_by_id[search_id] = {
+                "sector": _batch_value(search, "sector", "Todos"),
+                "location": _batch_value(search, "location", "Todas"),
+                "company_type": _batch_value(search, "company_type", "Todos"),
+                "region": _batch_value(search, "region", "Todas"),
+                "q": str(search.get("q") or "").strip() or None,
+                "min_amount": min_amount, "max_amount": max_amount,
+                "sort": str(search.get("sort") or "") or None,
+            }
+
+        grant_api = get_services().grant_api
+        raw_results = grant_api.search_grants_batch([
+            {"sector": criteria["sector"], "location": criteria["location"], "company_type": criteria["company_type"],
+             "region": criteria["region"], "query": criteria["q"] or "", "min_amount": criteria["min_amount"],
+             "max_amount": criteria["max_amount"], "amount_sort": AMOUNT_SORTS.get(criteria["sort"] or "")}
+            for criteria in requests_by_id.values()
+        ])
+
+        # Los conjuntos iguales comparten lista de resultados: se procesa y serializa cada subvención una vez
+        processed = {}
+        rows = {}
+        results = {}
+        fetched_at = []
+        for (search_id, criteria), raw_grants in zip(requests_by_id.items(), raw_results):
+            if id(raw_grants) not in processed:
+                processed[id(raw_grants)] = process_grants_data(raw_grants, start_time)[0]
+                if getattr(raw_grants, 'fetched_at', None):
+                    fetched_at.append(raw_grants.fetched_at)
+            grants = processed[id(raw_grants)]
+            for grant in grants:
+                if id(grant) not in rows:
+                    rows[id(grant)] = grant.to_dict()
+            results[search_id] = {
+                "results": len(grants),
+                "search_criteria": criteria,
+                "facets": getattr(raw_grants, 'facet_counts', {}),
+                "grants": [rows[id(grant)] for grant in grants],
+            }
+
+        timestamp = datetime.datetime.fromtimestamp(min(fetched_at)) if fetched_at else datetime.datetime.now()
+        body = json.dumps({"success": True, "searches": len(results), "results": results,
+                           "timestamp": timestamp.isoformat()}, ensure_ascii=False, separators=(',', ':'))
+        return Response(body, mimetype='application/json')
+
+    except Exception as e:
+        logging.error(f"Error en API search batch: {e}")
+        return jsonify({"success": False, "error": str(e), "timestamp": datetime.datetime.now().isoformat()}), 500
+
 @api_bp.route("/export/<format>", methods=["POST"])
+@traced('POST /api/export', root=True)
+@profiled('api.export')
 def export_results(format):
     """Endpoint para exportar resultados."""
     try:
-        sector = request.form.get("sector", "Todos")
-        location = request.form.get("location", "Todas")
-        company_type = request.form.get("company_type", "Todos")
-        region = request.form.get("region", "Todas")
+        sector = multi_value(request.form.getlist("sector"), "Todos")
+        location = multi_value(request.form.getlist("location"), "Todas")
+        company_type = multi_value(request.form.getlist("company_type"), "Todos")
+        region = multi_value(request.form.getlist("region"), "Todas")
+        query = request.form.get("q", "").strip()
+        sort = request.form.get("sort", "")
+
+        try:
+            min_amount = _optional_float(request.form.get("min_amount", ""), "min_amount")
+            max_amount = _optional_float(request.form.get("max_amount", ""), "max_amount")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        raw_grants = grant_api.search_grants(sector, location, company_type, region)
+        # Los mismos filtros y orden por importe que /api/search
+        raw_grants = get_services().grant_api.search_grants(sector, location, company_type, region, query,
+                                                            min_amount, max_amount, AMOUNT_SORTS.get(sort))
         grants, _ = process_grants_data(raw_grants)
         
         df_data = [{
-            'Título': g.get('title'), 'Descripción': g.get('description'), 'Sector': g.get('sector'),
-            'Ubicación': g.get('location'), 'Región': g.get('region'), 'Tipo Empresa': g.get('company_type'),
-            'Importe': g.get('amount'), 'Fecha Límite': g.get('deadline'), 'Fecha Publicación': g.get('publication_date'),
-            'Días Restantes': g.get('days_remaining'), 'Fuente': g.get('source'), 'Enlace': g.get('link')
+            'Título': g.title, 'Descripción': g.description, 'Sector': g.sector,
+            'Ubicación': g.location, 'Región': g.region, 'Tipo Empresa': g.company_type,
+            'Importe': g.amount, 'Fecha Límite': g.deadline, 'Fecha Publicación': g.publication_date,
+            'Días Restantes': g.days_remaining, 'Fuente': g.source, 'Enlace': g.link
         } for g in grants]
         
         if format.lower() == 'json':
@@ -70,13 +264,14 @@ def export_results(format):
             return send_file(io.BytesIO(output.getvalue().encode('utf-8')), mimetype='application/json', as_attachment=True, download_name=f'subvenciones.json')
             
         elif format.lower() == 'csv' and PANDAS_AVAILABLE:
-            df = pd.DataFrame(df_data)
+            df = _pandas().DataFrame(df_data)
             output = io.StringIO()
             df.to_csv(output, index=False, encoding='utf-8')
             output.seek(0)
             return send_file(io.BytesIO(output.getvalue().encode('utf-8')), mimetype='text/csv', as_attachment=True, download_name=f'subvenciones.csv')
             
         elif format.lower() == 'excel' and PANDAS_AVAILABLE:
+            pd = _pandas()
             df = pd.DataFrame(df_data)
             output = io.BytesIO()
             with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
@@ -1,17 +1,19 @@
 import datetime
 import logging
 from flask import Blueprint, render_template, request, jsonify
+from markupsafe import Markup
 from services.grants import process_grants_data
-from scraper.api_client import RealGrantAPI
+from services.container import get_services
+from utils.profiling import profiled
+from utils.tracing import traced
+from utils.dates import reference_day
+from utils.web_helpers import multi_value, criteria_label
 import os
 import requests
 import time
 
 main_bp = Blueprint('main', __name__)
 
-# Inicializar el scraper (mantener aquí para evitar circular imports)
-grant_api = RealGrantAPI()
-
 SPANISH_REGIONS = [
     "Andalucía", "Aragón", "Asturias", "Islas Baleares", "Canarias",
     "Cantabria", "Castilla-La Mancha", "Castilla y León", "Cataluña",
@@ -24,32 +26,53 @@ def index():
     """Muestra el formulario de búsqueda inicial."""
     return render_template("index.html", spanish_regions=SPANISH_REGIONS, show_regions=False)
 
+def render_grant_list(grants, location, region) -> Markup:
+    """HTML de la lista de subvenciones, desde cache si los resultados y el día son los mismos."""
+    def render():
+        return render_template("partials/grant_list.html", grants=grants, location=location, region=region)
+
+    # La versión cubre todos los campos serializados de cada subvención, incluidos los que pinta la plantilla
+    version = getattr(grants, 'version', None)
+    if version is None:
+        return Markup(render())
+    today, offset = reference_day()
+    key = (version, today + offset, criteria_label(location), criteria_label(region))
+    # Listas ya renderizadas, compartidas por el proceso (los días restantes solo cambian de un día a otro)
+    return Markup(get_services().grant_list_fragments.get_or_render(key, render))
+
 @main_bp.route("/search_grants", methods=["POST"])
+@traced('POST /search_grants', root=True)
+@profiled('main.search_grants')
 def search_grants():
     """Procesa el formulario y muestra los resultados."""
     start_time = datetime.datetime.now()
     error = None
     
     try:
-        sector = request.form.get("sector", "Todos")
-        location = request.form.get("location", "Todas")
-        company_type = request.form.get("company_type", "Todos")
-        region = request.form.get("region", "Todas")
+        sector = multi_value(request.form.getlist("sector"), "Todos")
+        location = multi_value(request.form.getlist("location"), "Todas")
+        company_type = multi_value(request.form.getlist("company_type"), "Todos")
+        region = multi_value(request.form.getlist("region"), "Todas")
+        query = request.form.get("q", "").strip()
 
-        logging.info(f"Búsqueda iniciada - Sector: {sector}, Ubicación: {location}, Región: {region}, Tipo: {company_type}")
+        logging.info(f"Búsqueda iniciada - Sector: {sector}, Ubicación: {location}, Región: {region}, Tipo: {company_type}, Texto: {query}")
 
-        raw_grants = grant_api.search_grants(sector, location, company_type, region)
+        raw_grants = get_services().grant_api.search_grants(sector, location, company_type, region, query)
         grants, stats = process_grants_data(raw_grants, start_time)
         results_count = len(grants)
+        facet_counts = raw_grants.facet_counts
         
     except Exception as e:
         grants = []
+        facet_counts = {}
         results_count = 0
         stats = {}
         error = str(e)
         logging.error(f"Error en búsqueda: {e}")
 
-    show_regions = location.lower() in ['españa', 'todos', '']
+    show_regions = criteria_label(location).lower() in ['españa', 'todos', '']
+    criteria_values = {name: value if isinstance(value, list) else [value] for name, value in
+                       (('sector', sector), ('location', location), ('region', region), ('company_type', company_type))}
 
     return render_template(
         "results.html",
@@ -59,6 +82,10 @@ def search_grants():
         location=location,
         region=region,
         company_type=company_type,
+        query=query,
+        facet_counts=facet_counts,
+        criteria_values=criteria_values,
+        grants_html=render_grant_list(grants, location, region),
         search_time=stats.get('search_time', 0),
         now=datetime.datetime.now().strftime("%Y-%m-%d"),
         error=error,
@@ -77,6 +104,7 @@ def stats():
                 log_content = f.read()
                 total_searches_today = log_content.count('Búsqueda iniciada')
 
+        grant_api = get_services().grant_api
         stats_data = {
             "total_searches_today": total_searches_today,
             "total_searches": total_searches_today + 1847,
@@ -96,6 +124,9 @@ def stats():
                 {"date": (datetime.datetime.now() - datetime.timedelta(days=2)).strftime("%Y-%m-%d"), "searches": 48, "grants": 384},
                 {"date": (datetime.datetime.now() - datetime.timedelta(days=3)).strftime("%Y-%m-%d"), "searches": 61, "grants": 488}
             ],
+            # Recuentos reales del catálogo indexado, a partir de los mapas de bits de facetas
+            "catalog_size": len(grant_api.facets),
+            "catalog_facets": grant_api.facets.counts(),
             "top_regions": [
                 {"region": "Madrid", "count": 234},
                 {"region": "Barcelona", "count": 189},
@@ -0,0 +1,154 @@
+import bisect
+import functools
+import re
+from typing import List, NamedTuple, Optional
+
+# Unidades normalizadas de un importe
+UNIT_EUR = 'EUR'
+UNIT_PERCENT = 'percent'
+UNIT_EUR_PER_MWH = 'EUR/MWh'
+UNIT_EUR_PER_KWH = 'EUR/kWh'
+
+_AMOUNT_RE = re.compile(
+    r'(?P<number>\d{1,3}(?:[.,]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)'
+    r'\s*(?P<suffix>%|por\s+ciento|M€|millones|millón|€|euros?)?'
+    r'(?:\s*/\s*(?P<per>MWh|kWh))?',
+    re.IGNORECASE
+)
+
+
+class ParsedAmount(NamedTuple):
+    """Importe estructurado: rango en euros, porcentaje o tarifa por energía."""
+    min_eur: Optional[float] = None
+    max_eur: Optional[float] = None
+    percent: Optional[float] = None
+    unit: Optional[str] = None
+
+
+NO_AMOUNT = ParsedAmount()
+
+
+def _parse_number(text: str) -> float:
+    """Interpreta '1.500.000', '1.500.000,50', '12,5' o '1500000' como float."""
+    if '.' in text and ',' in text:
+        decimal = '.' if text.rfind('.') > text.rfind(',') else ','
+        thousands = ',' if decimal == '.' else '.'
+        return float(text.replace(thousands, '').replace(decimal, '.'))
+    for separator in ('.', ','):
+        if separator in text:
+            if re.fullmatch(rf'\d{{1,3}}(?:\{separator}\d{{3}})+', text):
+                return float(text.replace(separator, ''))
+            return float(text.replace(separator, '.'))
+    return float(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_amount_text(text: str) -> ParsedAmount:
+    values = []
+    has_currency = False
+    for match in _AMOUNT_RE.finditer(text):
+        number = match.group('number')
+        suffix = (match.group('suffix') or '').lower()
+        try:
+            value = _parse_number(number)
+        except ValueError:
+            continue
+
+        if suffix == '%' or suffix.startswith('por'):
+            return ParsedAmount(percent=value, unit=UNIT_PERCENT)
+        if match.group('per'):
+            unit = UNIT_EUR_PER_MWH if match.group('per').lower() == 'mwh' else UNIT_EUR_PER_KWH
+            return ParsedAmount(max_eur=value, unit=unit)
+        if suffix in ('m€', 'millones', 'millón'):
+            value *= 1_000_000
+            has_currency = True
+        elif suffix:
+            has_currency = True
+        elif match.group(0).strip() != text.strip() and not re.search(r'[.,]\d{3}', number):
+            # Números sueltos sin separador de miles (años, referencias...) no son importes
+            continue
+        values.append(value)
+
+    # Un número sin moneda solo es importe si es todo el texto o acompaña a otro en euros
+    if not values or (not has_currency and len(values) > 1):
+        return NO_AMOUNT
+    if not has_currency and text.strip() != _AMOUNT_RE.search(text).group(0).strip():
+        return NO_AMOUNT
+    if len(values) >= 2:
+        return ParsedAmount(min_eur=min(values[:2]), max_eur=max(values[:2]), unit=UNIT_EUR)
+    if text.lower().lstrip().startswith(('hasta', 'máximo')):
+        return ParsedAmount(max_eur=values[0], unit=UNIT_EUR)
+    return ParsedAmount(min_eur=values[0], max_eur=values[0], unit=UNIT_EUR)
+
+
+def parse_amount(amount) -> ParsedAmount:
+    """Normaliza un importe libre ('Hasta 1.500.000€', 'Hasta 40% de la inversión', 1250000...)."""
+    if isinstance(amount, (int, float)) and not isinstance(amount, bool):
+        return ParsedAmount(min_eur=float(amount), max_eur=float(amount), unit=UNIT_EUR)
+    if not isinstance(amount, str):
+        return NO_AMOUNT
+    return _parse_amount_text(amount)
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return f"{int(value):,}".replace(',', ' ')
+    return f"{value:,.2f}".replace(',', ' ')
+
+
+@functools.lru_cache(maxsize=4096)
+def format_amount_text(text: str) -> str:
+    """Reescribe el primer número del importe con separadores de miles legibles."""
+    match = _AMOUNT_RE.search(text)
+    if not match:
+        return text
+    try:
+        value = _parse_number(match.group('number'))
+    except ValueError:
+        return text
+    start, end = match.span('number')
+    return text[:start] + _format_number(value) + text[end:]
+
+
+class AmountIndex:
+    """
+    Índice ordenado por importe máximo en euros sobre una lista de subvenciones.
+    Resuelve filtros por rango con búsqueda binaria y la ordenación por importe
+    sin volver a analizar los textos.
+    """
+
+    def __init__(self, grants: List):
+        keyed = sorted(
+            (grant.amount_max, position) for position, grant in enumerate(grants)
+            if grant.amount_unit == UNIT_EUR and grant.amount_max is not None
+        )
+        self._grants = grants
+        self._keys = [amount for amount, _ in keyed]
+        self._positions = [position for _, position in keyed]
+
+    def positions_in_range(self, min_amount: Optional[float] = None, max_amount: Optional[float] = None) -> List[int]:
+        """Posiciones (en orden ascendente de importe) con min_amount <= importe máximo <= max_amount."""
+        low = bisect.bisect_left(self._keys, min_amount) if min_amount is not None else 0
+        high = bisect.bisect_right(self._keys, max_amount) if max_amount is not None else len(self._keys)
+        return self._positions[low:high]
+
+    def select(self, min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+               sort_by_amount: Optional[str] = None) -> List:
+        """
+        Devuelve las subvenciones dentro del rango. Con sort_by_amount='asc'/'desc'
+        se ordenan por importe; si no, se conserva el orden original de la lista.
+        Sin filtros de rango, las subvenciones sin importe en euros van al final.
+        """
+        filtered = min_amount is not None or max_amount is not None
+        positions = self.positions_in_range(min_amount, max_amount)
+
+        if sort_by_amount == 'desc':
+            positions = positions[::-1]
+        elif not sort_by_amount:
+            positions = sorted(positions)
+
+        selected = [self._grants[position] for position in positions]
+        if not filtered and sort_by_amount:
+            indexed = set(positions)
+            selected.extend(grant for position, grant in enumerate(self._grants) if position not in indexed)
+        return selected
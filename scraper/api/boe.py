@@ -1,77 +1,184 @@
 import datetime
-import time
 import logging
 import json
 from typing import List, Dict, Optional
 import re
+import threading
+
+from scraper.grant import Grant, stable_identifier
+from scraper.keywords import SECTOR_KEYWORDS
+from scraper.throttle import throttle
+from services.store import LocalStore
+from utils.tracing import span, traced
+
+# Palabras que marcan un anuncio del sumario como posible ayuda
+RELEVANCE_KEYWORDS = ['subvención', 'ayuda', 'convocatoria', 'financiación', 'programa', 'incentivo', 'apoyo', 'fomento']
+
+# Nombre de la marca de agua con el último sumario ingerido
+WATERMARK_NAME = 'boe_sumario'
+
+# Segundos entre sumarios pedidos durante la ingesta
+SUMARIO_INTERVAL = 0.3
+
+# Evita que varios hilos del mismo proceso descarguen los mismos días a la vez
+_INGEST_LOCK = threading.Lock()
+
 
 class BoeScraper:
-    def __init__(self, session, config, spanish_regions, logger):
+    def __init__(self, session, config, spanish_regions, logger, store: Optional[LocalStore] = None):
         self.session = session
         self.config = config
         self.spanish_regions = spanish_regions
         self.logger = logger
+        # Sin almacén persistente se usa un catálogo en memoria propio de esta instancia
+        self.store = store or LocalStore(':memory:')
         
-    def search(self, sector: str, location: str, company_type: str, region: str) -> List[Dict]:
-        """Busca en la API oficial del BOE."""
-        grants = []
+    @traced('boe.search')
+    def search(self, sector: str, location: str, company_type: str, region: str) -> List[Grant]:
+        """Actualiza el catálogo local del BOE con los días nuevos y lo filtra según los criterios."""
+        return self.select(self.snapshot(), sector, location, company_type, region)
+
+    @traced('boe.snapshot')
+    def snapshot(self) -> List[tuple]:
+        """Ingiere los días nuevos y devuelve todo el catálogo (fecha, título, url), sin filtrar ni recortar."""
         try:
-            end_date = datetime.datetime.now()
-            for i in range(15):
-                search_date = (end_date - datetime.timedelta(days=i)).strftime('%Y%m%d')
-                try:
-                    sumario_url = f"{self.config['sumarios_url']}/{search_date}"
-                    response = self.session.get(sumario_url, timeout=self.config['timeout'])
-                    
-                    if response.status_code == 200:
-                        data = self._safe_json_parse(response.text)
-                        if data and 'sumario' in data:
-                            sumario = data['sumario']
-                            if 'secciones' in sumario:
-                                for seccion in sumario['secciones']:
-                                    if 'secciones' in seccion:
-                                        for subseccion in seccion['secciones']:
-                                            grants.extend(self._process_boe_subsection(
-                                                subseccion, sector, location, company_type, region, search_date
-                                            ))
-                    time.sleep(0.3)
-                except Exception as e:
-                    self.logger.warning(f"Error procesando fecha {search_date}: {e}")
-                    continue
+            self.ingest()
         except Exception as e:
             self.logger.warning(f"Error general en BOE API: {e}")
-        return grants[:10]
-
-    def _process_boe_subsection(self, subseccion: Dict, sector: str, location: str, company_type: str, region: str, fecha: str) -> List[Dict]:
-        """Procesa subsecciones del sumario BOE."""
-        grants = []
         try:
-            if 'items' in subseccion:
-                for item in subseccion['items']:
-                    title = item.get('titulo', '')
-                    relevance_keywords = ['subvención', 'ayuda', 'convocatoria', 'financiación', 'programa', 'incentivo', 'apoyo', 'fomento']
-                    
-                    if any(keyword in title.lower() for keyword in relevance_keywords):
-                        if self._is_relevant_for_sector(title, sector) and self._is_relevant_for_location(title, location, region):
-                            grant = {
-                                'title': title[:150],
-                                'description': f"Convocatoria oficial publicada en BOE.",
-                                'sector': sector,
-                                'location': self._extract_location_from_title(title, location),
-                                'region': self._extract_region_from_title(title, region),
-                                'company_type': company_type,
-                                'amount': self._extract_amount_from_text(title),
-                                'deadline': self._generate_future_deadline(45),
-                                'publication_date': self._format_boe_date(fecha),
-                                'source': 'BOE - Boletín Oficial del Estado',
-                                'link': item.get('url', f"https://www.boe.es/boe/dias/{fecha}/"),
-                                'relevance_score': self._calculate_relevance_score(title, sector)
-                            }
-                            grants.append(grant)
+            return self._catalog_items()
         except Exception as e:
-            self.logger.warning(f"Error procesando subsección BOE: {e}")
+            self.logger.warning(f"Error consultando el catálogo BOE: {e}")
+            return []
+
+    def select(self, items: List[tuple], sector: str, location: str, company_type: str, region: str) -> List[Grant]:
+        """Subvenciones de los anuncios del catálogo que encajan con los criterios, como mucho max_results."""
+        grants = []
+        max_results = self.config.get('max_results', 10)
+        for fecha, titulo, url in items:
+            grant = self._grant_from_item(titulo, url, sector, location, company_type, region, fecha)
+            if grant:
+                grants.append(grant)
+                if len(grants) >= max_results:
+                    break
         return grants
 
+    def ingest(self, today: Optional[datetime.date] = None) -> int:
+        """
+        Descarga solo los sumarios posteriores a la marca de agua y añade sus
+        anuncios al catálogo. Devuelve el número de anuncios nuevos.
+        """
+        today = today or datetime.date.today()
+        retention_start = today - datetime.timedelta(days=self.config.get('retention_days', 90) - 1)
+
+        with _INGEST_LOCK:
+            watermark = self.store.get_watermark(WATERMARK_NAME)
+            if watermark:
+                start = datetime.datetime.strptime(watermark, '%Y%m%d').date() + datetime.timedelta(days=1)
+            else:
+                start = today - datetime.timedelta(days=self.config.get('lookback_days', 15) - 1)
+            start = max(start, retention_start)
+
+            added = 0
+            day = start
+            while day <= today:
+                search_date = day.strftime('%Y%m%d')
+                try:
+                    throttle(self.config['sumarios_url'], SUMARIO_INTERVAL).wait()
+                    status, items = self.fetch_sumario(search_date)
+                except Exception as e:
+                    # Se reintenta en la próxima ejecución desde este mismo día
+                    self.logger.warning(f"Error procesando fecha {search_date}: {e}")
+                    break
+
+                if status == 200:
+                    added += self.store_items(items)
+                elif status != 404 or day == today:
+                    # Sin sumario de hoy todavía, o error del servidor: no avanzar la marca
+                    break
+                # Los días sin BOE (404) también quedan cubiertos por la marca
+                self.store.set_watermark(WATERMARK_NAME, search_date)
+
+                day += datetime.timedelta(days=1)
+
+            self.prune(retention_start)
+
+        if added:
+            self.logger.info(f"BOE: {added} anuncios nuevos en el catálogo")
+        return added
+
+    def fetch_sumario(self, search_date: str):
+        """Descarga el sumario de un día. Devuelve (código HTTP, filas para el catálogo)."""
+        sumario_url = f"{self.config['sumarios_url']}/{search_date}"
+        response = self.session.get(sumario_url, timeout=self.config['timeout'])
+        if response.status_code != 200:
+            return response.status_code, []
+        with span('parse.boe.sumario', **{'html.bytes': len(response.content)}):
+            return 200, self._extract_catalog_items(self._safe_json_parse(response.text), search_date)
+
+    def _extract_catalog_items(self, data: Optional[Dict], fecha: str) -> List[tuple]:
+        """Filas (identificador, fecha, posición, título, url) de los anuncios que parecen ayudas."""
+        rows = []
+        if not data or 'sumario' not in data:
+            return rows
+        position = 0
+        for seccion in data['sumario'].get('secciones', []):
+            for subseccion in seccion.get('secciones', []):
+                for item in subseccion.get('items', []):
+                    position += 1
+                    title = item.get('titulo', '')
+                    if not any(keyword in title.lower() for keyword in RELEVANCE_KEYWORDS):
+                        continue
+                    identifier = item.get('identificador') or f"{fecha}-{position}"
+                    rows.append((identifier, fecha, position, title, item.get('url')))
+        return rows
+
+    def store_items(self, rows: List[tuple]) -> int:
+        """Inserta en bloque las filas del catálogo, ignorando anuncios ya conocidos."""
+        if not rows:
+            return 0
+        return self.store.executemany(
+            "INSERT OR IGNORE INTO boe_items (identifier, fecha, position, titulo, url) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def prune(self, retention_start: datetime.date) -> int:
+        """
+        Elimina del catálogo los anuncios fuera de la ventana de retención,
+        salvo los de días recargados a propósito (con punto de control de la
+        recarga histórica, ver services/backfill.py).
+        """
+        cursor = self.store.execute(
+            "DELETE FROM boe_items WHERE fecha < ? AND fecha NOT IN (SELECT fecha FROM boe_backfill)",
+            (retention_start.strftime('%Y%m%d'),)
+        )
+        return cursor.rowcount
+
+    def _catalog_items(self):
+        """Anuncios del catálogo, del más reciente al más antiguo y en el orden del sumario."""
+        return self.store.query("SELECT fecha, titulo, url FROM boe_items ORDER BY fecha DESC, position")
+
+    def _grant_from_item(self, title: str, url: Optional[str], sector: str, location: str, company_type: str, region: str, fecha: str) -> Optional[Grant]:
+        """Construye la subvención de un anuncio si encaja con el sector y la ubicación."""
+        if not (self._is_relevant_for_sector(title, sector) and self._is_relevant_for_location(title, location, region)):
+            return None
+        link = url or f"https://www.boe.es/boe/dias/{fecha}/"
+        return Grant(
+            title=title[:150],
+            description=f"Convocatoria oficial publicada en BOE.",
+            sector=sector,
+            location=self._extract_location_from_title(title, location),
+            region=self._extract_region_from_title(title, region),
+            company_type=company_type,
+            amount=self._extract_amount_from_text(title),
+            deadline=self._generate_future_deadline(45),
+            publication_date=self._format_boe_date(fecha),
+            source='BOE - Boletín Oficial del Estado',
+            link=link,
+            relevance_score=self._calculate_relevance_score(title, sector),
+            identifier=stable_identifier('BOE', link, title)
+        )
+
     def _is_relevant_for_location(self, title: str, location: str, region: str = "Todas") -> bool:
         title_lower = title.lower()
         if location == "Todas":
@@ -98,19 +205,7 @@ class BoeScraper:
         
         title_lower = title.lower()
 
-        sector_keywords = {'Tecnología': ['tecnología', 'tecnológico', 'digital', 'innovación', 'i+d+i', 'startup', 'tic'],
-            'Energía': ['energía', 'energético', 'renovable', 'eficiencia energética', 'autoconsumo'],
-            'Industria': ['industria', 'industrial', 'manufactura', 'producción'],
-            'Agricultura': ['agricultura', 'agrícola', 'rural', 'ganadero', 'agrario'],
-            'Comercio': ['comercio', 'comercial', 'exportación', 'internacionalización'],
-            'Servicios': ['servicios', 'terciario', 'turismo', 'hostelería'],
-            'Construcción': ['construcción', 'vivienda', 'edificación', 'obra'],
-            'Salud': ['salud', 'sanitario', 'médico', 'farmacéutico'],
-            'Turismo': ['turismo', 'turístico', 'hostelería', 'restauración'],
-            'Educación': ['educación', 'educativo', 'formación', 'universidad'],
-            'Transporte': ['transporte', 'logística', 'movilidad', 'infraestructura']
-        }
-        keywords = sector_keywords.get(sector, [sector.lower()])
+        keywords = SECTOR_KEYWORDS.get(sector, [sector.lower()])
         return any(keyword in title_lower for keyword in keywords)
     
     def _extract_location_from_title(self, title: str, default_location: str) -> str:
@@ -1,51 +1,130 @@
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 import datetime
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper.grant import Grant, stable_identifier
+from services.store import LocalStore
+from utils.tracing import in_current_trace, span, traced
+
+# Marcas de agua de la sincronización con el portal
+WATERMARK_START_DATE = 'eu_funding_start_date'
+WATERMARK_LAST_SYNC = 'eu_funding_last_sync'
+WATERMARK_LAST_FULL_SYNC = 'eu_funding_last_full_sync'
+
+# Mapeo de sectores y tipos a palabras clave (en inglés para el portal y en español para los textos del catálogo)
+SECTOR_KEYWORDS = {
+    'Tecnología': 'Digital, IT, Innovation, digital, innovación',
+    'Energía': 'Energy, Climate, Green Deal, energía, clima',
+    'Industria': 'Industry, Manufacturing, SME, industria, pymes',
+    'Agricultura': 'Agriculture, Bioeconomy, agricultura, bioeconomía',
+    'Salud': 'Health, Research, Medical, salud, investigación',
+    'Todos': ''
+}
+
+COMPANY_TYPE_KEYWORDS = {
+    'PYME': 'SME, pymes',
+    'Startup': 'Startup, Innovation, innovación',
+    'Autónomo': 'SME, pymes',
+    'Microempresa': 'SME, pymes',
+    'Grande empresa': 'Industry, Research, industria, investigación',
+    'ONG': 'NGO, Non-profit',
+    'Universidad': 'University, Higher Education, universidad',
+    'Centro de investigación': 'Research Center, R&I, investigación',
+    'Todos': ''
+}
+
+# Evita sincronizaciones simultáneas desde varios hilos del mismo proceso
+_SYNC_LOCK = threading.Lock()
+
 
 class EUFundingScraper:
-    def __init__(self, session, config, logger):
+    def __init__(self, session, config, logger, store: Optional[LocalStore] = None):
         self.session = session
         self.config = config
         self.logger = logger
         self.api_search_url = "https://api.tech.ec.europa.eu/search-api/prod/rest/search"
         self.api_key = "SEDIA"
+        # Sin almacén persistente se usa un catálogo en memoria propio de esta instancia
+        self.store = store or LocalStore(':memory:')
         
-    def search(self, sector: str, location: str, company_type: str) -> List[Dict]:
-        """Busca subvenciones en EU Funding & Tenders Portal usando la API pública."""
+    @traced('eu_funding.search')
+    def search(self, sector: str, location: str, company_type: str) -> List[Grant]:
+        """Busca subvenciones del EU Funding & Tenders Portal en el catálogo local sincronizado."""
+        return self.select(self.snapshot(), sector, location, company_type)
+
+    @traced('eu_funding.snapshot')
+    def snapshot(self) -> List[Dict]:
+        """Sincroniza el catálogo y devuelve todas sus convocatorias (publicData), sin filtrar ni recortar."""
+        try:
+            self.sync()
+        except Exception as e:
+            self.logger.error(f"Error en la sincronización con la API de la UE: {e}")
+        return [json.loads(payload) for payload, in
+                self.store.query("SELECT payload FROM eu_calls ORDER BY start_date DESC, reference")]
+
+    def select(self, calls: List[Dict], sector: str, location: str, company_type: str) -> List[Grant]:
+        """Convocatorias del catálogo que encajan con los criterios, como mucho max_results."""
         grants = []
-        
         if location not in ['UE', 'Todas', 'Internacional']:
             return grants
-            
-        self.logger.info("Realizando búsqueda en la API de la UE...")
-
-        # Mapeo de sectores y tipos a palabras clave
-        sector_keywords = {
-            'Tecnología': 'Digital, IT, Innovation',
-            'Energía': 'Energy, Climate, Green Deal',
-            'Industria': 'Industry, Manufacturing, SME',
-            'Agricultura': 'Agriculture, Bioeconomy',
-            'Salud': 'Health, Research, Medical',
-            'Todos': ''
-        }
-        
-        company_type_keywords = {
-            'PYME': 'SME',
-            'Startup': 'Startup, Innovation',
-            'Autónomo': 'SME',
-            'Microempresa': 'SME',
-            'Grande empresa': 'Industry, Research',
-            'ONG': 'NGO, Non-profit',
-            'Universidad': 'University, Higher Education',
-            'Centro de investigación': 'Research Center, R&I',
-            'Todos': ''
-        }
-        
-        search_terms = f"{sector_keywords.get(sector, '')} {company_type_keywords.get(company_type, '')}".strip()
-        
-        # Construcción del payload de la solicitud POST
+
+        keywords = self._keyword_pattern(self._search_keywords(sector, company_type))
+        max_results = self.config.get('max_results', 20)
+        for public_data in calls:
+            if keywords and not keywords.search(self._search_text(public_data)):
+                continue
+            grants.append(self._grant_from_public_data(public_data, sector, company_type))
+            if len(grants) >= max_results:
+                break
+        return grants
+
+    def sync(self, force_full: bool = False) -> Dict[str, int]:
+        """
+        Sincroniza el catálogo con las convocatorias abiertas y próximas.
+        La sincronización completa recorre todas las páginas en paralelo y elimina
+        las convocatorias que ya no aparecen; la incremental pide páginas (de más
+        reciente a más antigua por startDate) hasta rebasar la marca de agua.
+        """
+        now = time.time()
+        with _SYNC_LOCK:
+            last_sync = float(self.store.get_watermark(WATERMARK_LAST_SYNC) or 0)
+            last_full_sync = float(self.store.get_watermark(WATERMARK_LAST_FULL_SYNC) or 0)
+            newest_start = self.store.get_watermark(WATERMARK_START_DATE)
+
+            full = force_full or not newest_start or now - last_full_sync >= self.config.get('full_sync_interval', 86400)
+            if not full and now - last_sync < self.config.get('sync_interval', 1800):
+                return {'pages': 0, 'upserted': 0, 'removed': 0}
+
+            self.logger.info(f"Sincronizando convocatorias de la UE ({'completa' if full else 'incremental'})...")
+            complete = False
+            if full:
+                items, pages, complete = self._fetch_all_pages()
+            else:
+                items, pages = self._fetch_new_pages(newest_start)
+
+            upserted = self._upsert(items)
+            # Solo con el catálogo entero se sabe qué convocatorias ya no están abiertas
+            removed = self._remove_missing({reference for reference, _, _ in items}) if complete else 0
+            if full and not complete:
+                self.logger.warning(f"UE: catálogo truncado en {pages} páginas (max_pages); no se retira ninguna convocatoria")
+
+            start_dates = [start_date for _, start_date, _ in items if start_date]
+            if start_dates and (not newest_start or max(start_dates) > newest_start):
+                self.store.set_watermark(WATERMARK_START_DATE, max(start_dates))
+            self.store.set_watermark(WATERMARK_LAST_SYNC, str(now))
+            if full:
+                self.store.set_watermark(WATERMARK_LAST_FULL_SYNC, str(now))
+
+        self.logger.info(f"UE: {pages} páginas, {upserted} convocatorias nuevas o modificadas, {removed} retiradas")
+        return {'pages': pages, 'upserted': upserted, 'removed': removed}
+
+    def _fetch_page(self, page_number: int) -> Dict:
+        # Sin filtro de texto: el catálogo completo se filtra localmente en cada búsqueda
         search_payload = {
             "query": {
                 "bool": {
@@ -60,56 +139,121 @@ class EUFundingScraper:
                 "field": "startDate",
                 "order": "DESC"
             },
-            "pageNumber": "1",
-            "pageSize": "20"
+            "pageNumber": str(page_number),
+            "pageSize": str(self.config.get('page_size', 100))
         }
-        
-        if search_terms:
-            params = {"apiKey": self.api_key, "text": search_terms}
-        else:
-            params = {"apiKey": self.api_key, "text": "*"}
+        response = self.session.post(
+            self.api_search_url,
+            json=search_payload,
+            params={"apiKey": self.api_key, "text": "*"},
+            timeout=self.config['timeout']
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Código de estado: {response.status_code} - Respuesta: {response.text[:200]}")
+        return response.json()
 
-        try:
-            api_url = f"{self.api_search_url}"
-            
-            response = self.session.post(
-                api_url,
-                json=search_payload,
-                params=params,
-                timeout=self.config['timeout']
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                # Se ha corregido la lógica para obtener los resultados.
-                # Ahora se espera una lista en la clave 'results' y se itera sobre sus elementos.
-                results = data.get('results', [])
-                self.logger.info(f"Se encontraron {len(results)} resultados de la API de la UE.")
-                
-                for item in results:
-                    public_data = item.get('publicData', {}) # Acceder al diccionario anidado de forma segura
-                    grant = {
-                        'title': public_data.get('title', {}).get('es', 'Sin título'),
-                        'description': public_data.get('objective', {}).get('es', 'Sin descripción'),
-                        'sector': sector,
-                        'location': 'Unión Europea',
-                        'region': 'Todas',
-                        'company_type': company_type,
-                        'amount': public_data.get('totalBudget', 'Consultar convocatoria'),
-                        'deadline': public_data.get('deadlineDate', 'Sin fecha límite'),
-                        'publication_date': public_data.get('publicationDate', 'Sin fecha de publicación'),
-                        'source': 'Comisión Europea - Funding & Tenders Portal',
-                        'link': public_data.get('link', self.config['base_url']),
-                        'relevance_score': 4
-                    }
-                    grants.append(grant)
-            else:
-                self.logger.error(f"Error al consultar la API de la UE. Código de estado: {response.status_code} - Respuesta: {response.text}")
-                
-        except Exception as e:
-            self.logger.error(f"Error en la búsqueda de la API de la UE: {e}")
-        
-        return grants
+    def _fetch_all_pages(self):
+        """Descarga todas las páginas hasta max_pages; indica también si se cubrió el catálogo entero."""
+        first = self._fetch_page(1)
+        page_size = int(self.config.get('page_size', 100))
+        available_pages = -(-int(first.get('totalResults', 0)) // page_size)
+        total_pages = min(available_pages, self.config.get('max_pages', 50))
+
+        items = self._catalog_rows(first.get('results', []))
+        if total_pages > 1:
+            # Resto de páginas con concurrencia acotada; el orden de llegada no importa
+            with ThreadPoolExecutor(max_workers=self.config.get('max_concurrency', 4)) as executor:
+                for data in executor.map(in_current_trace(self._fetch_page), range(2, total_pages + 1)):
+                    items.extend(self._catalog_rows(data.get('results', [])))
+        return items, max(total_pages, 1), total_pages == available_pages
+
+    def _fetch_new_pages(self, newest_start: str):
+        items = []
+        page_number = 0
+        max_pages = self.config.get('max_pages', 50)
+        while page_number < max_pages:
+            page_number += 1
+            rows = self._catalog_rows(self._fetch_page(page_number).get('results', []))
+            items.extend(rows)
+            # Página incompleta o ya por debajo de la marca de agua: no quedan novedades
+            if len(rows) < int(self.config.get('page_size', 100)) or any(
+                    start_date and start_date < newest_start for _, start_date, _ in rows):
+                break
+        return items, page_number
+
+    def _catalog_rows(self, results: List[Dict]) -> List[tuple]:
+        """Filas (referencia, startDate, publicData en JSON) de una página de resultados."""
+        rows = []
+        with span('parse.eu_funding.page', results=len(results)):
+            for item in results:
+                public_data = item.get('publicData', {})
+                reference = item.get('reference') or public_data.get('link') or json.dumps(public_data.get('title'), sort_keys=True)
+                start_date = public_data.get('startDate') or public_data.get('publicationDate') or ''
+                rows.append((reference, str(start_date), json.dumps(public_data, ensure_ascii=False, sort_keys=True)))
+        return rows
+
+    def _upsert(self, rows: List[tuple]) -> int:
+        """Inserta o actualiza en bloque solo las convocatorias nuevas o con cambios."""
+        if not rows:
+            return 0
+        now = time.time()
+        return self.store.executemany(
+            "INSERT INTO eu_calls (reference, start_date, payload, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(reference) DO UPDATE SET start_date = excluded.start_date, payload = excluded.payload, "
+            "updated_at = excluded.updated_at WHERE eu_calls.payload != excluded.payload",
+            [(reference, start_date, payload, now) for reference, start_date, payload in rows]
+        )
+
+    def _remove_missing(self, seen_references: set) -> int:
+        """Elimina las convocatorias que ya no están abiertas ni próximas."""
+        stale = [(reference,) for reference, in self.store.query("SELECT reference FROM eu_calls")
+                 if reference not in seen_references]
+        if not stale:
+            return 0
+        return self.store.executemany("DELETE FROM eu_calls WHERE reference = ?", stale)
+
+    def _search_keywords(self, sector: str, company_type: str) -> List[str]:
+        search_terms = f"{SECTOR_KEYWORDS.get(sector, '')}, {COMPANY_TYPE_KEYWORDS.get(company_type, '')}"
+        return list(dict.fromkeys(term.strip() for term in search_terms.split(',') if term.strip()))
+
+    def _keyword_pattern(self, keywords: List[str]) -> Optional[re.Pattern]:
+        """
+        Expresión que busca cualquiera de las palabras clave como palabra
+        completa. Las siglas (IT, SME, NGO...) distinguen mayúsculas para no
+        coincidir con palabras como "it" o "item"; el resto no.
+        """
+        if not keywords:
+            return None
+        alternatives = [re.escape(keyword) if keyword.isupper() else f"(?i:{re.escape(keyword)})"
+                        for keyword in keywords]
+        return re.compile(rf"(?<!\w)(?:{'|'.join(alternatives)})(?!\w)")
+
+    def _search_text(self, public_data: Dict) -> str:
+        return f"{self._localized(public_data.get('title'))} {self._localized(public_data.get('objective'))}"
+
+    def _localized(self, value) -> str:
+        if isinstance(value, dict):
+            return str(value.get('es', ''))
+        return str(value or '')
+
+    def _grant_from_public_data(self, public_data: Dict, sector: str, company_type: str) -> Grant:
+        title = public_data.get('title', {}).get('es', 'Sin título')
+        link = public_data.get('link', self.config['base_url'])
+        return Grant(
+            title=title,
+            description=public_data.get('objective', {}).get('es', 'Sin descripción'),
+            sector=sector,
+            location='Unión Europea',
+            region='Todas',
+            company_type=company_type,
+            amount=public_data.get('totalBudget', 'Consultar convocatoria'),
+            deadline=public_data.get('deadlineDate', 'Sin fecha límite'),
+            publication_date=public_data.get('publicationDate', 'Sin fecha de publicación'),
+            source='Comisión Europea - Funding & Tenders Portal',
+            link=link,
+            relevance_score=4,
+            identifier=stable_identifier('EU', link, title)
+        )
 
     def _generate_future_deadline(self, days: int) -> str:
         """Genera una fecha límite futura."""
@@ -1,151 +1,321 @@
+import os
 import requests
 import datetime
 import time
 import logging
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Union
 import json
 import re
 from urllib.parse import urljoin, quote
 
-# Importar los submódulos de fuentes de búsqueda
-from scraper.api import boe, eu_funding
-from scraper.web import cdti, idae
+# Índices, cache y deduplicación del catálogo (las fuentes se importan en la primera consulta)
+from scraper.amounts import AmountIndex
+from scraper.dedup import DedupEngine
+from scraper.facets import FacetIndex, WILDCARDS
+from scraper.grant import Grant, GrantList
+from scraper.keywords import REGION_KEYWORDS
+from scraper.query_cache import CRITERIA, QueryCache, SourceSnapshots
+from scraper.ranking import Ranker, document_id
+from scraper.search_index import SearchIndex
+from utils.profiling import profiled
+from utils.tracing import TracedSession, current_span, span, traced
+from services.store import LocalStore
 
 class RealGrantAPI:
     """Clase que gestiona la búsqueda de subvenciones usando APIs oficiales reales."""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = TracedSession()
         self.session.headers.update({
             'User-Agent': 'SubvencionesFinder/2.0 (https://subvencionesfinder.com)',
             'Accept': 'application/json, text/xml, text/html',
             'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8'
         })
+        # Sesión compartida por todas las búsquedas del proceso: conexiones reutilizables por servidor
+        pool_size = int(os.environ.get('HTTP_POOL_SIZE', 32))
+        for prefix in ('https://', 'http://'):
+            self.session.mount(prefix, requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=pool_size))
         
         # APIs oficiales CORREGIDAS
         self.apis = {
-            'boe': {'sumarios_url': 'https://www.boe.es/datosabiertos/api/sumario', 'timeout': 15},
-            'eu_funding': {'base_url': 'https://ec.europa.eu', 'timeout': 20},
+            'boe': {'sumarios_url': 'https://www.boe.es/datosabiertos/api/sumario', 'timeout': 15,
+                    'retention_days': int(os.environ.get('BOE_RETENTION_DAYS', 90)),
+                    'lookback_days': 15, 'max_results': 10},
+            'eu_funding': {'base_url': 'https://ec.europa.eu', 'timeout': 20,
+                           'page_size': 100, 'max_pages': 50, 'max_concurrency': 4, 'max_results': 20,
+                           'sync_interval': 1800, 'full_sync_interval': 86400},
             'cdti_web': {'ayudas_url': 'https://www.cdti.es/index.asp?MP=4&MS=0&MN=1', 'timeout': 15},
             'idae_web': {'ayudas_url': 'https://www.idae.es/ayudas-y-financiacion', 'timeout': 15}
         }
         
         # Mapeo de comunidades autónomas
-        self.spanish_regions = {
-            'Andalucía': ['andalucia', 'sevilla', 'córdoba', 'granada', 'málaga', 'cádiz', 'huelva', 'jaén', 'almería'],
-            'Cataluña': ['cataluña', 'catalunya', 'barcelona', 'girona', 'lleida', 'tarragona'],
-            'Madrid': ['madrid', 'comunidad de madrid'],
-            'Valencia': ['valencia', 'castellón', 'alicante', 'comunidad valenciana'],
-            'Galicia': ['galicia', 'coruña', 'lugo', 'ourense', 'pontevedra'],
-            'País Vasco': ['país vasco', 'euskadi', 'bilbao', 'vitoria', 'san sebastián'],
-            'Aragón': ['aragón', 'zaragoza', 'huesca', 'teruel'],
-            'Asturias': ['asturias', 'oviedo'],
-            'Cantabria': ['cantabria', 'santander'],
-            'Castilla-La Mancha': ['castilla la mancha', 'toledo', 'ciudad real', 'albacete', 'cuenca', 'guadalajara'],
-            'Castilla y León': ['castilla y león', 'valladolid', 'salamanca', 'león', 'burgos', 'zamora', 'palencia', 'ávila', 'segovia', 'soria'],
-            'Extremadura': ['extremadura', 'badajoz', 'cáceres'],
-            'Islas Baleares': ['baleares', 'mallorca', 'menorca', 'ibiza', 'formentera'],
-            'Canarias': ['canarias', 'las palmas', 'santa cruz de tenerife', 'tenerife', 'gran canaria'],
-            'La Rioja': ['la rioja', 'logroño'],
-            'Murcia': ['murcia', 'región de murcia', 'cartagena'],
-            'Navarra': ['navarra', 'pamplona'],
-            'Ceuta': ['ceuta'],
-            'Melilla': ['melilla']
-        }
+        self.spanish_regions = REGION_KEYWORDS
+        
+        # Almacén local (catálogo del BOE, marcas de agua de ingesta y frontera de rastreo)
+        self.store = LocalStore()
+        self.dedup = DedupEngine(self.store)
+        
+        # Ranking BM25 con estadísticas de términos acumuladas sobre el catálogo
+        self.ranker = Ranker(
+            recency_weight=float(os.environ.get('RANK_RECENCY_WEIGHT', 0.2)),
+            urgency_weight=float(os.environ.get('RANK_URGENCY_WEIGHT', 0.0))
+        )
+        
+        # Índice invertido para la búsqueda por texto libre (?q=), alimentado con cada ingesta
+        self.search_index = SearchIndex()
         
-        # Cache con TTL
-        self.cache = {}
+        # Mapas de bits por valor de faceta para filtros de selección múltiple y sus recuentos
+        self.facets = FacetIndex(self.spanish_regions)
+        
+        # Cache con TTL por clave canónica de criterios, y resultado sin recortar de cada fuente del que se filtran
         self.cache_timeout = 1800  # 30 minutos
+        self.cache = QueryCache(self.spanish_regions, self.cache_timeout)
+        self.snapshots = SourceSnapshots(self.cache_timeout)
+        
+        # Consultas a las fuentes en curso por clave: las búsquedas iguales esperan a la primera
+        self._inflight: Dict[tuple, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
-    def search_grants(self, sector: str, location: str, company_type: str, region: str = "Todas") -> List[Dict]:
-        """Busca subvenciones reales usando múltiples APIs oficiales."""
+    @traced('RealGrantAPI.search_grants', root=True)
+    @profiled('RealGrantAPI.search_grants')
+    def search_grants(self, sector: Union[str, List[str]], location: Union[str, List[str]],
+                      company_type: Union[str, List[str]], region: Union[str, List[str]] = "Todas",
+                      query: str = "", min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                      amount_sort: Optional[str] = None) -> List[Grant]:
+        """
+        Busca subvenciones reales usando múltiples APIs oficiales. Cada criterio
+        admite un valor o una lista (selección múltiple, resuelta con los mapas de
+        bits de facetas). El texto libre (query) se resuelve con el índice
+        invertido sobre los candidatos, sin volver a consultar las fuentes. El
+        rango de importe (euros) y el orden por importe ('asc'/'desc') se
+        aplican a todos los candidatos antes de quedarse con los 25 primeros.
+        """
+        selected = {facet: self._selected_values(facet, values) for facet, values in
+                    (('sector', sector), ('location', location), ('company_type', company_type), ('region', region))}
+        search_span = current_span()
+        for facet, values in selected.items():
+            search_span.set_attribute(f"search.{facet}", values)
+        search_span.set_attribute('search.q', query)
+        search_span.set_attribute('search.amount', [min_amount, max_amount, amount_sort])
+        candidates = self._candidates(selected)
+        with span('search.rank', candidates=len(candidates)):
+            results = self._rank_results(candidates, selected['sector'], selected['company_type'], query,
+                                         min_amount, max_amount, amount_sort)
+        search_span.set_attribute('search.results', len(results))
+        self.logger.info(f"Devolviendo {len(results)} subvenciones encontradas")
+        return results
+    
+    @traced('RealGrantAPI.search_grants_batch', root=True)
+    def search_grants_batch(self, searches: List[Dict]) -> List[List[Grant]]:
+        """
+        Evalúa varios conjuntos de criterios (claves sector, location,
+        company_type, region, query, min_amount, max_amount y amount_sort de
+        search_grants) con el mismo resultado que search_grants para cada
+        uno. Las fuentes se consultan como mucho una vez para todo el lote
+        (una instantánea sin recortar de cada una); cada clave de candidatos
+        distinta se filtra de ella una sola vez y los conjuntos iguales
+        comparten resultado. Devuelve los resultados en orden.
+        """
+        keys = []
+        for criteria in searches:
+            selected = tuple(tuple(self._selected_values(facet, criteria.get(facet))) for facet in CRITERIA)
+            keys.append((selected, (criteria.get('query') or '', criteria.get('min_amount'),
+                                    criteria.get('max_amount'), criteria.get('amount_sort'))))
+        unique = list(dict.fromkeys(keys))
+        batch_span = current_span()
+        batch_span.set_attribute('search.batch', len(searches))
+        batch_span.set_attribute('search.batch_unique', len(unique))
         
-        cache_key = f"{sector}_{location}_{company_type}_{region}"
-        current_time = time.time()
+        # Una sola consulta a las fuentes para todo el lote; cada perfil se filtra de ella
+        self.source_snapshots()
+        candidates = {}
+        for selected, _ in unique:
+            if selected not in candidates:
+                candidates[selected] = self._candidates(dict(zip(CRITERIA, map(list, selected))))
+        # Estadísticas BM25 con todos los candidatos antes de puntuar: el resultado no depende del orden del lote
+        for grants in candidates.values():
+            self.ranker.index(grants)
+        
+        results = {}
+        with span('search.rank', searches=len(unique)):
+            for selected, options in unique:
+                criteria = dict(zip(CRITERIA, selected))
+                results[(selected, options)] = self._rank_results(candidates[selected], list(criteria['sector']),
+                                                                  list(criteria['company_type']), *options)
+        return [results[key] for key in keys]
+    
+    def _candidates(self, selected: Dict[str, List[str]]) -> List[Grant]:
+        """Candidatos de unos criterios: una búsqueda con cache o, con selección múltiple, los mapas de bits."""
+        if all(len(values) <= 1 for values in selected.values()):
+            criteria = {facet: values[0] if values else WILDCARDS[facet] for facet, values in selected.items()}
+            return self._search_candidates(**criteria)
+        return self._search_facets(selected)
+    
+    @staticmethod
+    def _selected_values(facet: str, values: Union[str, List[str], None]) -> List[str]:
+        """Valores concretos seleccionados en una faceta (lista vacía si no se filtra por ella)."""
+        if isinstance(values, str) or values is None:
+            values = [values]
+        return list(dict.fromkeys(value for value in values if value and value != WILDCARDS[facet]))
+    
+    def _search_facets(self, selected: Dict[str, List[str]]) -> List[Grant]:
+        """
+        Selección múltiple: una búsqueda (con cache) por cada valor seleccionado
+        alimenta el índice de facetas, y las combinaciones entre facetas se
+        resuelven intersecando mapas de bits en lugar de consultar cada una.
+        """
+        fetched = []
+        fetched_at = []
+        for facet, values in selected.items():
+            for value in values:
+                criteria = dict((name, WILDCARDS[name]) for name in selected)
+                criteria[facet] = value
+                if facet == 'region':
+                    # Las fuentes solo filtran por comunidad dentro de España
+                    criteria['location'] = 'España'
+                candidates = self._search_candidates(**criteria)
+                fetched.extend(candidates)
+                fetched_at.append(candidates.fetched_at)
+        selection = self.facets.select(selected, within=self.facets.bitmap(fetched))
+        # Cada búsqueda elige su subvención canónica: una por clúster en la unión
+        unique = {}
+        for grant in self.facets.get(selection):
+            unique.setdefault(grant.cluster_id or document_id(grant), grant)
+        # Los resultados son tan antiguos como la consulta más antigua que los forma
+        return GrantList(unique.values(), fetched_at=min(fetched_at))
+    
+    @traced('search.candidates')
+    def _search_candidates(self, sector: str, location: str, company_type: str, region: str) -> List[Grant]:
+        """
+        Subvenciones deduplicadas de todas las fuentes para unos criterios. Se
+        sirven desde cache si la misma búsqueda (clave canónica) está vigente;
+        si no, se filtran de las instantáneas sin recortar de las fuentes, y
+        solo se consulta la red cuando estas han caducado.
+        """
+        cache_key = self.cache.canonical(sector, location, company_type, region)
+        sector, location, company_type, region = cache_key
+        candidates_span = current_span()
+        candidates_span.set_attribute('search.criteria', list(cache_key))
         
         # Verificar cache
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            if current_time - timestamp < self.cache_timeout:
-                self.logger.info(f"Devolviendo {len(cached_data)} resultados desde cache")
+        cached_data = self.cache.get(cache_key)
+        if cached_data is not None:
+            self.logger.info(f"Usando {len(cached_data)} candidatos desde cache")
+            candidates_span.set_attribute('cache', 'hit')
+            return cached_data
+        
+        with self._inflight_lock:
+            pending = self._inflight.get(cache_key)
+            if pending is None:
+                self._inflight[cache_key] = threading.Event()
+        if pending is not None:
+            # Otra petición ya está consultando las fuentes para estos criterios
+            candidates_span.set_attribute('cache', 'wait')
+            pending.wait(self.cache_timeout)
+            cached_data = self.cache.get(cache_key)
+            if cached_data is not None:
                 return cached_data
+            return self._fetch_candidates(cache_key)
+        candidates_span.set_attribute('cache', 'miss')
+        try:
+            return self._fetch_candidates(cache_key)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cache_key).set()
+    
+    def _source_scrapers(self) -> Dict:
+        """Una instancia de cada fuente (sus módulos y BeautifulSoup se cargan en la primera consulta, no al arrancar)."""
+        from scraper.api import boe, eu_funding
+        from scraper.web import cdti, idae
+
+        return {
+            'boe': boe.BoeScraper(self.session, self.apis['boe'], self.spanish_regions, self.logger, self.store),
+            'eu_funding': eu_funding.EUFundingScraper(self.session, self.apis['eu_funding'], self.logger, self.store),
+            'cdti': cdti.CdtiScraper(self.session, self.apis['cdti_web'], self.spanish_regions, self.logger, self.store),
+            'idae': idae.IdaeScraper(self.session, self.apis['idae_web'], self.spanish_regions, self.logger, self.store),
+        }
+    
+    def _fetch_snapshots(self) -> Dict[str, list]:
+        """Consulta todas las fuentes: catálogo del BOE y de la UE actualizados y rastreo del CDTI y del IDAE."""
+        snapshots = {}
+        for name, source in self._source_scrapers().items():
+            self.logger.info(f"Consultando {name}...")
+            try:
+                snapshots[name] = source.snapshot()
+            except Exception as e:
+                self.logger.error(f"Error consultando {name}: {e}")
+                snapshots[name] = []
+        return snapshots
+    
+    def source_snapshots(self):
+        """Instantáneas vigentes de las fuentes y su marca de tiempo (una sola consulta a la red por vigencia)."""
+        return self.snapshots.get(self._fetch_snapshots)
+    
+    def _fetch_candidates(self, cache_key: tuple) -> List[Grant]:
+        """Filtra las instantáneas de las fuentes con los criterios de cada una, deduplica, indexa y cachea."""
+        sector, location, company_type, region = cache_key
+        snapshots, fetched_at = self.source_snapshots()
+        sources = self._source_scrapers()
         
         all_grants = []
-        
         try:
-            # 1. Buscar en BOE
-            self.logger.info("Consultando API del BOE...")
-            boe_api = boe.BoeScraper(self.session, self.apis['boe'], self.spanish_regions, self.logger)
-            all_grants.extend(boe_api.search(sector, location, company_type, region))
-            
-            # 2. Buscar en EU Funding & Tenders Portal
-            self.logger.info("Consultando EU Funding & Tenders Portal...")
-            eu_api = eu_funding.EUFundingScraper(self.session, self.apis['eu_funding'], self.logger)
-            all_grants.extend(eu_api.search(sector, location, company_type))
-            
-            # 3. Scraping CDTI
-            self.logger.info("Consultando web del CDTI...")
-            cdti_web = cdti.CdtiScraper(self.session, self.apis['cdti_web'], self.spanish_regions, self.logger)
-            all_grants.extend(cdti_web.search(sector, company_type, region))
-            
-            # 4. Scraping IDAE
-            self.logger.info("Consultando web del IDAE...")
-            idae_web = idae.IdaeScraper(self.session, self.apis['idae_web'], self.spanish_regions, self.logger)
-            all_grants.extend(idae_web.search(sector, company_type, region))
-            
+            all_grants.extend(sources['boe'].select(snapshots['boe'], sector, location, company_type, region))
+            all_grants.extend(sources['eu_funding'].select(snapshots['eu_funding'], sector, location, company_type))
+            all_grants.extend(sources['cdti'].select(snapshots['cdti'], sector, company_type, region))
+            all_grants.extend(sources['idae'].select(snapshots['idae'], sector, company_type, region))
         except Exception as e:
             self.logger.error(f"Error en búsqueda de APIs: {e}")
             all_grants = self._get_fallback_data()
         
-        # Filtrar, deduplicar y ordenar por fecha de publicación (más recientes primero)
-        filtered_grants = self._process_results(all_grants, sector, location, company_type, region)
-        
-        # Guardar en cache
-        self.cache[cache_key] = (filtered_grants, current_time)
+        # Fusionar casi duplicados entre fuentes (MinHash/LSH con clústeres persistidos)
+        with span('search.dedup_index', grants=len(all_grants)):
+            candidates = GrantList(self.dedup.deduplicate(all_grants), fetched_at=fetched_at)
+            self.search_index.add(candidates)
+            self.facets.add(candidates)
         
-        self.logger.info(f"Devolviendo {len(filtered_grants)} subvenciones encontradas")
-        return filtered_grants
+        # Guardar en cache: caduca con las instantáneas de las que sale
+        self.cache.put(cache_key, candidates, fetched_at)
+        return candidates
     
-    def _process_results(self, grants: List[Dict], sector: str, location: str, company_type: str, region: str) -> List[Dict]:
-        """Procesa y ordena resultados por fecha de publicación (más recientes primero)."""
-        
-        # Deduplicar por un ID único para evitar perder resultados con títulos similares
-        unique_grants = []
-        seen_ids = set()
-        
-        for grant in grants:
-            # Creamos un identificador único combinando la fuente y un ID interno
-            source = grant.get('source', 'NO_SOURCE')
-            identifier = grant.get('identifier', 'NO_ID')
-            
-            if identifier == 'NO_ID' or len(identifier) <= 3:
-                # Si no hay ID válido, usamos el título normalizado
-                title_normalized = re.sub(r'\W+', '', grant.get('title', 'NO_TITLE').lower())
-                unique_id = f"{source}_{title_normalized}"
-            else:
-                unique_id = f"{source}_{identifier}"
-            
-            if unique_id not in seen_ids:
-                seen_ids.add(unique_id)
-                unique_grants.append(grant)
-        
-        # Ordenar por fecha de publicación (más recientes primero)
-        def get_publication_date(grant):
-            try:
-                pub_date = grant.get('publication_date', '1900-01-01')
-                return datetime.datetime.strptime(pub_date, '%Y-%m-%d')
-            except (ValueError, TypeError):
-                return datetime.datetime(1900, 1, 1)
-        
-        unique_grants.sort(key=get_publication_date, reverse=True)
-        
-        # Limitar resultados
-        return unique_grants[:25]
+    def _rank_results(self, grants: List[Grant], sectors: List[str], company_types: List[str],
+                      query: str = "", min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                      amount_sort: Optional[str] = None) -> List[Grant]:
+        """
+        Filtra por rango de importe (con el índice por importe de la lista de
+        candidatos, construido una vez por lista cacheada) y por texto libre
+        con el índice invertido, cuenta las coincidencias por faceta y
+        selecciona las 25 más relevantes con un heap, o las 25 primeras por
+        importe si se ordena por importe.
+        """
+        fetched_at = getattr(grants, 'fetched_at', None)
+        if min_amount is not None or max_amount is not None or amount_sort:
+            index = grants.amount_index if isinstance(grants, GrantList) else AmountIndex(grants)
+            grants = index.select(min_amount, max_amount, amount_sort)
+        query_terms = []
+        for sector in sectors or ['Todos']:
+            query_terms.extend(self.ranker.query_terms(sector=sector))
+        for company_type in company_types:
+            query_terms.extend(self.ranker.query_terms(company_type=company_type))
+        if query and query.strip():
+            matches, matched_terms = self.search_index.search(query)
+            if matches is not None:
+                grants = [grant for grant in grants if document_id(grant) in matches]
+                query_terms.extend(matched_terms)
+        facet_counts = self.facets.counts(self.facets.bitmap(grants))
+        query_terms = list(dict.fromkeys(query_terms))
+        if amount_sort:
+            # Se puntúan todos para conservar la puntuación normalizada del conjunto, en orden de importe
+            position = {document_id(grant): i for i, grant in enumerate(grants)}
+            ranked = sorted(self.ranker.rank(grants, query_terms, k=len(grants)),
+                            key=lambda grant: position[document_id(grant)])
+            return GrantList(ranked[:25], facet_counts, fetched_at)
+        return GrantList(self.ranker.rank(grants, query_terms, k=25), facet_counts, fetched_at)
     
-    def _get_fallback_data(self) -> List[Dict]:
+    def _get_fallback_data(self) -> List[Grant]:
         """Datos de respaldo si todas las APIs fallan."""
         self.logger.warning("No se encontraron datos en las APIs, devolviendo lista vacía.")
         return []
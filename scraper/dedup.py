@@ -0,0 +1,287 @@
+import array
+import functools
+import hashlib
+import importlib.util
+import random
+import operator
+import time
+from typing import Dict, Iterable, List, Optional
+
+from scraper.grant import Grant, stable_identifier
+from utils.text import STOPWORDS, tokenize
+
+# NumPy acelera las firmas MinHash; se detecta sin importarlo para no cargarlo al arrancar
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+# Firma MinHash de 64 permutaciones dividida en 16 bandas de 4 filas para LSH
+# (dos textos con similitud de Jaccard ~0,5 coinciden en alguna banda con alta probabilidad)
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# Similitud estimada mínima para fusionar: entre fuentes distintas basta con
+# títulos parecidos; dentro de una misma fuente deben ser casi idénticos
+CROSS_SOURCE_THRESHOLD = 0.5
+SAME_SOURCE_THRESHOLD = 0.9
+
+# Cubetas con más miembros (fórmulas repetidas en cientos de anuncios) no aportan
+# candidatos nuevos: se dejan de llenar para que la comparación siga siendo lineal
+MAX_BUCKET_SIZE = 16
+
+# Clústeres recordados en memoria por proceso (un cluster_id asignado no cambia nunca)
+MAX_MEMO_SIZE = 100000
+
+# Con títulos tan cortos se añaden al conjunto las primeras palabras de la descripción
+MIN_TITLE_TOKENS = 4
+MAX_DESCRIPTION_TOKENS = 30
+
+# Palabras vacías y fórmulas comunes a casi todas las convocatorias: no distinguen una de otra
+GENERIC_WORDS = STOPWORDS | frozenset([
+    'ayuda', 'ayudas', 'bases', 'concesion', 'convoca', 'convocan', 'convocatoria', 'convocatorias',
+    'ejercicio', 'extracto', 'orden', 'programa', 'reguladoras', 'resolucion', 'subvencion', 'subvenciones',
+])
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy_permutations():
+    """NumPy y los coeficientes de las permutaciones como columnas, cargados en la primera firma."""
+    import numpy as np
+    perm_a = np.array([a for a, _ in _PERMUTATIONS], dtype=np.int64)[:, None]
+    perm_b = np.array([b for _, b in _PERMUTATIONS], dtype=np.int64)[:, None]
+    return np, perm_a, perm_b
+
+
+@functools.lru_cache(maxsize=65536)
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big') % _PRIME
+
+
+@functools.lru_cache(maxsize=8192)
+def _signature(shingles: frozenset) -> tuple:
+    hashes = [_shingle_hash(shingle) for shingle in shingles]
+    if NUMPY_AVAILABLE:
+        np, perm_a, perm_b = _numpy_permutations()
+        values = np.array(hashes, dtype=np.int64)[None, :]
+        return tuple(((perm_a * values + perm_b) % _PRIME).min(axis=1).tolist())
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def shingles(title: str, description: str = '') -> frozenset:
+    """Palabras y pares de palabras significativas del título normalizado."""
+    tokens = [token for token in tokenize(title) if token not in GENERIC_WORDS]
+    if len(tokens) < MIN_TITLE_TOKENS:
+        # Las descripciones largas o genéricas diluyen la similitud entre fuentes: solo como apoyo
+        tokens += [token for token in tokenize(description) if token not in GENERIC_WORDS][:MAX_DESCRIPTION_TOKENS]
+    result = set(tokens)
+    result.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return frozenset(result)
+
+
+def minhash_signature(title: str, description: str = '') -> Optional[tuple]:
+    """Firma MinHash del título (y descripción si el título es muy corto); None si no hay texto útil."""
+    grant_shingles = shingles(title, description)
+    return _signature(grant_shingles) if grant_shingles else None
+
+
+def similarity(first: tuple, second: tuple) -> float:
+    """Similitud de Jaccard estimada a partir de dos firmas."""
+    return sum(map(operator.eq, first, second)) / NUM_PERM
+
+
+def band_keys(signature: tuple) -> List[str]:
+    """Claves de cubeta LSH de cada banda de la firma."""
+    keys = []
+    for band in range(BANDS):
+        rows = array.array('I', signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]).tobytes()
+        keys.append(f"{band}:{hashlib.blake2b(rows, digest_size=8).hexdigest()}")
+    return keys
+
+
+def content_key(grant: Grant) -> str:
+    """Clave estable de una subvención concreta de una fuente: su identificador determinista."""
+    return grant.identifier or stable_identifier(grant.source, grant.link, grant.title)
+
+
+class _Entry:
+    """Subvención preparada para la comparación: firma, cubetas y rasgos que impiden fusionar."""
+    __slots__ = ('key', 'cluster_id', 'source', 'signature', 'buckets', 'numbers', 'energy_focus')
+
+    def __init__(self, key: str, cluster_id: Optional[str], source: str, signature: Optional[tuple],
+                 numbers: frozenset, energy_focus: Optional[str]):
+        self.key = key
+        self.cluster_id = cluster_id
+        self.source = source
+        self.signature = signature
+        self.buckets = band_keys(signature) if signature else []
+        self.numbers = numbers
+        self.energy_focus = energy_focus
+
+    @classmethod
+    def from_grant(cls, key: str, grant: Grant) -> '_Entry':
+        numbers = frozenset(token for token in tokenize(grant.title) if token.isdigit())
+        return cls(key, None, grant.source, minhash_signature(grant.title or '', grant.description or ''),
+                   numbers, grant.energy_focus)
+
+    def compatible(self, other: '_Entry') -> bool:
+        # Distinto foco energético o distinta numeración (años, ediciones...) son convocatorias distintas
+        if self.energy_focus and other.energy_focus and self.energy_focus != other.energy_focus:
+            return False
+        return not (self.numbers and other.numbers and self.numbers != other.numbers)
+
+    def threshold(self, other: '_Entry') -> float:
+        return SAME_SOURCE_THRESHOLD if self.source == other.source else CROSS_SOURCE_THRESHOLD
+
+
+class DedupEngine:
+    """
+    Detección de casi duplicados entre fuentes con MinHash y LSH.
+
+    Cada subvención recibe un cluster_id; las que se consideran la misma
+    convocatoria comparten el suyo. Con un almacén local, firmas, cubetas y
+    clústeres se guardan, de modo que una subvención ya vista no se vuelve a
+    comparar y las nuevas solo se comparan con las que comparten cubeta.
+    """
+
+    def __init__(self, store=None, retention_days: int = 180):
+        self.store = store
+        self._memo: Dict[str, str] = {}
+        if store is not None:
+            self.prune(retention_days)
+
+    def assign_clusters(self, grants: Iterable[Grant]) -> None:
+        grants = list(grants)
+        keys = [content_key(grant) for grant in grants]
+        for grant, key in zip(grants, keys):
+            # Las fuentes ya lo asignan; así el ranking y el índice de texto no lo recalculan
+            grant.identifier = key
+        known = {}
+        if self.store is not None:
+            memo = self._memo
+            missing = {key for key in keys if key not in memo}
+            if missing:
+                loaded = self._load_clusters(missing)
+                if len(memo) + len(loaded) > MAX_MEMO_SIZE:
+                    memo.clear()
+                memo.update(loaded)
+            known = memo
+
+        batch_buckets: Dict[str, List[_Entry]] = {}
+        new_entries = []
+        for grant, key in zip(grants, keys):
+            cluster_id = known.get(key)
+            if cluster_id is None:
+                entry = _Entry.from_grant(key, grant)
+                entry.cluster_id = self._match(entry, batch_buckets) or key
+                known[key] = cluster_id = entry.cluster_id
+                new_entries.append(entry)
+                for bucket in entry.buckets:
+                    members = batch_buckets.setdefault(bucket, [])
+                    if len(members) < MAX_BUCKET_SIZE:
+                        members.append(entry)
+            grant.cluster_id = cluster_id
+
+        if self.store is not None and new_entries:
+            self._save(new_entries)
+
+    def deduplicate(self, grants: Iterable[Grant]) -> List[Grant]:
+        """Una subvención canónica por clúster, en el orden de la primera aparición de cada uno."""
+        grants = list(grants)
+        self.assign_clusters(grants)
+        clusters: Dict[str, List[Grant]] = {}
+        for grant in grants:
+            clusters.setdefault(grant.cluster_id, []).append(grant)
+        return [merge_cluster(members) for members in clusters.values()]
+
+    def _match(self, entry: _Entry, batch_buckets: Dict[str, List[_Entry]]) -> Optional[str]:
+        if not entry.signature:
+            return None
+        candidates = {id(candidate): candidate for bucket in entry.buckets
+                      for candidate in batch_buckets.get(bucket, ())}
+        if self.store is not None:
+            for candidate in self._load_candidates(entry.buckets):
+                candidates.setdefault(candidate.key, candidate)
+
+        best_id, best_score = None, 0.0
+        for candidate in candidates.values():
+            if not entry.compatible(candidate):
+                continue
+            score = similarity(entry.signature, candidate.signature)
+            if score > best_score and score >= entry.threshold(candidate):
+                best_id, best_score = candidate.cluster_id, score
+        return best_id
+
+    def _load_clusters(self, keys: set) -> Dict[str, str]:
+        clusters = {}
+        keys = list(keys)
+        # Consultas por tramos para no superar el límite de parámetros de SQLite
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            clusters.update(self.store.query(
+                f"SELECT key, cluster_id FROM dedup_signatures WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return clusters
+
+    def _load_candidates(self, buckets: List[str]) -> List[_Entry]:
+        rows = self.store.query(
+            "SELECT DISTINCT s.key, s.cluster_id, s.source, s.signature, s.numbers, s.energy_focus "
+            "FROM dedup_buckets b JOIN dedup_signatures s ON s.key = b.key "
+            f"WHERE b.bucket IN ({','.join('?' * len(buckets))}) LIMIT ?",
+            (*buckets, BANDS * MAX_BUCKET_SIZE)
+        )
+        candidates = []
+        for key, cluster_id, source, blob, numbers, energy_focus in rows:
+            signature = array.array('I')
+            signature.frombytes(blob)
+            candidates.append(_Entry(key, cluster_id, source, tuple(signature),
+                                     frozenset(numbers.split()), energy_focus))
+        return candidates
+
+    def _save(self, entries: List[_Entry]):
+        now = time.time()
+        with self.store.connection as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO dedup_signatures (key, cluster_id, source, signature, numbers, energy_focus, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(entry.key, entry.cluster_id, entry.source,
+                  array.array('I', entry.signature or ()).tobytes(), ' '.join(sorted(entry.numbers)),
+                  entry.energy_focus, now) for entry in entries]
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO dedup_buckets (bucket, key) VALUES (?, ?)",
+                [(bucket, entry.key) for entry in entries for bucket in entry.buckets]
+            )
+
+    def prune(self, retention_days: int) -> None:
+        """Olvida las firmas más antiguas que la ventana de retención."""
+        cutoff = time.time() - retention_days * 86400
+        with self.store.connection as connection:
+            connection.execute(
+                "DELETE FROM dedup_buckets WHERE key IN (SELECT key FROM dedup_signatures WHERE updated_at < ?)", (cutoff,)
+            )
+            connection.execute("DELETE FROM dedup_signatures WHERE updated_at < ?", (cutoff,))
+
+
+def merge_cluster(members: List[Grant]) -> Grant:
+    """
+    Fusiona las subvenciones de un clúster en la más completa (mayor relevancia,
+    publicación más reciente, descripción más larga) con los enlaces de todas las fuentes.
+    """
+    canonical = max(members, key=lambda grant: (grant.relevance_score, grant.publication_ordinal or 0,
+                                                 len(grant.description or '')))
+    links = []
+    seen_links = set()
+    for grant in members:
+        for source_link in grant.source_links or [{'source': grant.source, 'link': grant.link}]:
+            if source_link['link'] not in seen_links:
+                seen_links.add(source_link['link'])
+                links.append(source_link)
+    canonical.source_links = links
+    return canonical
+
+
+# Motor sin almacén para deduplicar los resultados de una sola fuente dentro de una búsqueda
+batch_engine = DedupEngine()
@@ -0,0 +1,182 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from scraper.grant import Grant
+from scraper.keywords import COMPANY_TYPE_KEYWORDS, SECTOR_KEYWORDS
+from scraper.ranking import document_id
+from utils.text import normalize_text
+
+# Facetas indexadas y valor que en el formulario significa "sin filtro"
+FACETS = ('sector', 'location', 'region', 'company_type', 'source')
+WILDCARDS = {'sector': 'Todos', 'location': 'Todas', 'region': 'Todas', 'company_type': 'Todos', 'source': ''}
+
+# Subvenciones abiertas a cualquier valor de la faceta (p. ej. sin tipo de empresa concreto)
+ANY = '*'
+
+# Ubicación del registro -> valores del filtro de ubicación
+LOCATION_VALUES = {'Unión Europea': ('UE', 'Internacional'), 'España': ('España',)}
+
+_SECTOR_KEYWORDS = {sector: [normalize_text(keyword) for keyword in keywords]
+                    for sector, keywords in SECTOR_KEYWORDS.items()}
+_COMPANY_TYPE_KEYWORDS = {company_type: [normalize_text(keyword) for keyword in keywords]
+                          for company_type, keywords in COMPANY_TYPE_KEYWORDS.items()}
+
+
+def _is_wildcard(facet: str, value) -> bool:
+    return not value or value == WILDCARDS[facet]
+
+
+def facet_values(grant: Grant, regions: Iterable[str] = ()) -> List[Tuple[str, str]]:
+    """
+    Pares (faceta, valor) de una subvención. Sector y tipo de empresa se
+    deducen del título y la descripción (palabras que empiezan por una palabra
+    clave) además del valor que asigna la fuente; una subvención sin tipo de
+    empresa ni ubicación concretos admite cualquiera, y una nacional sin
+    comunidad concreta, cualquier comunidad.
+    """
+    text = ' ' + normalize_text(f"{grant.title} {grant.description or ''}")
+    pairs = []
+
+    sectors = {sector for sector, keywords in _SECTOR_KEYWORDS.items()
+               if any(f" {keyword}" in text for keyword in keywords)}
+    if grant.sector in SECTOR_KEYWORDS:
+        sectors.add(grant.sector)
+    pairs.extend(('sector', sector) for sector in sectors)
+
+    company_types = {company_type for company_type, keywords in _COMPANY_TYPE_KEYWORDS.items()
+                     if any(f" {keyword}" in text for keyword in keywords)}
+    if not _is_wildcard('company_type', grant.company_type):
+        company_types.add(grant.company_type)
+    pairs.extend(('company_type', company_type) for company_type in company_types or [ANY])
+
+    region = grant.region if grant.region in regions else (grant.location if grant.location in regions else None)
+    if region:
+        pairs.append(('region', region))
+        pairs.append(('location', 'España'))
+    elif _is_wildcard('location', grant.location):
+        pairs.append(('location', ANY))
+        pairs.append(('region', ANY))
+    else:
+        pairs.extend(('location', value) for value in LOCATION_VALUES.get(grant.location, (grant.location,)))
+        # Una ayuda nacional sin comunidad concreta está abierta a todas
+        if grant.location == 'España' and _is_wildcard('region', grant.region):
+            pairs.append(('region', ANY))
+
+    if grant.source:
+        pairs.append(('source', grant.source))
+    return pairs
+
+
+def _bitmap(slots: Iterable[int]) -> int:
+    """Mapa de bits (entero de Python) con los huecos indicados."""
+    slots = list(slots)
+    if not slots:
+        return 0
+    bits = bytearray(max(slots) // 8 + 1)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _slots(bitmap: int) -> List[int]:
+    """Huecos activos de un mapa de bits, en orden creciente."""
+    return [slot for slot, bit in enumerate(reversed(bin(bitmap)[2:])) if bit == '1']
+
+
+class FacetIndex:
+    """
+    Índices de mapas de bits por valor de faceta sobre el catálogo de
+    subvenciones. Cada subvención ocupa un hueco (bit); una selección múltiple
+    ("Energía o Industria, en Madrid o Cataluña, PYME") es un OR por faceta y
+    un AND entre facetas, y los recuentos de cada valor salen de contar bits.
+    """
+
+    def __init__(self, regions: Iterable[str] = (), max_documents: int = 50000):
+        self.regions = frozenset(regions)
+        self.max_documents = max_documents
+        self.documents: 'OrderedDict[str, Tuple[int, List[Tuple[str, str]]]]' = OrderedDict()
+        self.grants: List[Optional[Grant]] = []
+        self.bitmaps: Dict[Tuple[str, str], int] = {}
+        self.live = 0
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, grants: Iterable[Grant]) -> None:
+        """Indexa las subvenciones nuevas; las conocidas se actualizan y se marcan como recientes."""
+        with self._lock:
+            pending: Dict[Tuple[str, str], List[int]] = {}
+            new_slots = []
+            for grant in grants:
+                doc_id = document_id(grant)
+                known = self.documents.get(doc_id)
+                if known is not None:
+                    self.grants[known[0]] = grant
+                    self.documents.move_to_end(doc_id)
+                    continue
+                slot = self._free.pop() if self._free else len(self.grants)
+                if slot == len(self.grants):
+                    self.grants.append(None)
+                pairs = facet_values(grant, self.regions)
+                self.grants[slot] = grant
+                self.documents[doc_id] = (slot, pairs)
+                new_slots.append(slot)
+                for pair in pairs:
+                    pending.setdefault(pair, []).append(slot)
+            # Un OR por valor y lote en lugar de uno por subvención
+            for pair, slots in pending.items():
+                self.bitmaps[pair] = self.bitmaps.get(pair, 0) | _bitmap(slots)
+            self.live |= _bitmap(new_slots)
+            while len(self.documents) > self.max_documents:
+                self._remove(next(iter(self.documents)))
+
+    def _remove(self, doc_id: str) -> None:
+        slot, pairs = self.documents.pop(doc_id)
+        mask = ~(1 << slot)
+        for pair in pairs:
+            self.bitmaps[pair] &= mask
+        self.live &= mask
+        self.grants[slot] = None
+        self._free.append(slot)
+
+    def bitmap(self, grants: Iterable[Grant]) -> int:
+        """Mapa de bits de las subvenciones indicadas que están en el índice."""
+        documents = self.documents
+        with self._lock:
+            return _bitmap(documents[doc_id][0] for doc_id in map(document_id, grants) if doc_id in documents)
+
+    def select(self, selected: Dict[str, List[str]], within: Optional[int] = None) -> int:
+        """Mapa de bits de la selección: algún valor de cada faceta filtrada, en todas las facetas."""
+        with self._lock:
+            result = self.live if within is None else self.live & within
+            for facet, values in selected.items():
+                values = [value for value in values if not _is_wildcard(facet, value)]
+                if not values:
+                    continue
+                matches = self.bitmaps.get((facet, ANY), 0)
+                for value in values:
+                    matches |= self.bitmaps.get((facet, value), 0)
+                result &= matches
+            return result
+
+    def get(self, bitmap: int) -> List[Grant]:
+        """Subvenciones de un mapa de bits."""
+        with self._lock:
+            return [self.grants[slot] for slot in _slots(bitmap & self.live)]
+
+    def counts(self, bitmap: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Número de subvenciones de cada valor de faceta dentro del mapa de bits (o de todo el catálogo)."""
+        with self._lock:
+            scope = self.live if bitmap is None else bitmap & self.live
+            counts: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+            for (facet, value), values_bitmap in self.bitmaps.items():
+                if value == ANY:
+                    continue
+                count = (values_bitmap & scope).bit_count()
+                if count:
+                    counts[facet][value] = count
+            return {facet: dict(sorted(values.items(), key=lambda item: -item[1]))
+                    for facet, values in counts.items()}
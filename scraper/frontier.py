@@ -0,0 +1,156 @@
+"""
+Frontera de rastreo persistente de las páginas de detalle del CDTI e IDAE.
+
+Por cada URL se guarda cuándo se descargó por última vez, el hash del HTML,
+cuántas veces se ha descargado y cuántas de ellas había cambiado, además de
+los datos extraídos de su última versión. Con ello se estima la frecuencia
+de cambio de cada página (cambios por día, con una estimación inicial
+prudente para las poco observadas) y su prioridad es la probabilidad de que
+haya cambiado desde la última descarga: 1 - exp(-frecuencia * antigüedad).
+
+Cada búsqueda descarga, dentro de su presupuesto de peticiones, las URLs
+nuevas y las de mayor prioridad; el resto de enlaces se construyen con los
+datos guardados. Así las páginas que cambian a menudo se refrescan pronto,
+las estables se revisitan poco y la cobertura crece por encima de los
+primeros enlaces de cada sección sin hacer más peticiones por búsqueda.
+
+Una descarga fallida no cambia la prioridad de la página: se aplaza su
+siguiente intento con una espera exponencial (de RETRY_BASE_SECONDS a
+RETRY_MAX_SECONDS), y una descarga correcta la pone a cero.
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from services.store import LocalStore
+
+DAY = 86400
+
+# Estimación inicial de la frecuencia de cambio: un cambio por semana
+PRIOR_CHANGES = 1.0
+PRIOR_DAYS = 7.0
+
+# Por debajo de esta probabilidad de cambio no se gasta una petición en la página
+MIN_PRIORITY = 0.05
+
+# Espera antes de reintentar una página que falló: se duplica con cada fallo seguido, hasta el máximo
+RETRY_BASE_SECONDS = 15 * 60
+RETRY_MAX_SECONDS = DAY
+
+# Enlaces que no aparecen en ninguna sección durante este tiempo se olvidan
+FORGET_AFTER_DAYS = 90
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(content: bytes) -> str:
+    """Huella del HTML descargado."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def change_rate(fetches: int, changes: int, first_fetch: Optional[float], last_fetch: Optional[float]) -> float:
+    """Cambios por día estimados a partir de las descargas observadas."""
+    observed_days = (last_fetch - first_fetch) / DAY if fetches > 1 else 0.0
+    return (changes + PRIOR_CHANGES) / (observed_days + PRIOR_DAYS)
+
+
+def change_probability(rate: float, last_fetch: Optional[float], now: float) -> float:
+    """Probabilidad de que la página haya cambiado desde su última descarga (1 si nunca se descargó)."""
+    if last_fetch is None:
+        return 1.0
+    age_days = max(0.0, now - last_fetch) / DAY
+    return 1 - math.exp(-rate * age_days)
+
+
+def retry_delay(failures: int) -> float:
+    """Segundos de espera tras `failures` fallos seguidos."""
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** min(max(failures - 1, 0), 32))
+
+
+class CrawlFrontier:
+    """Estado de rastreo de las páginas de detalle de una fuente, guardado en el almacén local."""
+
+    def __init__(self, store: LocalStore, source: str):
+        self.store = store
+        self.source = source
+
+    def plan(self, urls: List[str], budget: int, now: Optional[float] = None) -> Tuple[List[str], Dict[str, Dict]]:
+        """
+        Registra los enlaces vistos en las secciones y devuelve las URLs a
+        descargar en esta búsqueda, por prioridad y como mucho `budget`, junto
+        con los datos guardados de las páginas ya descargadas alguna vez (None
+        si no se pudieron extraer). Las páginas en espera tras un fallo no se
+        descargan hasta que vence su plazo.
+        """
+        now = now or time.time()
+        urls = list(dict.fromkeys(urls))
+        self.store.executemany(
+            "INSERT INTO crawl_frontier (url, source, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen",
+            [(url, self.source, now, now) for url in urls]
+        )
+        self.store.execute("DELETE FROM crawl_frontier WHERE source = ? AND last_seen < ?",
+                           (self.source, now - FORGET_AFTER_DAYS * DAY))
+
+        rows = {row[0]: row[1:] for row in self.store.query(
+            "SELECT url, first_fetch, last_fetch, fetches, changes, next_attempt_at, details "
+            "FROM crawl_frontier WHERE source = ?", (self.source,)
+        )}
+        ranked = []
+        stored = {}
+        for position, url in enumerate(urls):
+            first_fetch, last_fetch, fetches, changes, next_attempt_at, details = rows[url]
+            if last_fetch is not None:
+                stored[url] = json.loads(details) if details else None
+            if next_attempt_at is not None and next_attempt_at > now:
+                continue
+            rate = change_rate(fetches, changes, first_fetch, last_fetch)
+            priority = change_probability(rate, last_fetch, now)
+            if priority >= MIN_PRIORITY:
+                # A igual prioridad, el orden de la sección (los primeros enlaces suelen ser los más recientes)
+                ranked.append((-priority, position, url))
+        ranked.sort()
+        return [url for _, _, url in ranked[:max(0, budget)]], stored
+
+    def record(self, results: List[Tuple[str, Optional[bytes], Optional[Dict]]], now: Optional[float] = None) -> None:
+        """
+        Guarda el resultado de las descargas de esta búsqueda: (url, HTML o None
+        si falló, datos extraídos o None si no se pudieron extraer).
+        """
+        now = now or time.time()
+        fetched = []
+        failed = []
+        for url, content, details in results:
+            if content is None:
+                failed.append(url)
+            else:
+                fetched.append((content_hash(content), now, now,
+                                json.dumps(details, ensure_ascii=False) if details else None, url))
+
+        failures = {}
+        if failed:
+            failures = dict(self.store.query(
+                f"SELECT url, failures + 1 FROM crawl_frontier WHERE url IN ({', '.join('?' * len(failed))})",
+                failed
+            ))
+        retries = [(count, now + retry_delay(count), url) for url, count in failures.items()]
+
+        with self.store.connection as connection:
+            # Un cambio cuenta solo si había una versión anterior con la que comparar
+            connection.executemany(
+                "UPDATE crawl_frontier SET "
+                "changes = changes + (content_hash IS NOT NULL AND content_hash != ?1), "
+                "content_hash = ?1, first_fetch = COALESCE(first_fetch, ?2), last_fetch = ?3, "
+                "fetches = fetches + 1, failures = 0, next_attempt_at = NULL, details = COALESCE(?4, details) "
+                "WHERE url = ?5",
+                fetched
+            )
+            connection.executemany("UPDATE crawl_frontier SET failures = ?, next_attempt_at = ? WHERE url = ?",
+                                   retries)
+
+        for count, next_attempt_at, url in retries:
+            logger.warning(f"{self.source}: fallo {count} seguido descargando {url}; "
+                           f"siguiente intento en {(next_attempt_at - now) / 60:.0f} min")
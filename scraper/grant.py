@@ -0,0 +1,158 @@
+import dataclasses
+import hashlib
+import json
+import sys
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from scraper.amounts import AmountIndex, parse_amount
+from utils.dates import parse_date_ordinal
+from utils.text import normalize_text
+
+# Campos con pocos valores distintos (fuentes, sectores, regiones...): se internan
+# para que todas las subvenciones compartan el mismo objeto str
+INTERNED_FIELDS = ('sector', 'location', 'region', 'company_type', 'source', 'energy_focus', 'urgency')
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def canonical_url(url) -> str:
+    """
+    Forma canónica de un enlace: esquema y host en minúsculas, sin fragmento,
+    sin parámetros de seguimiento (utm_*), parámetros ordenados y sin barra final.
+    """
+    if not isinstance(url, str) or not url.strip():
+        return ''
+    parts = urlsplit(url.strip())
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith('utm_'))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def stable_identifier(source_code: str, url, title) -> str:
+    """
+    Identificador determinista de una subvención: BLAKE2 de la fuente, el enlace
+    canónico y el título normalizado. Es el mismo en todos los procesos y reinicios.
+    """
+    text = f"{source_code}|{canonical_url(url)}|{normalize_text(title) if isinstance(title, str) else ''}"
+    return f"{source_code}_{hashlib.blake2b(text.encode('utf-8'), digest_size=10).hexdigest()}"
+
+
+@dataclass(slots=True)
+class Grant:
+    """Registro compacto de una subvención, compartido por todas las fuentes."""
+    title: str
+    description: str
+    sector: str
+    location: str
+    region: str
+    company_type: str
+    amount: str
+    deadline: str
+    publication_date: str
+    source: str
+    link: str
+    relevance_score: int = 0
+    identifier: Optional[str] = None
+    energy_focus: Optional[str] = None
+    # Campos derivados: se calculan al crear el registro o al procesar resultados
+    deadline_ordinal: Optional[int] = None
+    publication_ordinal: Optional[int] = None
+    amount_min: Optional[float] = None
+    amount_max: Optional[float] = None
+    amount_percent: Optional[float] = None
+    amount_unit: Optional[str] = None
+    days_remaining: int = 0
+    urgency: str = 'low'
+    # Clúster de casi duplicados y enlaces de todas las fuentes que publican la convocatoria
+    cluster_id: Optional[str] = None
+    source_links: Optional[List[Dict]] = None
+    # Puntuación del ranking de la última búsqueda
+    score: Optional[float] = None
+
+    def __post_init__(self):
+        for name in INTERNED_FIELDS:
+            setattr(self, name, _intern(getattr(self, name)))
+        if self.deadline_ordinal is None:
+            self.deadline_ordinal = parse_date_ordinal(self.deadline)
+        if self.publication_ordinal is None:
+            self.publication_ordinal = parse_date_ordinal(self.publication_date)
+        if self.amount_unit is None:
+            self.amount_min, self.amount_max, self.amount_percent, self.amount_unit = parse_amount(self.amount)
+
+    def get(self, key: str, default=None):
+        """Acceso al estilo dict, para código y plantillas que aún usan grant.get(...)."""
+        return getattr(self, key, default)
+
+    def copy(self) -> 'Grant':
+        """Copia superficial sin volver a derivar campos (sin __post_init__)."""
+        clone = object.__new__(Grant)
+        for name, value in zip(FIELD_NAMES, _field_values(self)):
+            setattr(clone, name, value)
+        return clone
+
+    def to_dict(self) -> Dict:
+        return dict(zip(SERIALIZED_FIELDS, _serialized_values(self)))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Grant':
+        return cls(**{name: data[name] for name in FIELD_NAMES if name in data})
+
+
+FIELD_NAMES = tuple(field.name for field in dataclasses.fields(Grant))
+# Los ordinales son internos; el resto es la representación pública de la subvención
+SERIALIZED_FIELDS = tuple(name for name in FIELD_NAMES if not name.endswith('_ordinal'))
+_serialized_values = attrgetter(*SERIALIZED_FIELDS)
+_field_values = attrgetter(*FIELD_NAMES)
+
+
+class GrantList(list):
+    """Lista de resultados de una búsqueda que conserva los índices derivados de ella."""
+    __slots__ = ('_amount_index', '_version', 'facet_counts', 'fetched_at')
+
+    def __init__(self, grants: Iterable[Grant] = (), facet_counts: Optional[Dict[str, Dict[str, int]]] = None,
+                 fetched_at: Optional[float] = None):
+        super().__init__(grants)
+        self._amount_index = None
+        self._version = None
+        # Recuento por valor de faceta de todas las coincidencias, no solo de las devueltas
+        self.facet_counts = facet_counts or {}
+        # Momento (time.time()) en que se consultaron las fuentes de estos resultados
+        self.fetched_at = fetched_at
+
+    @property
+    def version(self) -> str:
+        """
+        Huella de todo lo que se sirve de estos resultados: cada campo
+        serializado de cada subvención, en orden, los recuentos por faceta y
+        el momento de la consulta a las fuentes.
+        """
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=12)
+            digest.update(f"{self.fetched_at!r}|{json.dumps(self.facet_counts, sort_keys=True)}\n".encode('utf-8'))
+            for grant in self:
+                digest.update(f"{_serialized_values(grant)!r}\n".encode('utf-8'))
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def amount_index(self) -> AmountIndex:
+        """Índice por importe, construido la primera vez que se necesita."""
+        if self._amount_index is None:
+            self._amount_index = AmountIndex(self)
+        return self._amount_index
+
+
+def grants_to_json(grants: Iterable[Grant], **envelope) -> str:
+    """
+    Serializa subvenciones a JSON compacto. Si se pasan claves adicionales,
+    el resultado es un objeto con esas claves y la lista bajo 'grants'.
+    """
+    rows = [grant.to_dict() for grant in grants]
+    payload = dict(envelope, grants=rows) if envelope else rows
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,48 @@
+# Palabras clave de cada sector y tipo de empresa, compartidas por los filtros de las fuentes y el ranking
+SECTOR_KEYWORDS = {
+    'Tecnología': ['tecnología', 'tecnológico', 'digital', 'innovación', 'i+d+i', 'startup', 'tic'],
+    'Energía': ['energía', 'energético', 'renovable', 'eficiencia energética', 'autoconsumo'],
+    'Industria': ['industria', 'industrial', 'manufactura', 'producción'],
+    'Agricultura': ['agricultura', 'agrícola', 'rural', 'ganadero', 'agrario'],
+    'Comercio': ['comercio', 'comercial', 'exportación', 'internacionalización'],
+    'Servicios': ['servicios', 'terciario', 'turismo', 'hostelería'],
+    'Construcción': ['construcción', 'vivienda', 'edificación', 'obra'],
+    'Salud': ['salud', 'sanitario', 'médico', 'farmacéutico'],
+    'Turismo': ['turismo', 'turístico', 'hostelería', 'restauración'],
+    'Educación': ['educación', 'educativo', 'formación', 'universidad'],
+    'Transporte': ['transporte', 'logística', 'movilidad', 'infraestructura']
+}
+
+COMPANY_TYPE_KEYWORDS = {
+    'PYME': ['pyme', 'pymes', 'pequeñas y medianas empresas'],
+    'Startup': ['startup', 'startups', 'empresas emergentes', 'emprendimiento', 'emprendedores'],
+    'Autónomo': ['autónomo', 'autónomos', 'trabajadores por cuenta propia'],
+    'Microempresa': ['microempresa', 'microempresas'],
+    'Grande empresa': ['gran empresa', 'grandes empresas'],
+    'ONG': ['ong', 'entidades sin ánimo de lucro', 'tercer sector'],
+    'Universidad': ['universidad', 'universidades', 'universitario'],
+    'Centro de investigación': ['centro de investigación', 'centros tecnológicos', 'organismos de investigación']
+}
+
+# Palabras que identifican cada comunidad autónoma en el texto de una convocatoria
+REGION_KEYWORDS = {
+    'Andalucía': ['andalucia', 'sevilla', 'córdoba', 'granada', 'málaga', 'cádiz', 'huelva', 'jaén', 'almería'],
+    'Cataluña': ['cataluña', 'catalunya', 'barcelona', 'girona', 'lleida', 'tarragona'],
+    'Madrid': ['madrid', 'comunidad de madrid'],
+    'Valencia': ['valencia', 'castellón', 'alicante', 'comunidad valenciana'],
+    'Galicia': ['galicia', 'coruña', 'lugo', 'ourense', 'pontevedra'],
+    'País Vasco': ['país vasco', 'euskadi', 'bilbao', 'vitoria', 'san sebastián'],
+    'Aragón': ['aragón', 'zaragoza', 'huesca', 'teruel'],
+    'Asturias': ['asturias', 'oviedo'],
+    'Cantabria': ['cantabria', 'santander'],
+    'Castilla-La Mancha': ['castilla la mancha', 'toledo', 'ciudad real', 'albacete', 'cuenca', 'guadalajara'],
+    'Castilla y León': ['castilla y león', 'valladolid', 'salamanca', 'león', 'burgos', 'zamora', 'palencia', 'ávila', 'segovia', 'soria'],
+    'Extremadura': ['extremadura', 'badajoz', 'cáceres'],
+    'Islas Baleares': ['baleares', 'mallorca', 'menorca', 'ibiza', 'formentera'],
+    'Canarias': ['canarias', 'las palmas', 'santa cruz de tenerife', 'tenerife', 'gran canaria'],
+    'La Rioja': ['la rioja', 'logroño'],
+    'Murcia': ['murcia', 'región de murcia', 'cartagena'],
+    'Navarra': ['navarra', 'pamplona'],
+    'Ceuta': ['ceuta'],
+    'Melilla': ['melilla']
+}
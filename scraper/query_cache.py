@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from scraper.facets import WILDCARDS
+from scraper.grant import Grant
+from scraper.keywords import COMPANY_TYPE_KEYWORDS, SECTOR_KEYWORDS
+from utils.text import normalize_text
+
+# Orden de los criterios en la clave canónica
+CRITERIA = ('sector', 'location', 'company_type', 'region')
+
+LOCATIONS = ('España', 'UE', 'Internacional')
+
+Criteria = Tuple[str, str, str, str]
+
+
+def _lookup(values: Iterable[str]) -> Dict[str, str]:
+    return {normalize_text(value): value for value in values}
+
+
+class QueryCache:
+    """
+    Cache de candidatos por criterios de búsqueda. Las claves se canonicalizan
+    (mayúsculas, acentos, comodines; una comunidad implica España), así que
+    las grafías distintas de una misma búsqueda comparten entrada. Aquí solo
+    se sirven coincidencias exactas, porque cada lista ya viene filtrada y
+    recortada por las fuentes; las búsquedas nuevas se resuelven filtrando
+    la instantánea sin recortar de cada fuente (SourceSnapshots).
+    """
+
+    def __init__(self, regions: Iterable[str] = (), timeout: int = 1800):
+        self.timeout = timeout
+        self.entries: Dict[Criteria, Tuple[List[Grant], float]] = {}
+        self._known = {
+            'sector': _lookup(SECTOR_KEYWORDS),
+            'location': _lookup(LOCATIONS),
+            'company_type': _lookup(COMPANY_TYPE_KEYWORDS),
+            'region': _lookup(regions),
+        }
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+    def canonical(self, sector: str, location: str, company_type: str, region: str) -> Criteria:
+        """Clave canónica: valores conocidos con su grafía oficial y comodín para "sin filtro"."""
+        values = {}
+        for name, value in zip(CRITERIA, (sector, location, company_type, region)):
+            normalized = normalize_text(value or '')
+            if normalized in ('', 'todos', 'todas', normalize_text(WILDCARDS[name])):
+                values[name] = WILDCARDS[name]
+            else:
+                values[name] = self._known[name].get(normalized, value.strip())
+        # Una comunidad autónoma implica España
+        if values['region'] != WILDCARDS['region'] and values['location'] == WILDCARDS['location']:
+            values['location'] = 'España'
+        return tuple(values[name] for name in CRITERIA)
+
+    def get(self, key: Criteria) -> Optional[List[Grant]]:
+        """Candidatos vigentes para la clave exacta."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry[1] < self.timeout:
+                return entry[0]
+            return None
+
+    def put(self, key: Criteria, grants: List[Grant], timestamp: Optional[float] = None) -> None:
+        """Guarda candidatos con su marca de tiempo (por defecto, ahora)."""
+        now = time.time()
+        with self._lock:
+            for expired in [k for k, (_, ts) in self.entries.items() if now - ts >= self.timeout]:
+                del self.entries[expired]
+            self.entries[key] = (grants, timestamp if timestamp is not None else now)
+
+
+class SourceSnapshots:
+    """
+    Resultado sin filtrar ni recortar de cada fuente (catálogo del BOE,
+    convocatorias de la UE, ayudas rastreadas del CDTI y del IDAE): la
+    búsqueda más amplia posible. Cualquier búsqueda, más estrecha por
+    definición, se responde filtrándola con los criterios de cada fuente y
+    aplicando después sus recortes, sin consultar la red mientras esté
+    vigente. Una sola petición la renueva; las demás esperan a esa consulta.
+    """
+
+    def __init__(self, timeout: int = 1800):
+        self.timeout = timeout
+        self.sources: Dict[str, list] = {}
+        self.fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.sources, self.fetched_at = {}, None
+
+    def get(self, fetch: Callable[[], Dict[str, list]]) -> Tuple[Dict[str, list], float]:
+        """Instantáneas vigentes y su marca de tiempo; si caducaron, las obtiene con `fetch`."""
+        with self._lock:
+            if self.fetched_at is None or time.time() - self.fetched_at >= self.timeout:
+                self.sources = fetch()
+                self.fetched_at = time.time()
+            return self.sources, self.fetched_at
@@ -0,0 +1,162 @@
+import datetime
+import heapq
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional
+
+from scraper.grant import Grant, stable_identifier
+from scraper.keywords import COMPANY_TYPE_KEYWORDS, SECTOR_KEYWORDS
+from utils.text import analyze
+
+# Las palabras del título cuentan el doble que las de la descripción
+TITLE_WEIGHT = 2
+
+# Ventana (días) en la que la cercanía del plazo aumenta la puntuación
+URGENCY_WINDOW_DAYS = 60
+
+
+class CorpusStats:
+    """
+    Estadísticas de términos del catálogo para BM25: frecuencias de cada
+    documento, frecuencia documental de cada término y longitud media.
+    Se actualizan de forma incremental al ver subvenciones nuevas; las más
+    antiguas se descartan al superar max_documents.
+    """
+
+    def __init__(self, max_documents: int = 50000):
+        self.max_documents = max_documents
+        self.documents: 'OrderedDict[str, Counter]' = OrderedDict()
+        self.doc_freq: Counter = Counter()
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, doc_id: str, term_freqs: Counter) -> None:
+        if doc_id in self.documents:
+            self.documents.move_to_end(doc_id)
+            return
+        self.documents[doc_id] = term_freqs
+        self.doc_freq.update(term_freqs.keys())
+        self.total_length += sum(term_freqs.values())
+        while len(self.documents) > self.max_documents:
+            self.remove(next(iter(self.documents)))
+
+    def remove(self, doc_id: str) -> None:
+        term_freqs = self.documents.pop(doc_id, None)
+        if term_freqs is None:
+            return
+        self.doc_freq.subtract(term_freqs.keys())
+        self.total_length -= sum(term_freqs.values())
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / len(self.documents) if self.documents else 0.0
+
+    def idf(self, term: str) -> float:
+        n = self.doc_freq.get(term, 0)
+        return math.log(1 + (len(self.documents) - n + 0.5) / (n + 0.5))
+
+
+def document_terms(grant: Grant) -> Counter:
+    """Frecuencia de términos de una subvención (título ponderado y descripción)."""
+    terms = Counter(analyze(grant.title))
+    for term in terms:
+        terms[term] *= TITLE_WEIGHT
+    terms.update(analyze(grant.description))
+    return terms
+
+
+def document_id(grant: Grant) -> str:
+    return grant.identifier or stable_identifier(grant.source, grant.link, grant.title)
+
+
+class Ranker:
+    """
+    Ranking de subvenciones por BM25 frente al sector, el tipo de empresa y
+    el texto libre, combinado opcionalmente con la recencia de publicación,
+    la urgencia del plazo y la relevancia estimada por cada fuente.
+    """
+
+    def __init__(self, stats: Optional[CorpusStats] = None, k1: float = 1.2, b: float = 0.75,
+                 recency_weight: float = 0.2, urgency_weight: float = 0.0, prior_weight: float = 0.1,
+                 recency_half_life_days: float = 30.0):
+        self.stats = stats if stats is not None else CorpusStats()
+        self.k1 = k1
+        self.b = b
+        self.recency_weight = recency_weight
+        self.urgency_weight = urgency_weight
+        self.prior_weight = prior_weight
+        self.recency_half_life_days = recency_half_life_days
+
+    def query_terms(self, sector: str = 'Todos', company_type: str = 'Todos', text: str = '') -> List[str]:
+        """Términos de la consulta: palabras clave del sector y del tipo de empresa más el texto libre."""
+        phrases = SECTOR_KEYWORDS.get(sector, [] if sector in ('Todos', '', None) else [sector])
+        phrases = phrases + COMPANY_TYPE_KEYWORDS.get(company_type, [])
+        terms = [term for phrase in phrases for term in analyze(phrase)]
+        terms.extend(analyze(text))
+        return list(dict.fromkeys(terms))
+
+    def index(self, grants: Iterable[Grant]) -> List[Counter]:
+        """Añade las subvenciones nuevas a las estadísticas y devuelve sus frecuencias de términos."""
+        documents = self.stats.documents
+        term_freqs = []
+        with self.stats.lock:
+            for grant in grants:
+                doc_id = document_id(grant)
+                freqs = documents.get(doc_id)
+                if freqs is None:
+                    freqs = document_terms(grant)
+                    self.stats.add(doc_id, freqs)
+                term_freqs.append(freqs)
+        return term_freqs
+
+    def bm25(self, query_terms: List[str], term_freqs: Counter) -> float:
+        if not query_terms:
+            return 0.0
+        length = sum(term_freqs.values())
+        average = self.stats.average_length or 1.0
+        norm = self.k1 * (1 - self.b + self.b * length / average)
+        score = 0.0
+        for term in query_terms:
+            tf = term_freqs.get(term)
+            if tf:
+                score += self.stats.idf(term) * tf * (self.k1 + 1) / (tf + norm)
+        return score
+
+    def rank(self, grants: List[Grant], query_terms: List[str], k: int = 25,
+             today: Optional[int] = None) -> List[Grant]:
+        """
+        Devuelve copias de las k mejores subvenciones (heap) con grant.score asignado.
+        La parte BM25 se normaliza con la mejor puntuación del conjunto (0-1).
+        """
+        if not grants:
+            return []
+        today = today or datetime.date.today().toordinal()
+        text_scores = [self.bm25(query_terms, freqs) for freqs in self.index(grants)]
+        best_text = max(text_scores) or 1.0
+
+        scores = []
+        for grant, text_score in zip(grants, text_scores):
+            score = text_score / best_text
+            if self.recency_weight and grant.publication_ordinal:
+                age = max(0, today - grant.publication_ordinal)
+                score += self.recency_weight * 0.5 ** (age / self.recency_half_life_days)
+            if self.urgency_weight and grant.deadline_ordinal:
+                days = grant.deadline_ordinal - today
+                if days > 0:
+                    score += self.urgency_weight * (1 - min(days, URGENCY_WINDOW_DAYS) / URGENCY_WINDOW_DAYS)
+            if self.prior_weight:
+                score += self.prior_weight * min(grant.relevance_score, 10) / 10
+            scores.append(round(score, 4))
+
+        top = heapq.nlargest(k, range(len(grants)), key=lambda i: (scores[i], grants[i].publication_ordinal or 0))
+        # Copias puntuadas: las subvenciones cacheadas se comparten entre peticiones concurrentes
+        ranked = []
+        for i in top:
+            grant = grants[i].copy()
+            grant.score = scores[i]
+            ranked.append(grant)
+        return ranked
@@ -0,0 +1,145 @@
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from scraper.grant import Grant
+from scraper.ranking import document_id
+from utils.text import analyze
+
+# Términos más cortos no se corrigen: con tan pocas letras cualquier error cambia la palabra
+MIN_FUZZY_LENGTH = 4
+
+# Similitud de Dice mínima entre trigramas para considerar un término como candidato
+TRIGRAM_THRESHOLD = 0.4
+
+# Variantes con errores admitidas como máximo por término de la consulta
+MAX_VARIANTS = 8
+
+
+def trigrams(term: str) -> Set[str]:
+    """Trigramas de caracteres de un término, con marcas de inicio y fin."""
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term: str) -> int:
+    """Errores de escritura tolerados según la longitud del término."""
+    return 1 if len(term) < 8 else 2
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """Distancia de Levenshtein, cortando en limit + 1 en cuanto se supera el límite."""
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for i, char in enumerate(first, 1):
+        current = [i]
+        for j, other in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """
+    Índice invertido de texto libre sobre el título y la descripción de las
+    subvenciones. Los términos son raíces sin acentos (utils.text.analyze) y
+    un índice de trigramas sobre el vocabulario permite corregir errores de
+    escritura en la consulta. Se actualiza de forma incremental al ingerir
+    subvenciones; las más antiguas se descartan al superar max_documents.
+    """
+
+    def __init__(self, max_documents: int = 50000):
+        self.max_documents = max_documents
+        self.documents: 'OrderedDict[str, frozenset]' = OrderedDict()
+        self.postings: Dict[str, Set[str]] = {}
+        self.grams: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, grants: Iterable[Grant]) -> None:
+        """
+        Indexa las subvenciones nuevas. El identificador ya cubre enlace y título,
+        así que una subvención conocida solo se marca como reciente.
+        """
+        with self._lock:
+            documents = self.documents
+            for grant in grants:
+                doc_id = document_id(grant)
+                if doc_id in documents:
+                    documents.move_to_end(doc_id)
+                    continue
+                terms = frozenset(analyze(grant.title)) | frozenset(analyze(grant.description))
+                documents[doc_id] = terms
+                for term in terms:
+                    postings = self.postings.get(term)
+                    if postings is None:
+                        postings = self.postings[term] = set()
+                        for gram in trigrams(term):
+                            self.grams.setdefault(gram, set()).add(term)
+                    postings.add(doc_id)
+            while len(documents) > self.max_documents:
+                self._remove(next(iter(documents)))
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        terms = self.documents.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.discard(doc_id)
+            if not postings:
+                del self.postings[term]
+                for gram in trigrams(term):
+                    vocabulary = self.grams.get(gram)
+                    if vocabulary is not None:
+                        vocabulary.discard(term)
+                        if not vocabulary:
+                            del self.grams[gram]
+
+    def _variants(self, term: str) -> List[str]:
+        """El término si está en el vocabulario; si no, los términos indexados a pocos errores de él."""
+        if term in self.postings or len(term) < MIN_FUZZY_LENGTH:
+            return [term]
+        term_grams = trigrams(term)
+        shared = Counter(candidate for gram in term_grams for candidate in self.grams.get(gram, ()))
+        limit = max_edits(term)
+        variants = []
+        for candidate, count in shared.most_common():
+            if 2 * count / (len(term_grams) + len(candidate)) < TRIGRAM_THRESHOLD:
+                continue
+            if edit_distance(term, candidate, limit) <= limit:
+                variants.append(candidate)
+                if len(variants) >= MAX_VARIANTS:
+                    break
+        return variants
+
+    def search(self, query: str) -> Tuple[Optional[Set[str]], List[str]]:
+        """
+        Identificadores de las subvenciones que contienen todos los términos de
+        la consulta (o una variante cercana de cada uno) y los términos del
+        vocabulario usados, para puntuar con ellos. None si la consulta no
+        tiene ningún término útil (solo palabras vacías).
+        """
+        with self._lock:
+            groups = [self._variants(term) for term in dict.fromkeys(analyze(query))]
+            matched_terms = [term for group in groups for term in group]
+            if not groups:
+                return None, []
+            matches = None
+            for group in sorted(groups, key=lambda group: sum(len(self.postings.get(t, ())) for t in group)):
+                found = set().union(*(self.postings.get(term, ()) for term in group))
+                matches = found if matches is None else matches & found
+                if not matches:
+                    break
+            return matches or set(), matched_terms
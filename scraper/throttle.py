@@ -0,0 +1,40 @@
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class HostThrottle:
+    """
+    Intervalo mínimo entre peticiones a un mismo servidor, compartido por todas
+    las búsquedas del proceso. Solo se espera lo que falta desde la petición
+    anterior (la latencia de red ya cuenta), y la espera usa time.sleep y un
+    Lock de threading: con los workers gevent (monkey patching) ambos ceden el
+    control a las demás peticiones en lugar de bloquear el worker.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            delay = self._last + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last = time.monotonic()
+
+
+_throttles: Dict[str, HostThrottle] = {}
+_registry_lock = threading.Lock()
+
+
+def throttle(url: str, interval: float) -> HostThrottle:
+    """Limitador compartido del servidor de la URL."""
+    host = urlparse(url).netloc or url
+    with _registry_lock:
+        limiter = _throttles.get(host)
+        if limiter is None:
+            limiter = _throttles[host] = HostThrottle(interval)
+        return limiter
@@ -1,18 +1,38 @@
+import dataclasses
 import logging
 import re
 import datetime
-import time
 from typing import List, Dict, Optional
 from urllib.parse import urljoin, urlparse
 
+from scraper.dedup import batch_engine
+from scraper.frontier import CrawlFrontier
+from scraper.grant import Grant, stable_identifier
+from scraper.throttle import throttle
+from scraper.web import parsing
+from services.store import LocalStore
+from utils.tracing import traced
+
 class IdaeScraper:
     """Scraper real para el Instituto para la Diversificación y Ahorro de la Energía (IDAE)."""
+
+    # Segundos entre peticiones al servidor, compartidos por todas las búsquedas en curso
+    REQUEST_INTERVAL = 1.5
+    
+    # Versión de cada extractor: subirla al cambiar su lógica descarta solo sus resultados en la cache de parseo
+    EXTRACTOR_VERSIONS = {'parse_links': 1, 'parse_detail': 1}
     
-    def __init__(self, session, config, spanish_regions, logger):
+    # Páginas de detalle descargadas por búsqueda, repartidas por prioridad entre todas las secciones
+    CRAWL_BUDGET = 60
+    
+    def __init__(self, session, config, spanish_regions, logger, store: Optional[LocalStore] = None):
         self.session = session
         self.config = config
         self.spanish_regions = spanish_regions
         self.logger = logger
+        store = store or LocalStore(':memory:')
+        self.frontier = CrawlFrontier(store, 'idae')
+        self.parse_cache = parsing.parse_cache(store, 'idae', self.EXTRACTOR_VERSIONS)
         self.base_url = "https://www.idae.es"
         
         # Verificar disponibilidad de BeautifulSoup
@@ -34,90 +54,163 @@ class IdaeScraper:
             'fondos_europeos': 'https://www.idae.es/ayudas-y-financiacion/fondos-europeos'
         }
         
-        # Headers específicos para IDAE
-        self.session.headers.update({
+        # Headers específicos para IDAE, por petición: la sesión se comparte entre búsquedas
+        self.headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'es-ES,es;q=0.9',
             'Cache-Control': 'no-cache'
-        })
+        }
     
-    def search(self, sector: str, company_type: str, region: str) -> List[Dict]:
+    @traced('idae.search')
+    def search(self, sector: str, company_type: str, region: str) -> List[Grant]:
         """Realiza scraping real del sitio web del IDAE."""
-        
+        return self.select(self.snapshot(), sector, company_type, region)
+    
+    @traced('idae.snapshot')
+    def snapshot(self) -> List[Grant]:
+        """
+        Rastrea las secciones y, según la frontera, las páginas de detalle, y
+        devuelve las ayudas de todos los enlaces conocidos, sin filtrar por
+        criterios ni recortar.
+        """
         if not self.bs4_available:
             self.logger.warning("IDAE scraper deshabilitado - BeautifulSoup4 no disponible")
             return []
         
-        all_grants = []
+        section_links = []
         
         try:
             self.logger.info("Iniciando scraping real del IDAE...")
             
-            # Scrapear cada sección
+            # Enlaces de cada sección
             for section_name, url in self.urls.items():
                 try:
                     self.logger.info(f"Scrapeando sección IDAE: {section_name}")
-                    section_grants = self._scrape_section(url, section_name, sector, company_type, region)
-                    if section_grants:
-                        all_grants.extend(section_grants)
-                        self.logger.info(f"Encontradas {len(section_grants)} ayudas en {section_name}")
-                    
-                    time.sleep(2)  # Rate limiting
+                    section_links.extend((section_name, link_data) for link_data in self._section_links(url, section_name))
                     
                 except Exception as e:
                     self.logger.warning(f"Error scrapeando IDAE {section_name}: {e}")
                     continue
             
-            # Procesar y filtrar resultados
-            filtered_grants = self._process_results(all_grants, sector, company_type, region)
-            
-            self.logger.info(f"IDAE scraping completado: {len(filtered_grants)} ayudas válidas encontradas")
-            return filtered_grants
+            # Páginas de detalle, según la frontera de rastreo
+            all_grants = self._crawl_details(section_links)
+            self.logger.info(f"IDAE scraping completado: {len(all_grants)} ayudas conocidas")
+            return all_grants
             
         except Exception as e:
             self.logger.error(f"Error general en scraper IDAE: {e}")
             return []
     
-    def _scrape_section(self, url: str, section_name: str, sector: str, company_type: str, region: str) -> List[Dict]:
-        """Scrapea una sección específica del IDAE."""
+    def select(self, grants: List[Grant], sector: str, company_type: str, region: str) -> List[Grant]:
+        """Ayudas del rastreo relevantes para los criterios, deduplicadas y recortadas."""
+        # Copias: el rastreo se reutiliza entre búsquedas y la fusión de duplicados modifica la canónica
+        relevant = [dataclasses.replace(grant) for grant in grants
+                    if self._is_relevant_grant(grant, sector, company_type, region)]
+        filtered_grants = self._process_results(relevant, sector, company_type, region)
+        self.logger.info(f"IDAE: {len(filtered_grants)} ayudas válidas encontradas")
+        return filtered_grants
+    
+    def _section_links(self, url: str, section_name: str) -> List[Dict]:
+        """Enlaces a programas de una sección del IDAE."""
+        # Realizar petición HTTP
+        content = self._fetch_page(url, self.config.get('timeout', 20))
+        if content is None:
+            return []
+        
+        # Buscar enlaces a programas y convocatorias
+        program_links = parsing.submit(self, 'idae', 'parse_links', content).result()
+        
+        self.logger.info(f"Encontrados {len(program_links)} enlaces en IDAE {section_name}")
+        return program_links
+    
+    def _crawl_details(self, section_links: List[tuple]) -> List[Grant]:
+        """
+        Descarga, dentro del presupuesto de la búsqueda, las páginas de detalle
+        que la frontera de rastreo considera nuevas o probablemente cambiadas, y
+        construye las ayudas de todos los enlaces ya conocidos (con los datos
+        guardados los que no se descargan en esta búsqueda).
+        """
         grants = []
         
-        try:
-            # Realizar petición HTTP
-            response = self.session.get(url, timeout=self.config.get('timeout', 20))
-            
-            if response.status_code != 200:
-                self.logger.warning(f"Error HTTP {response.status_code} para {url}")
-                return grants
-            
-            soup = self.BeautifulSoup(response.content, 'html.parser')
+        # Un enlace presente en varias secciones se procesa una sola vez
+        links = {}
+        for section_name, link_data in section_links:
+            links.setdefault(link_data['url'], (section_name, link_data))
+        
+        to_fetch, stored = self.frontier.plan(list(links), self.config.get('crawl_budget', self.CRAWL_BUDGET))
+        self.logger.info(f"IDAE: {len(links)} enlaces, {len(to_fetch)} páginas a descargar, "
+                         f"{len(stored)} con datos guardados")
+        
+        # Se descargan las páginas de detalle mientras el pool de parseo (si está activo) extrae las anteriores
+        pending = {}
+        for url in to_fetch:
+            page = self._fetch_page(url, 15)
+            future = parsing.submit(self, 'idae', 'parse_detail', page, links[url][1]['title']) if page else None
+            pending[url] = (page, future)
+        
+        # Procesar cada enlace conocido
+        fetched = []
+        for url, (section_name, link_data) in links.items():
+            if url in pending:
+                page, future = pending[url]
+                details = self._details(link_data, future)
+                fetched.append((url, page, details))
+                # Si la descarga falla se usa la última versión guardada
+                details = details or stored.get(url)
+            elif url in stored:
+                details = stored[url]
+            else:
+                # Aún no descargada: entrará en el presupuesto de una próxima búsqueda
+                continue
             
-            # Buscar enlaces a programas y ayudas
-            program_links = self._find_program_links(soup)
-            
-            self.logger.info(f"Encontrados {len(program_links)} enlaces en IDAE {section_name}")
-            
-            # Procesar cada enlace encontrado
-            for i, link_data in enumerate(program_links[:12]):  # Limitar a 12 por sección
-                try:
-                    grant_data = self._extract_grant_from_link(link_data, section_name)
-                    
-                    if grant_data and self._is_relevant_grant(grant_data, sector, company_type, region):
-                        grants.append(grant_data)
+            try:
+                grant_data = self._extract_grant_from_link(link_data, section_name, details)
+                
+                if grant_data:
+                    grants.append(grant_data)
                     
-                    # Rate limiting entre enlaces
-                    if i < len(program_links) - 1:
-                        time.sleep(1.5)
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error procesando enlace IDAE {link_data.get('title', 'N/A')}: {e}")
-                    continue
-            
-        except Exception as e:
-            self.logger.error(f"Error scrapeando sección IDAE {url}: {e}")
+            except Exception as e:
+                self.logger.warning(f"Error procesando enlace IDAE {link_data.get('title', 'N/A')}: {e}")
+                continue
         
+        self.frontier.record(fetched)
         return grants
     
+    def _fetch_page(self, url: str, timeout: float) -> Optional[bytes]:
+        """HTML de una página (bytes sin decodificar), o None si la petición falla."""
+        try:
+            throttle(url, self.REQUEST_INTERVAL).wait()
+            response = self.session.get(url, headers=self.headers, timeout=timeout)
+        except Exception as e:
+            self.logger.warning(f"Error descargando IDAE {url}: {e}")
+            return None
+        if response.status_code != 200:
+            self.logger.warning(f"Error HTTP {response.status_code} para {url}")
+            return None
+        return response.content
+    
+    def _details(self, link_data: Dict, future) -> Optional[Dict]:
+        """Resultado de la extracción de una página de detalle (None si no se pudo descargar o parsear)."""
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            self.logger.warning(f"Error parseando IDAE {link_data.get('url', 'N/A')}: {e}")
+            return None
+    
+    def parse_links(self, content: bytes) -> List[Dict]:
+        """Enlaces a programas de una página de sección (extractor del pool de parseo)."""
+        return self._find_program_links(self.BeautifulSoup(content, 'html.parser'))
+    
+    def parse_detail(self, content: bytes, title: str) -> Dict:
+        """Descripción, importe, plazo y comunidad de la página de una ayuda (extractor del pool de parseo)."""
+        soup = self.BeautifulSoup(content, 'html.parser')
+        return {'description': self._extract_description_from_idae_page(soup, title),
+                'amount': self._extract_amount_from_idae_page(soup),
+                'deadline': self._extract_deadline_from_idae_page(soup),
+                'target_region': self._extract_target_region_from_page(soup)}
+    
     def _find_program_links(self, soup) -> List[Dict]:
         """Encuentra enlaces a programas y ayudas del IDAE."""
         links = []
@@ -203,49 +296,40 @@ class IdaeScraper:
         
         return False
     
-    def _extract_grant_from_link(self, link_data: Dict, section_name: str) -> Optional[Dict]:
-        """Extrae información de una ayuda desde su página específica."""
+    def _extract_grant_from_link(self, link_data: Dict, section_name: str, details: Optional[Dict] = None) -> Optional[Grant]:
+        """Construye la ayuda a partir del enlace y los datos extraídos de su página específica."""
         try:
             url = link_data['url']
             title = link_data['title']
             
-            # Intentar obtener más detalles de la página específica
-            try:
-                response = self.session.get(url, timeout=15)
-                if response.status_code == 200:
-                    soup = self.BeautifulSoup(response.content, 'html.parser')
-                    description = self._extract_description_from_idae_page(soup, title)
-                    amount = self._extract_amount_from_idae_page(soup)
-                    deadline = self._extract_deadline_from_idae_page(soup)
-                    target_region = self._extract_target_region_from_page(soup)
-                else:
-                    description = None
-                    amount = "Consultar convocatoria"
-                    deadline = self._estimate_deadline()
-                    target_region = 'Todas'
-            except:
+            if details:
+                description = details['description']
+                amount = details['amount']
+                deadline = details['deadline']
+                target_region = details['target_region']
+            else:
                 description = None
                 amount = "Consultar convocatoria"
                 deadline = self._estimate_deadline()
                 target_region = 'Todas'
             
             # Generar datos de la ayuda
-            grant = {
-                'title': title,
-                'description': description or f"Programa del IDAE relacionado con eficiencia energética y sostenibilidad. Consulta la documentación oficial.",
-                'sector': self._determine_energy_sector_from_content(title + ' ' + (description or '')),
-                'location': 'España',
-                'region': target_region,
-                'company_type': self._determine_idae_company_type(title + ' ' + (description or '')),
-                'amount': amount,
-                'deadline': deadline,
-                'publication_date': self._estimate_publication_date(),
-                'source': 'IDAE - Instituto para la Diversificación y Ahorro de la Energía',
-                'link': url,
-                'relevance_score': self._calculate_idae_relevance_score(title, description or ''),
-                'identifier': self._generate_identifier(title, 'IDAE'),
-                'energy_focus': self._extract_energy_focus_from_content(title + ' ' + (description or ''))
-            }
+            grant = Grant(
+                title=title,
+                description=description or f"Programa del IDAE relacionado con eficiencia energética y sostenibilidad. Consulta la documentación oficial.",
+                sector=self._determine_energy_sector_from_content(title + ' ' + (description or '')),
+                location='España',
+                region=target_region,
+                company_type=self._determine_idae_company_type(title + ' ' + (description or '')),
+                amount=amount,
+                deadline=deadline,
+                publication_date=self._estimate_publication_date(),
+                source='IDAE - Instituto para la Diversificación y Ahorro de la Energía',
+                link=url,
+                relevance_score=self._calculate_idae_relevance_score(title, description or ''),
+                identifier=stable_identifier('IDAE', url, title),
+                energy_focus=self._extract_energy_focus_from_content(title + ' ' + (description or ''))
+            )
             
             return grant
             
@@ -459,69 +543,56 @@ class IdaeScraper:
         
         return max(1, min(10, score))
     
-    def _is_relevant_grant(self, grant: Dict, sector: str, company_type: str, region: str) -> bool:
+    def _is_relevant_grant(self, grant: Grant, sector: str, company_type: str, region: str) -> bool:
         """Verifica si la ayuda IDAE es relevante."""
-        if not grant or not grant.get('title'):
+        if not grant or not grant.title:
             return False
         
         # Verificar fechas válidas
-        try:
-            deadline = datetime.datetime.strptime(grant['deadline'], '%Y-%m-%d')
-            if deadline < datetime.datetime.now() - datetime.timedelta(days=30):
+        if grant.deadline_ordinal is not None:
+            if grant.deadline_ordinal < (datetime.datetime.now() - datetime.timedelta(days=30)).toordinal():
                 return False
-        except:
-            pass
         
         # Verificar relevancia de sector (más flexible para IDAE - enfoque energético)
         if sector not in ['Todos', 'Energía', 'Construcción', 'Transporte', 'Industria']:
-            content = (grant.get('title', '') + ' ' + grant.get('description', '')).lower()
+            content = (grant.title + ' ' + grant.description).lower()
             energy_keywords = ['energía', 'eficiencia', 'renovable', 'sostenible', 'autoconsumo']
             if not any(keyword in content for keyword in energy_keywords):
                 return False
         
         # Verificar tipo de empresa
         if company_type != 'Todos':
-            grant_company_type = grant.get('company_type', 'Todos')
+            grant_company_type = grant.company_type
             if grant_company_type != 'Todos' and grant_company_type != company_type:
                 return False
         
         # Verificar región
         if region != 'Todas':
-            grant_region = grant.get('region', 'Todas')
+            grant_region = grant.region
             if grant_region != 'Todas' and grant_region != region:
                 return False
         
         # Verificar relevancia mínima
-        if grant.get('relevance_score', 0) < 5:
+        if grant.relevance_score < 5:
             return False
         
         return True
     
-    def _process_results(self, grants: List[Dict], sector: str, company_type: str, region: str) -> List[Dict]:
+    def _process_results(self, grants: List[Grant], sector: str, company_type: str, region: str) -> List[Grant]:
         """Procesa y filtra los resultados del IDAE."""
         if not grants:
             return []
         
-        # Eliminar duplicados por título similar
-        unique_grants = {}
-        for grant in grants:
-            # Crear clave única considerando título y foco energético
-            title_key = re.sub(r'[^\w\s]', '', grant.get('title', '')).lower()[:40]
-            energy_focus = grant.get('energy_focus', 'general').lower()
-            unique_key = f"{title_key}_{energy_focus}"
-            
-            if unique_key not in unique_grants:
-                unique_grants[unique_key] = grant
-            elif grant.get('relevance_score', 0) > unique_grants[unique_key].get('relevance_score', 0):
-                unique_grants[unique_key] = grant
+        # Fusionar casi duplicados; los programas con distinto foco energético se mantienen separados
+        unique_grants = batch_engine.deduplicate(grants)
         
         # Filtrar por relevancia mínima
-        relevant_grants = [g for g in unique_grants.values() if g.get('relevance_score', 0) >= 5]
+        relevant_grants = [g for g in unique_grants if g.relevance_score >= 5]
         
         # Ordenar por relevancia y fecha
         sorted_grants = sorted(
             relevant_grants,
-            key=lambda x: (x.get('relevance_score', 0), x.get('publication_date', '1900-01-01')),
+            key=lambda x: (x.relevance_score, x.publication_ordinal or 0),
             reverse=True
         )
         
@@ -535,8 +606,3 @@ class IdaeScraper:
     def _estimate_publication_date(self) -> str:
         """Estima fecha de publicación."""
         return datetime.datetime.now().strftime('%Y-%m-%d')
-    
-    def _generate_identifier(self, title: str, source: str) -> str:
-        """Genera identificador único."""
-        normalized = re.sub(r'[^\w]', '', title.lower())
-        return f"{source}_{normalized[:30]}_{hash(title) % 10000}"
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+Etapa opcional de parseo HTML en un pool de procesos.
+
+BeautifulSoup y las expresiones regulares de los extractores son Python puro
+y, con varias búsquedas en hilos, se serializan en el GIL. Con PARSE_WORKERS
+mayor que 0 (o 'auto', un proceso por núcleo), los hilos que descargan páginas
+envían los bytes HTML tal cual a procesos del pool, que devuelven solo los
+datos extraídos (listas de enlaces o diccionarios pequeños de texto), no el
+árbol del documento. Sin pool, el mismo extractor se ejecuta en el propio hilo.
+
+Los resultados se guardan además en una cache persistente indexada por la
+huella del HTML y la versión del extractor: una página idéntica byte a byte
+no se vuelve a parsear, y al subir la versión de un extractor
+(EXTRACTOR_VERSIONS de cada scraper) solo se descartan sus resultados.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from scraper.keywords import REGION_KEYWORDS
+from services.store import LocalStore
+from utils.tracing import current_span, record_span, span
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Scrapers sin sesión del proceso del pool, creados en su primer uso
+_scrapers: Dict[str, object] = {}
+
+
+def parse_workers() -> int:
+    """Tamaño del pool de parseo configurado (0 = parseo en el propio hilo)."""
+    value = os.environ.get('PARSE_WORKERS', '0').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    try:
+        return max(0, int(value))
+    except ValueError:
+        logger.warning(f"PARSE_WORKERS no válido: {value!r}; se parsea en el propio hilo")
+        return 0
+
+
+def parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos compartido por el proceso, o None si está desactivado."""
+    global _pool
+    if _pool is None:
+        workers = parse_workers()
+        if not workers:
+            return None
+        with _pool_lock:
+            if _pool is None:
+                # spawn: los procesos no heredan hilos, locks ni sockets del worker web
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+                logger.info(f"Pool de parseo HTML con {workers} procesos")
+    return _pool
+
+
+def _forget_pool():
+    # Un proceso hijo (p. ej. un worker de gunicorn) no puede usar el pool de su padre
+    global _pool
+    _pool = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pool)
+
+
+# Resultados guardados hace más de este tiempo se eliminan de la cache
+PARSE_CACHE_DAYS = 30
+
+_MISSING = object()
+
+# Cachés ya recortadas en este proceso (ruta del almacén, fuente)
+_pruned = set()
+_pruned_lock = threading.Lock()
+
+
+class ParseCache:
+    """Resultados de los extractores en el almacén local, por huella del HTML y versión del extractor."""
+
+    def __init__(self, store: LocalStore):
+        self.store = store
+
+    @staticmethod
+    def key(source: str, extractor: str, version: int, content: bytes, args: tuple) -> str:
+        digest = hashlib.blake2b(content, digest_size=16)
+        digest.update(json.dumps(args, ensure_ascii=False).encode('utf-8'))
+        return f"{source}:{extractor}:v{version}:{digest.hexdigest()}"
+
+    def get(self, key: str):
+        """Resultado guardado, o _MISSING si no lo hay."""
+        rows = self.store.query("SELECT payload FROM parse_cache WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else _MISSING
+
+    def put(self, key: str, source: str, extractor: str, version: int, result) -> None:
+        self.store.execute(
+            "INSERT OR REPLACE INTO parse_cache (key, source, extractor, version, payload, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, source, extractor, version, json.dumps(result, ensure_ascii=False), time.time())
+        )
+
+    def prune(self, source: str, versions: Dict[str, int]) -> int:
+        """Elimina los resultados de versiones anteriores de los extractores y los antiguos."""
+        removed = self.store.execute("DELETE FROM parse_cache WHERE source = ? AND created_at < ?",
+                                     (source, time.time() - PARSE_CACHE_DAYS * 86400)).rowcount
+        for extractor, version in versions.items():
+            removed += self.store.execute(
+                "DELETE FROM parse_cache WHERE source = ? AND extractor = ? AND version != ?",
+                (source, extractor, version)
+            ).rowcount
+        return removed
+
+
+def parse_cache(store: LocalStore, source: str, versions: Dict[str, int]) -> ParseCache:
+    """Cache de parseo de una fuente; la primera vez en el proceso descarta las versiones antiguas."""
+    cache = ParseCache(store)
+    with _pruned_lock:
+        first = (store.path, source) not in _pruned
+        _pruned.add((store.path, source))
+    if first:
+        try:
+            removed = cache.prune(source, versions)
+            if removed:
+                logger.info(f"Cache de parseo de {source}: {removed} resultados obsoletos eliminados")
+        except Exception as e:
+            logger.warning(f"No se pudo recortar la cache de parseo de {source}: {e}")
+    return cache
+
+
+def _scraper(source: str):
+    scraper = _scrapers.get(source)
+    if scraper is None:
+        if source == 'cdti':
+            from scraper.web.cdti import CdtiScraper as scraper_class
+        else:
+            from scraper.web.idae import IdaeScraper as scraper_class
+        scraper = _scrapers[source] = scraper_class(None, {}, REGION_KEYWORDS, logger)
+    return scraper
+
+
+def run_extractor(source: str, extractor: str, content: bytes, *args):
+    """Ejecuta un extractor de la fuente sobre el HTML; función de módulo para poder enviarse al pool."""
+    return getattr(_scraper(source), extractor)(content, *args)
+
+
+def _timed_extractor(source: str, extractor: str, content: bytes, *args):
+    start_ns = time.time_ns()
+    result = run_extractor(source, extractor, content, *args)
+    return start_ns, time.time_ns(), result
+
+
+def submit(scraper, source: str, extractor: str, content: bytes, *args) -> Future:
+    """
+    Programa la extracción de una página: desde la cache si ya se extrajo ese
+    mismo HTML con la versión actual del extractor, en el pool si está activo
+    o, si no, en este hilo con el propio scraper (futuro ya resuelto).
+    """
+    name = f"parse.{source}.{extractor}"
+    future = Future()
+    cache = scraper.parse_cache
+    version = scraper.EXTRACTOR_VERSIONS[extractor]
+    key = cache.key(source, extractor, version, content, args)
+    start_ns = time.time_ns()
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning(f"No se pudo leer la cache de parseo {key}: {e}")
+        cached = _MISSING
+    if cached is not _MISSING:
+        record_span(name, current_span(), start_ns, time.time_ns(), **{'parse.mode': 'cache', 'html.bytes': len(content)})
+        future.set_result(cached)
+        return future
+
+    pool = parse_pool()
+    if pool is None:
+        with span(name, **{'parse.mode': 'inline', 'html.bytes': len(content)}):
+            try:
+                result = getattr(scraper, extractor)(content, *args)
+            except Exception as e:
+                future.set_exception(e)
+                return future
+        _store(cache, key, source, extractor, version, result)
+        future.set_result(result)
+        return future
+
+    # El span se mide en el proceso del pool y se añade a la traza antes de entregar el resultado
+    parent = current_span()
+
+    def deliver(task: Future):
+        try:
+            start_ns, end_ns, result = task.result()
+        except Exception as e:
+            future.set_exception(e)
+            return
+        record_span(name, parent, start_ns, end_ns, **{'parse.mode': 'process', 'html.bytes': len(content)})
+        _store(cache, key, source, extractor, version, result)
+        future.set_result(result)
+
+    pool.submit(_timed_extractor, source, extractor, content, *args).add_done_callback(deliver)
+    return future
+
+
+def _store(cache: ParseCache, key: str, source: str, extractor: str, version: int, result) -> None:
+    # La cache es una optimización: si no se puede escribir, se sigue con el resultado
+    try:
+        cache.put(key, source, extractor, version, result)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar en la cache de parseo {key}: {e}")
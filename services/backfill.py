@@ -0,0 +1,221 @@
+"""
+Recarga histórica del BOE en el catálogo local.
+
+Uso:
+    python -m services.backfill --start 2026-01-01                  # hasta hoy
+    python -m services.backfill --start 2026-01-01 --end 2026-03-31 --workers 8 --rate 5
+
+Los días del rango se reparten entre un grupo de hilos que comparten un único
+límite de peticiones por segundo. Cada día descargado queda registrado como
+punto de control junto con sus anuncios, en escrituras por lotes: si la
+ejecución se interrumpe, al relanzarla solo se piden los días pendientes.
+Los días recargados no se recortan con la ventana de retención de la ingesta
+incremental (BOE_RETENTION_DAYS).
+"""
+import argparse
+import datetime
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+import requests
+
+from scraper.api.boe import BoeScraper, WATERMARK_NAME
+from services.store import LocalStore
+
+# Estados de un día en los puntos de control
+STATUS_OK = 'ok'            # sumario descargado
+STATUS_MISSING = 'missing'  # día sin BOE (404)
+STATUS_PENDING = 'pending'  # sumario de hoy aún no publicado
+STATUS_ERROR = 'error'      # fallo de red o del servidor: se reintenta en la próxima ejecución
+DONE_STATUSES = (STATUS_OK, STATUS_MISSING)
+
+
+class RateLimiter:
+    """Límite global de peticiones por segundo compartido por todos los hilos."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BoeBackfill:
+    """Descarga en paralelo un rango de sumarios del BOE usando BoeScraper."""
+
+    def __init__(self, grant_api, store: LocalStore, workers: int = 4, rate: float = 4.0,
+                 batch_size: int = 500, retries: int = 2):
+        self.grant_api = grant_api
+        self.store = store
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.batch_size = batch_size
+        self.retries = retries
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+
+    def _scraper(self) -> BoeScraper:
+        # Cada hilo usa su propia sesión HTTP
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            session = requests.Session()
+            session.headers.update(self.grant_api.session.headers)
+            scraper = BoeScraper(session, self.grant_api.apis['boe'], self.grant_api.spanish_regions,
+                                 self.grant_api.logger, self.store)
+            self._local.scraper = scraper
+        return scraper
+
+    def pending_days(self, start: datetime.date, end: datetime.date, force: bool = False) -> List[str]:
+        days = []
+        day = start
+        while day <= end:
+            days.append(day.strftime('%Y%m%d'))
+            day += datetime.timedelta(days=1)
+        if force:
+            return days
+        done = {fecha for fecha, in self.store.query(
+            f"SELECT fecha FROM boe_backfill WHERE fecha BETWEEN ? AND ? AND status IN ({','.join('?' * len(DONE_STATUSES))})",
+            (days[0], days[-1], *DONE_STATUSES)
+        )} if days else set()
+        return [fecha for fecha in days if fecha not in done]
+
+    def fetch_day(self, fecha: str, today: str) -> Tuple[str, str, List[tuple]]:
+        """Descarga un día con reintentos. Devuelve (fecha, estado, filas)."""
+        scraper = self._scraper()
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                status, rows = scraper.fetch_sumario(fecha)
+            except Exception as e:
+                self.logger.warning(f"Error descargando el sumario {fecha} (intento {attempt + 1}): {e}")
+                continue
+            if status == 200:
+                return fecha, STATUS_OK, rows
+            if status == 404 and fecha < today:
+                return fecha, STATUS_MISSING, []
+            if status == 404:
+                return fecha, STATUS_PENDING, []
+            self.logger.warning(f"Sumario {fecha}: respuesta {status} (intento {attempt + 1})")
+        return fecha, STATUS_ERROR, []
+
+    def _flush(self, results: List[Tuple[str, str, List[tuple]]]) -> int:
+        """Escribe anuncios y puntos de control de un lote en una sola transacción."""
+        if not results:
+            return 0
+        now = time.time()
+        rows = [row for _, _, day_rows in results for row in day_rows]
+        with self.store.connection as connection:
+            added = connection.executemany(
+                "INSERT OR IGNORE INTO boe_items (identifier, fecha, position, titulo, url) VALUES (?, ?, ?, ?, ?)",
+                rows
+            ).rowcount if rows else 0
+            connection.executemany(
+                "INSERT INTO boe_backfill (fecha, status, items, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(fecha) DO UPDATE SET status = excluded.status, items = excluded.items, "
+                "updated_at = excluded.updated_at",
+                [(fecha, status, len(day_rows), now) for fecha, status, day_rows in results]
+            )
+        return added
+
+    def _advance_watermark(self, start: datetime.date):
+        """
+        Adelanta la marca de agua de la ingesta incremental sobre los días
+        consecutivos ya completados, para que no se vuelvan a descargar.
+        """
+        watermark = self.store.get_watermark(WATERMARK_NAME)
+        if watermark:
+            day = datetime.datetime.strptime(watermark, '%Y%m%d').date() + datetime.timedelta(days=1)
+        else:
+            day = start
+        done = {fecha for fecha, in self.store.query(
+            f"SELECT fecha FROM boe_backfill WHERE fecha >= ? AND status IN ({','.join('?' * len(DONE_STATUSES))})",
+            (day.strftime('%Y%m%d'), *DONE_STATUSES)
+        )}
+        last = None
+        while day.strftime('%Y%m%d') in done:
+            last = day.strftime('%Y%m%d')
+            day += datetime.timedelta(days=1)
+        if last:
+            self.store.set_watermark(WATERMARK_NAME, last)
+
+    def run(self, start: datetime.date, end: datetime.date, force: bool = False) -> dict:
+        today = datetime.date.today()
+        end = min(end, today)
+
+        days = self.pending_days(start, end, force)
+        summary = {'days': len(days), STATUS_OK: 0, STATUS_MISSING: 0, STATUS_PENDING: 0, STATUS_ERROR: 0, 'items_added': 0}
+        self.logger.info(f"Recarga BOE: {len(days)} días pendientes con {self.workers} hilos")
+
+        started = time.time()
+        pending = []
+        pending_rows = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [executor.submit(self.fetch_day, fecha, today.strftime('%Y%m%d')) for fecha in days]
+            for future in as_completed(futures):
+                fecha, status, rows = future.result()
+                summary[status] += 1
+                pending.append((fecha, status, rows))
+                pending_rows += len(rows)
+                if pending_rows >= self.batch_size:
+                    summary['items_added'] += self._flush(pending)
+                    pending, pending_rows = [], 0
+                    self.logger.info(f"Recarga BOE: {summary[STATUS_OK] + summary[STATUS_MISSING]}/{len(days)} días completados")
+        finally:
+            # Ante una interrupción se guarda lo ya descargado y se cancelan los días en cola
+            executor.shutdown(wait=True, cancel_futures=True)
+            summary['items_added'] += self._flush(pending)
+            self._advance_watermark(start)
+
+        summary['elapsed_s'] = round(time.time() - started, 2)
+        return summary
+
+
+def _parse_date(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha no válida: {value} (formato AAAA-MM-DD)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recarga histórica paralela y reanudable de los sumarios del BOE.")
+    parser.add_argument('--start', type=_parse_date, required=True, help="primer día (AAAA-MM-DD)")
+    parser.add_argument('--end', type=_parse_date, default=datetime.date.today(), help="último día (por defecto, hoy)")
+    parser.add_argument('--workers', type=int, default=4, help="hilos de descarga")
+    parser.add_argument('--rate', type=float, default=4.0, help="peticiones por segundo en total")
+    parser.add_argument('--batch-size', type=int, default=500, help="anuncios por escritura en bloque")
+    parser.add_argument('--retries', type=int, default=2, help="reintentos por día ante errores")
+    parser.add_argument('--force', action='store_true', help="volver a descargar días ya completados")
+    args = parser.parse_args(argv)
+
+    if args.start > args.end:
+        parser.error("--start debe ser anterior o igual a --end")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from scraper.api_client import RealGrantAPI
+
+    grant_api = RealGrantAPI()
+    backfill = BoeBackfill(grant_api, grant_api.store, workers=args.workers, rate=args.rate,
+                           batch_size=args.batch_size, retries=args.retries)
+    summary = backfill.run(args.start, args.end, force=args.force)
+    print(
+        f"Días: {summary['days']} (descargados {summary[STATUS_OK]}, sin BOE {summary[STATUS_MISSING]}, "
+        f"pendientes {summary[STATUS_PENDING]}, con error {summary[STATUS_ERROR]}) · anuncios nuevos: {summary['items_added']} · {summary['elapsed_s']} s"
+    )
+    return 1 if summary[STATUS_ERROR] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
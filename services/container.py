@@ -0,0 +1,108 @@
+import gc
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from flask import Flask, current_app
+
+from utils.web_helpers import FragmentCache
+
+# Valores comodín de cada criterio, en el orden de search_grants (sector, ubicación, tipo de empresa, región)
+WILDCARD_CRITERIA = ('Todos', 'Todas', 'Todos', 'Todas')
+
+EXTENSION_NAME = 'grant_services'
+
+
+class ServiceContainer:
+    """
+    Servicios compartidos por todas las rutas de un proceso: un único
+    RealGrantAPI (cache de búsquedas, catálogo indexado y sesiones HTTP) y la
+    cache de fragmentos HTML. El buscador se construye en su primer uso, salvo
+    que se precaliente en el proceso maestro de gunicorn antes de crear los
+    workers, que heredan así las instantáneas de las fuentes, la cache y el
+    catálogo ya llenos.
+    """
+
+    def __init__(self, grant_api=None):
+        self._grant_api = grant_api
+        self._lock = threading.Lock()
+        self.grant_list_fragments = FragmentCache()
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def grant_api(self):
+        if self._grant_api is None:
+            with self._lock:
+                if self._grant_api is None:
+                    from scraper.api_client import RealGrantAPI
+                    self._grant_api = RealGrantAPI()
+        return self._grant_api
+
+    def warm_up(self, searches: List[Tuple[str, str, str, str]], freeze: bool = False) -> int:
+        """
+        Llena la cache con cada búsqueda indicada (la primera consulta las
+        fuentes y las demás se filtran de sus instantáneas); devuelve las
+        subvenciones cargadas. Con freeze, antes de crear procesos hijos, deja
+        los objetos ya creados fuera del recolector para que los workers
+        compartan sus páginas sin copiarlas.
+        """
+        start = time.time()
+        loaded = 0
+        for criteria in searches:
+            try:
+                loaded += len(self.grant_api.search_grants(*criteria))
+            except Exception as e:
+                self.logger.error(f"Error precalentando la búsqueda {criteria}: {e}")
+        if searches:
+            self.logger.info(f"Cache precalentada con {len(searches)} búsquedas ({loaded} subvenciones, "
+                             f"{len(self.grant_api.facets)} en catálogo) en {time.time() - start:.1f}s")
+        if freeze:
+            gc.freeze()
+        return loaded
+
+    def warm_up_in_background(self, searches: List[Tuple[str, str, str, str]]) -> Optional[threading.Thread]:
+        """Precalienta en un hilo aparte, para los procesos que no heredan un precalentamiento previo."""
+        if not searches:
+            return None
+        thread = threading.Thread(target=self.warm_up, args=(searches,), name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def after_fork(self) -> None:
+        """En un worker recién creado: conexiones propias en lugar de las heredadas del maestro."""
+        if self._grant_api is None:
+            return
+        self._grant_api.session.close()
+        self._grant_api.store.forget_connections()
+
+
+def parse_warm_up_searches(value: str) -> List[Tuple[str, str, str, str]]:
+    """
+    Lee búsquedas separadas por ';' con sus criterios separados por '|'
+    (sector|ubicación|tipo de empresa|región); los criterios vacíos, '*' o
+    que faltan son comodines, y '*' sola es la búsqueda sin filtros.
+    """
+    searches = []
+    for search in value.split(';'):
+        if not search.strip():
+            continue
+        fields = [field.strip() for field in search.split('|')][:len(WILDCARD_CRITERIA)]
+        fields += [''] * (len(WILDCARD_CRITERIA) - len(fields))
+        criteria = tuple(wildcard if field in ('', '*') else field
+                         for field, wildcard in zip(fields, WILDCARD_CRITERIA))
+        if criteria not in searches:
+            searches.append(criteria)
+    return searches
+
+
+def init_services(app: Flask, services: Optional[ServiceContainer] = None) -> ServiceContainer:
+    """Registra el contenedor de servicios en la aplicación."""
+    services = services or ServiceContainer()
+    app.extensions[EXTENSION_NAME] = services
+    return services
+
+
+def get_services() -> ServiceContainer:
+    """Contenedor de servicios de la aplicación en curso."""
+    return current_app.extensions[EXTENSION_NAME]
@@ -1,43 +1,82 @@
 import datetime
+import importlib.util
 from typing import List, Dict, Tuple
 
-def process_grants_data(grants: List[Dict], start_time: datetime.datetime = None) -> Tuple[List[Dict], Dict]:
+from scraper.grant import Grant
+from utils.dates import reference_day
+
+# NumPy solo se importa la primera vez que se vectoriza un lote grande
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+# A partir de este tamaño de lote compensa vectorizar con NumPy
+VECTORIZE_THRESHOLD = 256
+
+# Límites superiores (días restantes) de cada nivel de urgencia
+URGENCY_LEVELS = ((7, 'critical'), (30, 'high'), (60, 'medium'))
+
+
+def _urgency(days_remaining: int) -> str:
+    for limit, level in URGENCY_LEVELS:
+        if days_remaining <= limit:
+            return level
+    return 'low'
+
+
+def _days_remaining_scalar(grants: List[Grant], today: int, offset: int) -> List[int]:
+    days = []
+    for grant in grants:
+        ordinal = grant.deadline_ordinal
+        days.append(max(0, ordinal - today - offset) if ordinal is not None else 0)
+    return days
+
+
+def _days_remaining_vectorized(grants: List[Grant], today: int, offset: int) -> List[int]:
+    import numpy as np
+    # Los ordinales se pasan a datetime64[D] (días desde 1970-01-01); 0 marca "sin fecha"
+    epoch = datetime.date(1970, 1, 1).toordinal()
+    ordinals = np.fromiter(((g.deadline_ordinal or 0) for g in grants), dtype=np.int64, count=len(grants))
+    valid = ordinals > 0
+    deadlines = (ordinals - epoch).astype('datetime64[D]')
+    today64 = np.datetime64(datetime.date.fromordinal(today), 'D')
+    days = (deadlines - today64).astype(np.int64) - offset
+    return np.where(valid, np.maximum(days, 0), 0).tolist()
+
+
+def process_grants_data(grants: List[Grant], start_time: datetime.datetime = None) -> Tuple[List[Grant], Dict]:
     """
     Procesa la lista de subvenciones para añadir información adicional como días restantes e indicadores de urgencia.
     Calcula y devuelve estadísticas de búsqueda.
+
+    Todas las fechas se comparan contra un único "ahora" y las estadísticas se
+    acumulan en la misma pasada que asigna la urgencia.
     """
-    processed_grants = []
-    
-    for grant in grants:
-        # Añadir días restantes y urgencia
-        try:
-            deadline = datetime.datetime.strptime(grant.get('deadline', ''), "%Y-%m-%d")
-            days_remaining = (deadline - datetime.datetime.now()).days
-            grant['days_remaining'] = max(0, days_remaining)
-        except (ValueError, TypeError):
-            grant['days_remaining'] = 0
-
-        if grant['days_remaining'] <= 7:
-            grant['urgency'] = 'critical'
-        elif grant['days_remaining'] <= 30:
-            grant['urgency'] = 'high'
-        elif grant['days_remaining'] <= 60:
-            grant['urgency'] = 'medium'
-        else:
-            grant['urgency'] = 'low'
-        
-        processed_grants.append(grant)
+    today, offset = reference_day()
+
+    if NUMPY_AVAILABLE and len(grants) >= VECTORIZE_THRESHOLD:
+        days_remaining = _days_remaining_vectorized(grants, today, offset)
+    else:
+        days_remaining = _days_remaining_scalar(grants, today, offset)
+
+    active_grants = 0
+    urgent_grants = 0
+    for grant, days in zip(grants, days_remaining):
+        urgency = _urgency(days)
+        grant.days_remaining = days
+        grant.urgency = urgency
+        if days > 0:
+            active_grants += 1
+        if urgency in ('critical', 'high'):
+            urgent_grants += 1
 
     # Calcular estadísticas
     end_time = datetime.datetime.now()
     search_time = round((end_time - start_time).total_seconds(), 2) if start_time else 0
-    results_count = len(processed_grants)
 
     stats = {
-        'total_results': results_count,
-        'active_grants': len([g for g in processed_grants if g.get('days_remaining', 0) > 0]),
-        'urgent_grants': len([g for g in processed_grants if g.get('urgency') in ['critical', 'high']]),
+        'total_results': len(grants),
+        'active_grants': active_grants,
+        'urgent_grants': urgent_grants,
         'search_time': search_time
     }
-    
-    return processed_grants, stats
\ No newline at end of file
+
+    return grants, stats
@@ -0,0 +1,167 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence
+
+# Directorio de datos persistentes (catálogo, marcas de agua...)
+DEFAULT_DATA_DIR = 'data'
+DEFAULT_DB_NAME = 'subvenciones.db'
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS watermarks (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )""",
+    # Catálogo de anuncios del BOE ya filtrados como posibles ayudas
+    """CREATE TABLE IF NOT EXISTS boe_items (
+        identifier TEXT PRIMARY KEY,
+        fecha TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        titulo TEXT NOT NULL,
+        url TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_boe_items_fecha ON boe_items (fecha)",
+    # Convocatorias abiertas y próximas del EU Funding & Tenders Portal
+    """CREATE TABLE IF NOT EXISTS eu_calls (
+        reference TEXT PRIMARY KEY,
+        start_date TEXT,
+        payload TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_eu_calls_start_date ON eu_calls (start_date)",
+    # Firmas MinHash, cubetas LSH y clústeres de casi duplicados
+    """CREATE TABLE IF NOT EXISTS dedup_signatures (
+        key TEXT PRIMARY KEY,
+        cluster_id TEXT NOT NULL,
+        source TEXT,
+        signature BLOB NOT NULL,
+        numbers TEXT NOT NULL DEFAULT '',
+        energy_focus TEXT,
+        updated_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS dedup_buckets (
+        bucket TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (bucket, key)
+    )""",
+    # Frontera de rastreo de las páginas de detalle del CDTI e IDAE (ver scraper/frontier.py)
+    """CREATE TABLE IF NOT EXISTS crawl_frontier (
+        url TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        first_fetch REAL,
+        last_fetch REAL,
+        content_hash TEXT,
+        fetches INTEGER NOT NULL DEFAULT 0,
+        changes INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL,
+        details TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_crawl_frontier_source ON crawl_frontier (source)",
+    # Resultados de los extractores HTML por huella de la página (ver scraper/web/parsing.py)
+    """CREATE TABLE IF NOT EXISTS parse_cache (
+        key TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        extractor TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_parse_cache_source ON parse_cache (source, extractor, version)",
+    # Puntos de control de la recarga histórica del BOE (un registro por día)
+    """CREATE TABLE IF NOT EXISTS boe_backfill (
+        fecha TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        items INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL
+    )""",
+]
+
+# Columnas añadidas después de crear la tabla: CREATE TABLE IF NOT EXISTS no las añade a bases ya existentes
+ADDED_COLUMNS = [
+    ('crawl_frontier', 'next_attempt_at', 'REAL'),
+]
+
+
+def default_db_path() -> str:
+    return os.path.join(os.environ.get('DATA_DIR', DEFAULT_DATA_DIR), DEFAULT_DB_NAME)
+
+
+class LocalStore:
+    """
+    Almacén local en SQLite compartido por los procesos de la aplicación.
+    Cada hilo usa su propia conexión; el modo WAL permite lecturas concurrentes
+    mientras otro proceso escribe.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_db_path()
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        # Una base ':memory:' es distinta por conexión: se comparte una sola
+        self._shared = None
+        if self.path != ':memory:':
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path == ':memory:':
+            if self._shared is None:
+                self._shared = sqlite3.connect(':memory:', check_same_thread=False)
+            return self._shared
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def forget_connections(self):
+        """Descarta las conexiones heredadas tras un fork: SQLite no admite compartirlas entre procesos."""
+        if self.path != ':memory:':
+            self._local = threading.local()
+
+    def _create_schema(self):
+        with self.connection as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            for table, column, definition in ADDED_COLUMNS:
+                existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def execute(self, sql: str, params: Sequence = ()) -> sqlite3.Cursor:
+        with self.connection as connection:
+            return connection.execute(sql, params)
+
+    def executemany(self, sql: str, rows: Iterable[Sequence]) -> int:
+        """Ejecuta una escritura en bloque dentro de una única transacción."""
+        with self.connection as connection:
+            return connection.executemany(sql, rows).rowcount
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return self.connection.execute(sql, params).fetchall()
+
+    def get_watermark(self, name: str) -> Optional[str]:
+        rows = self.query("SELECT value FROM watermarks WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def set_watermark(self, name: str, value: str):
+        self.execute(
+            "INSERT INTO watermarks (name, value, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (name, value, time.time())
+        )
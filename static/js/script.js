@@ -939,6 +939,8 @@ class Subvenciones {
                     const pubA = new Date(a.dataset.publication);
                     const pubB = new Date(b.dataset.publication);
                     return pubB - pubA;
+                case 'relevance':
+                    return parseFloat(b.dataset.score) - parseFloat(a.dataset.score);
                 case 'alphabetical':
                     const titleA = a.querySelector('.card-title').textContent.toLowerCase();
                     const titleB = b.querySelector('.card-title').textContent.toLowerCase();
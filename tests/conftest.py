@@ -0,0 +1,60 @@
+import pytest
+
+from benchmarks.common import skipped_sleeps
+from benchmarks.stub_server import install_stub, start_stub_server
+
+
+@pytest.fixture(scope='session')
+def stub_port():
+    """Servidor con las respuestas grabadas de benchmarks/fixtures."""
+    process, port = start_stub_server()
+    yield port
+    process.terminate()
+    process.wait()
+
+
+@pytest.fixture
+def grant_api(stub_port, tmp_path, monkeypatch):
+    """RealGrantAPI con un almacén vacío y las fuentes servidas por el stub, sin pausas."""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    from scraper.api_client import RealGrantAPI
+    api = RealGrantAPI()
+    install_stub(api.session, stub_port)
+    with skipped_sleeps():
+        yield api
+
+
+@pytest.fixture
+def fresh_grant_api(grant_api, stub_port, tmp_path, monkeypatch):
+    """Otro RealGrantAPI con su propio almacén: una búsqueda en frío, sin cache ni catálogo compartidos."""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path / 'fresh'))
+    from scraper.api_client import RealGrantAPI
+    api = RealGrantAPI()
+    install_stub(api.session, stub_port)
+    return api
+
+
+@pytest.fixture
+def snapshot_calls(monkeypatch):
+    """Veces que se consulta cada fuente (instantánea completa) durante la prueba."""
+    from scraper.api.boe import BoeScraper
+    from scraper.api.eu_funding import EUFundingScraper
+    from scraper.web.cdti import CdtiScraper
+    from scraper.web.idae import IdaeScraper
+
+    calls = {}
+    for name, source in (('boe', BoeScraper), ('eu_funding', EUFundingScraper),
+                         ('cdti', CdtiScraper), ('idae', IdaeScraper)):
+        def counted(self, _snapshot=source.snapshot, _name=name):
+            calls[_name] = calls.get(_name, 0) + 1
+            return _snapshot(self)
+        monkeypatch.setattr(source, 'snapshot', counted)
+    return calls
+
+
+@pytest.fixture
+def client(grant_api):
+    """Cliente de pruebas de la aplicación con el buscador del stub."""
+    from app import create_app
+    from services.container import ServiceContainer
+    return create_app(ServiceContainer(grant_api)).test_client()
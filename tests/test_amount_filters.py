@@ -0,0 +1,51 @@
+from scraper.amounts import UNIT_EUR
+from scraper.grant import Grant, GrantList
+
+
+def make_grant(number, description, amount_max=None):
+    return Grant(title=f"Convocatoria {number}", description=description, sector='Energía', location='España',
+                 region='Todas', company_type='Todos', amount='', deadline='', publication_date='',
+                 source='Prueba', link=f"https://example.org/{number}", identifier=f"PRUEBA_{number}",
+                 amount_max=amount_max, amount_unit=UNIT_EUR if amount_max is not None else None)
+
+
+def candidates():
+    # 30 candidatos: solo el menos relevante (sin palabras del sector) está en el rango de importe
+    grants = [make_grant(number, 'Ayudas de energía renovable y eficiencia energética', 10000) for number in range(29)]
+    grants.append(make_grant(29, 'Convocatoria general', 2000000))
+    return GrantList(grants)
+
+
+def test_amount_range_applies_before_top_k(grant_api):
+    grants = candidates()
+    unfiltered = grant_api._rank_results(grants, ['Energía'], [])
+    assert 'PRUEBA_29' not in [grant.identifier for grant in unfiltered]
+
+    results = grant_api._rank_results(grants, ['Energía'], [], min_amount=1000000)
+
+    assert [grant.identifier for grant in results] == ['PRUEBA_29']
+
+
+def test_amount_sort_considers_every_candidate(grant_api):
+    results = grant_api._rank_results(candidates(), ['Energía'], [], amount_sort='desc')
+
+    assert len(results) == 25
+    assert results[0].identifier == 'PRUEBA_29'
+
+
+def test_amount_index_is_built_once_per_candidate_list(grant_api):
+    grants = candidates()
+    grant_api._rank_results(grants, ['Energía'], [], min_amount=1)
+    index = grants.amount_index
+    grant_api._rank_results(grants, ['Energía'], [], max_amount=50000)
+
+    assert grants.amount_index is index
+
+
+def test_export_applies_the_same_amount_filters_and_sort_as_search(client):
+    searched = client.get('/api/search?min_amount=100000&sort=amount_asc').get_json()['grants']
+    exported = client.post('/api/export/json', data={'min_amount': '100000', 'sort': 'amount_asc'}).get_json()['grants']
+
+    assert searched
+    assert [grant['Enlace'] for grant in exported] == [grant['link'] for grant in searched]
+    assert client.post('/api/export/json', data={'max_amount': 'mucho'}).status_code == 400
@@ -0,0 +1,23 @@
+import datetime
+import logging
+
+from scraper.api.boe import WATERMARK_NAME, BoeScraper
+from services.backfill import STATUS_OK, BoeBackfill
+from services.store import LocalStore
+
+CONFIG = {'sumarios_url': 'https://www.boe.es/datosabiertos/api/sumario', 'timeout': 5, 'retention_days': 90}
+TODAY = datetime.date(2026, 10, 19)
+
+
+def test_incremental_ingest_keeps_backfilled_days_beyond_retention(tmp_path):
+    store = LocalStore(str(tmp_path / 'subvenciones.db'))
+    scraper = BoeScraper(None, CONFIG, {}, logging.getLogger(__name__), store)
+    BoeBackfill(None, store)._flush([
+        ('20260301', STATUS_OK, [('BOE-A-2026-1', '20260301', 1, 'Ayudas recargadas', None)]),
+    ])
+    scraper.store_items([('BOE-A-2026-2', '20260302', 1, 'Ayudas de la ingesta incremental', None)])
+    store.set_watermark(WATERMARK_NAME, TODAY.strftime('%Y%m%d'))
+
+    scraper.ingest(today=TODAY)
+
+    assert store.query("SELECT identifier FROM boe_items") == [('BOE-A-2026-1',)]
@@ -0,0 +1,51 @@
+SEARCHES = [
+    {'sector': 'Energía'},
+    {'sector': ['Energía', 'Industria'], 'region': 'Galicia'},
+    {'company_type': 'PYME', 'query': 'eficiencia'},
+    {'sector': 'Energía', 'query': 'renovables'},
+    {'sector': 'Energía'},
+    {},
+]
+
+
+def rows(grants):
+    return [(grant.identifier, grant.score) for grant in grants]
+
+
+def test_batch_results_equal_individual_searches(grant_api):
+    batch = grant_api.search_grants_batch(SEARCHES)
+
+    assert len(batch) == len(SEARCHES)
+    for criteria, results in zip(SEARCHES, batch):
+        individual = grant_api.search_grants(criteria.get('sector', 'Todos'), criteria.get('location', 'Todas'),
+                                             criteria.get('company_type', 'Todos'), criteria.get('region', 'Todas'),
+                                             criteria.get('query', ''))
+        assert rows(results) == rows(individual), criteria
+
+
+def test_batch_fetches_each_distinct_key_once(grant_api):
+    fetched = []
+    fetch = grant_api._fetch_candidates
+    grant_api._fetch_candidates = lambda key: fetched.append(key) or fetch(key)
+
+    grant_api.search_grants_batch([{'sector': 'Energía'}, {'sector': 'Energía', 'query': 'solar'}, {'sector': 'Energía'}])
+
+    assert fetched == [('Energía', 'Todas', 'Todos', 'Todas')]
+
+
+def test_distinct_profiles_query_each_source_once(grant_api, snapshot_calls):
+    profiles = [{'sector': 'Energía'}, {'sector': 'Industria', 'company_type': 'PYME'},
+                {'location': 'UE', 'sector': 'Tecnología'}, {'region': ['Galicia', 'Madrid']}, {}]
+
+    results = grant_api.search_grants_batch(profiles)
+
+    assert all(results[:3])
+    assert snapshot_calls == {'boe': 1, 'eu_funding': 1, 'cdti': 1, 'idae': 1}
+
+
+def test_batch_returns_same_grants_as_a_fresh_individual_search(grant_api, fresh_grant_api):
+    batch = grant_api.search_grants_batch([{'sector': 'Energía'}, {'sector': 'Industria'}, {}])
+
+    individual = fresh_grant_api.search_grants('Energía', 'Todas', 'Todos', 'Todas')
+
+    assert sorted(grant.identifier for grant in batch[0]) == sorted(grant.identifier for grant in individual)
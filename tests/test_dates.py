@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+
+from scraper.grant import Grant
+from services import grants as grant_service
+from utils.dates import format_date_string, parse_date_ordinal, reference_day
+
+# Medianoche exacta, a media mañana y un instante antes del cambio de día
+NOWS = [datetime.datetime(2026, 10, 19), datetime.datetime(2026, 10, 19, 11, 30),
+        datetime.datetime(2026, 12, 31, 23, 59, 59, 999999)]
+DEADLINES = ['2026-10-19', '2026-10-20', '2026-10-26', '2026-10-27', '2026-11-18', '2026-12-18', '2027-01-01',
+             '2030-02-28', '2024-02-29', '2025-01-01', '', None, 'Consultar convocatoria', '2026-02-30',
+             '19/10/2026', '2026-10-19T10:00:00', ' 2026-10-20']
+
+
+def legacy_days_remaining(deadline, now):
+    """Cálculo por fila anterior a la vectorización."""
+    try:
+        return max(0, (datetime.datetime.strptime(deadline, "%Y-%m-%d") - now).days)
+    except (ValueError, TypeError):
+        return 0
+
+
+def legacy_urgency(days):
+    return 'critical' if days <= 7 else 'high' if days <= 30 else 'medium' if days <= 60 else 'low'
+
+
+def make_grants(count):
+    return [Grant(title=f"Ayuda {i}", description='', sector='Todos', location='España', region='Todas',
+                  company_type='Todos', amount='', deadline=DEADLINES[i % len(DEADLINES)], publication_date='',
+                  source='Prueba', link=f"https://example.org/{i}", identifier=str(i)) for i in range(count)]
+
+
+def test_parse_and_format_match_strptime():
+    for deadline in DEADLINES:
+        try:
+            parsed = datetime.datetime.strptime(deadline, "%Y-%m-%d")
+        except (ValueError, TypeError):
+            assert parse_date_ordinal(deadline) is None
+            assert format_date_string(deadline) == deadline
+        else:
+            assert parse_date_ordinal(deadline) == parsed.toordinal()
+            assert format_date_string(deadline) == parsed.strftime("%d/%m/%Y")
+
+
+@pytest.mark.parametrize('now', NOWS)
+def test_scalar_and_vectorized_match_the_per_row_computation(now):
+    grants = make_grants(len(DEADLINES) * 20)
+    today, offset = reference_day(now)
+    expected = [legacy_days_remaining(grant.deadline, now) for grant in grants]
+
+    assert grant_service._days_remaining_scalar(grants, today, offset) == expected
+    if grant_service.NUMPY_AVAILABLE:
+        assert grant_service._days_remaining_vectorized(grants, today, offset) == expected
+
+
+@pytest.mark.parametrize('count', [len(DEADLINES), grant_service.VECTORIZE_THRESHOLD + 1])
+def test_process_grants_data_matches_the_per_row_computation(monkeypatch, count):
+    now = NOWS[1]
+    monkeypatch.setattr(grant_service, 'reference_day', lambda: reference_day(now))
+    grants = make_grants(count)
+
+    processed, stats = grant_service.process_grants_data(grants)
+
+    expected = [legacy_days_remaining(grant.deadline, now) for grant in grants]
+    assert [grant.days_remaining for grant in processed] == expected
+    assert [grant.urgency for grant in processed] == [legacy_urgency(days) for days in expected]
+    assert stats['total_results'] == count
+    assert stats['active_grants'] == sum(days > 0 for days in expected)
+    assert stats['urgent_grants'] == sum(legacy_urgency(days) in ('critical', 'high') for days in expected)
@@ -0,0 +1,65 @@
+import pytest
+
+from scraper import dedup
+from scraper.dedup import DedupEngine
+from scraper.grant import Grant, stable_identifier
+from services.store import LocalStore
+
+BOE = 'BOE - Boletín Oficial del Estado'
+IDAE = 'IDAE - Instituto para la Diversificación y Ahorro de la Energía'
+
+
+def make_grant(source, title, link, **fields):
+    values = dict(title=title, description='Convocatoria oficial.', sector='Energía', location='España',
+                  region='Todas', company_type='Todos', amount='Consultar convocatoria', deadline='2030-01-31',
+                  publication_date='2026-10-01', source=source, link=link, relevance_score=5)
+    values.update(fields)
+    return Grant(**values, identifier=stable_identifier(source.split()[0], link, title))
+
+
+def test_same_call_from_boe_and_idae_merges_with_both_links():
+    boe = make_grant(BOE, 'Programa de incentivos al autoconsumo y almacenamiento con fuentes de energía renovable 2026',
+                     'https://www.boe.es/diario_boe/txt.php?id=BOE-B-2026-1')
+    idae = make_grant(IDAE, 'Programa de incentivos ligados al autoconsumo y almacenamiento con fuentes de energía renovable 2026',
+                      'https://www.idae.es/ayudas-y-financiacion/autoconsumo', relevance_score=7)
+
+    [merged] = DedupEngine().deduplicate([boe, idae])
+
+    assert merged is idae
+    assert [link['link'] for link in merged.source_links] == [boe.link, idae.link]
+
+
+@pytest.mark.parametrize('first, second', [
+    ('Ayudas a la eficiencia energética en la industria 2025', 'Ayudas a la eficiencia energética en la industria 2026'),
+    ('Plan MOVES III de movilidad eléctrica, tercera convocatoria 3', 'Plan MOVES III de movilidad eléctrica, tercera convocatoria 4'),
+])
+def test_titles_with_different_numbering_are_not_merged(first, second):
+    grants = [make_grant(BOE, first, 'https://www.boe.es/1'), make_grant(IDAE, second, 'https://www.idae.es/2')]
+
+    assert len(DedupEngine().deduplicate(grants)) == 2
+
+
+def test_second_run_reads_clusters_from_the_store(tmp_path, monkeypatch):
+    store = LocalStore(str(tmp_path / 'subvenciones.db'))
+    grants = [
+        make_grant(BOE, 'Programa de ayudas a la rehabilitación energética de edificios existentes',
+                   'https://www.boe.es/3'),
+        make_grant(IDAE, 'Programa de ayudas para la rehabilitación energética de edificios existentes',
+                   'https://www.idae.es/pree'),
+        make_grant(BOE, 'Subvenciones a proyectos de hidrógeno renovable en polos industriales',
+                   'https://www.boe.es/4'),
+    ]
+    DedupEngine(store).assign_clusters(grants)
+    clusters = [grant.cluster_id for grant in grants]
+
+    # Otro proceso: sin memoria propia, los clústeres salen del almacén sin volver a firmar ni comparar
+    monkeypatch.setattr(dedup, 'minhash_signature', _unexpected_signature)
+    again = [make_grant(grant.source, grant.title, grant.link) for grant in grants]
+    DedupEngine(store).assign_clusters(again)
+
+    assert clusters[0] == clusters[1] != clusters[2]
+    assert [grant.cluster_id for grant in again] == clusters
+
+
+def _unexpected_signature(*args):
+    pytest.fail('se recalculó la firma de una subvención ya agrupada')
@@ -0,0 +1,58 @@
+import logging
+
+from scraper.api.eu_funding import EUFundingScraper
+
+CONFIG = {'base_url': 'https://ec.europa.eu/info/funding-tenders', 'timeout': 5, 'page_size': 2, 'max_pages': 2}
+
+
+def make_call(number, title, objective=''):
+    return {'reference': f'CALL-{number}',
+            'publicData': {'title': {'es': title}, 'objective': {'es': objective},
+                           'link': f'https://ec.europa.eu/call/{number}', 'startDate': f'2026-01-{number:02d}'}}
+
+
+def make_scraper(calls):
+    """Fuente de la UE que sirve `calls` paginadas desde memoria."""
+    scraper = EUFundingScraper(None, CONFIG, logging.getLogger(__name__))
+    page_size = CONFIG['page_size']
+    scraper.calls = calls
+    scraper._fetch_page = lambda page_number: {
+        'totalResults': len(scraper.calls),
+        'results': scraper.calls[(page_number - 1) * page_size:page_number * page_size]}
+    return scraper
+
+
+def test_acronym_keywords_match_whole_uppercase_words():
+    scraper = make_scraper([
+        make_call(1, 'Its item list for Italia'),
+        make_call(2, 'IT security for SMEs'),
+        make_call(3, 'Digital skills'),
+    ])
+    scraper.sync(force_full=True)
+
+    titles = sorted(grant.title for grant in scraper.search('Tecnología', 'UE', 'Todos'))
+
+    assert titles == ['Digital skills', 'IT security for SMEs']
+
+
+def test_capped_full_sync_keeps_calls_beyond_the_last_page():
+    scraper = make_scraper([make_call(number, f'Convocatoria {number}') for number in range(1, 7)])
+    scraper.config = dict(CONFIG, max_pages=10)
+    scraper.sync(force_full=True)
+
+    # Con max_pages=2 solo se descargan las 4 primeras de las 6 convocatorias abiertas
+    scraper.config = CONFIG
+    result = scraper.sync(force_full=True)
+
+    assert result['removed'] == 0
+    assert len(scraper.search('Todos', 'UE', 'Todos')) == 6
+
+
+def test_complete_full_sync_removes_closed_calls():
+    scraper = make_scraper([make_call(number, f'Convocatoria {number}') for number in range(1, 5)])
+    scraper.sync(force_full=True)
+
+    scraper.calls = scraper.calls[:3]
+    result = scraper.sync(force_full=True)
+
+    assert result['removed'] == 1
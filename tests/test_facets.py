@@ -0,0 +1,78 @@
+from collections import Counter
+
+from scraper.facets import ANY, FACETS, FacetIndex, facet_values
+from scraper.grant import Grant
+from scraper.keywords import REGION_KEYWORDS
+
+
+def make_grant(title, location, region, **fields):
+    values = dict(title=title, description='', sector='Energía', location=location, region=region,
+                  company_type='Todos', amount='', deadline='', publication_date='', source='Prueba',
+                  link=f"https://example.org/{title}", identifier=title)
+    values.update(fields)
+    return Grant(**values)
+
+
+def test_national_program_matches_region_selection():
+    national = make_grant('nacional', 'España', 'Todas')
+    galicia = make_grant('galicia', 'España', 'Galicia')
+    european = make_grant('europea', 'Unión Europea', 'Todas')
+    index = FacetIndex(REGION_KEYWORDS)
+    index.add([national, galicia, european])
+
+    selected = index.get(index.select({'region': ['Madrid', 'Cataluña']}))
+
+    assert [grant.identifier for grant in selected] == ['nacional']
+    assert index.counts()['region'] == {'Galicia': 1}
+
+
+def test_region_multi_select_keeps_national_programs(grant_api):
+    direct = grant_api.search_grants('Todos', 'Todas', 'Todos', 'Madrid')
+    multi = grant_api.search_grants('Todos', 'Todas', 'Todos', ['Madrid', 'Cataluña'])
+
+    national = {grant.identifier for grant in direct if grant.region == 'Todas'}
+    assert national
+    assert national <= {grant.identifier for grant in multi}
+
+
+def naive_counts(grants):
+    counts = {facet: Counter() for facet in FACETS}
+    for grant in grants:
+        for facet, value in set(facet_values(grant, REGION_KEYWORDS)):
+            if value != ANY:
+                counts[facet][value] += 1
+    return {facet: dict(values) for facet, values in counts.items()}
+
+
+def test_counts_and_selection_match_a_naive_scan(grant_api):
+    grants = grant_api.search_grants('Todos', 'Todas', 'Todos', 'Todas')
+    index = FacetIndex(REGION_KEYWORDS, max_documents=len(grants) - 3)
+    index.add(grants)
+    # Los tres primeros se expulsan y sus huecos se reutilizan
+    index.add(grants[:3])
+    kept = grants[3:] + grants[:3]
+    assert len(index) == len(kept) - 3
+
+    indexed = index.get(index.live)
+    assert index.counts() == naive_counts(indexed)
+
+    subset = indexed[::2]
+    assert index.counts(index.bitmap(subset)) == naive_counts(subset)
+
+    selected = {'region': ['Madrid', 'Galicia'], 'company_type': ['PYME']}
+    expected = [grant for grant in indexed
+                if all(any((facet, value) in facet_values(grant, REGION_KEYWORDS) for value in values + [ANY])
+                       for facet, values in selected.items())]
+    assert expected
+    assert {grant.identifier for grant in index.get(index.select(selected))} == \
+        {grant.identifier for grant in expected}
+
+
+def test_comma_separated_regions_equal_repeated_parameters(client):
+    repeated = client.get('/api/search?region=Madrid&region=Cataluña').get_json()
+    separated = client.get('/api/search?region=Madrid, Cataluña,').get_json()
+
+    assert separated['search_criteria']['region'] == ['Madrid', 'Cataluña']
+    assert [grant['identifier'] for grant in separated['grants']] == \
+        [grant['identifier'] for grant in repeated['grants']]
+    assert any(grant['region'] == 'Todas' for grant in separated['grants'])
@@ -0,0 +1,40 @@
+import sqlite3
+
+from scraper.frontier import DAY, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS, CrawlFrontier
+from services.store import LocalStore
+
+URL = 'https://www.cdti.es/ayudas/1'
+NOW = 1_800_000_000.0
+
+
+def test_failed_page_waits_for_its_backoff_and_is_then_retried_first():
+    frontier = CrawlFrontier(LocalStore(':memory:'), 'cdti')
+    now = NOW
+    for failure in range(30):
+        to_fetch, _ = frontier.plan([URL], budget=1, now=now)
+        assert to_fetch == [URL]
+        frontier.record([(URL, None, None)], now=now)
+
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** failure)
+        assert frontier.plan([URL], budget=1, now=now + delay - 1)[0] == []
+        now += delay
+
+    # Tras muchos fallos la página sigue reintentándose una vez al día
+    assert delay == RETRY_MAX_SECONDS == DAY
+
+    frontier.record([(URL, b'<html></html>', {'title': 'Ayuda'})], now=now)
+    assert frontier.store.query("SELECT failures, next_attempt_at FROM crawl_frontier") == [(0, None)]
+
+
+def test_existing_database_gains_the_retry_column(tmp_path):
+    path = str(tmp_path / 'subvenciones.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE crawl_frontier (url TEXT PRIMARY KEY, source TEXT NOT NULL, "
+                           "first_seen REAL NOT NULL, last_seen REAL NOT NULL, first_fetch REAL, last_fetch REAL, "
+                           "content_hash TEXT, fetches INTEGER NOT NULL DEFAULT 0, "
+                           "changes INTEGER NOT NULL DEFAULT 0, failures INTEGER NOT NULL DEFAULT 0, details TEXT)")
+    connection.close()
+
+    frontier = CrawlFrontier(LocalStore(path), 'cdti')
+
+    assert frontier.plan([URL], budget=1, now=NOW)[0] == [URL]
@@ -0,0 +1,41 @@
+import json
+from datetime import date
+
+from scraper.grant import Grant, GrantList, grants_to_json
+
+
+def make_grant(**fields):
+    values = dict(title='Programa MOVES III', description='Movilidad eléctrica.', sector='Transporte',
+                  location='España', region='Madrid', company_type='PYME', amount='Hasta 7.000€',
+                  deadline='2030-12-31', publication_date='2026-10-01',
+                  source='IDAE - Instituto para la Diversificación y Ahorro de la Energía',
+                  link='https://www.idae.es/moves', relevance_score=6, identifier='IDAE_1')
+    values.update(fields)
+    return Grant(**values)
+
+
+def test_derived_fields_are_computed_once_at_creation():
+    grant = make_grant()
+
+    assert grant.deadline_ordinal == date(2030, 12, 31).toordinal()
+    assert grant.publication_ordinal is not None
+    assert (grant.amount_max, grant.amount_unit) == (7000.0, 'EUR')
+
+
+def test_dict_round_trip_and_json_omit_internal_ordinals():
+    grant = make_grant()
+    data = grant.to_dict()
+
+    assert 'deadline_ordinal' not in data
+    assert Grant.from_dict(data) == grant
+    assert json.loads(grants_to_json(GrantList([grant]), total=1)) == {'total': 1, 'grants': [data]}
+
+
+def test_copy_shares_no_state_with_the_original():
+    grant = make_grant()
+    clone = grant.copy()
+    clone.score = 1.0
+
+    assert grant.score is None
+    assert clone.get('title') == grant.get('title')
+    assert grant.get('missing', 'x') == 'x'
@@ -0,0 +1,30 @@
+def edit_description(grant_api, text):
+    """Cambia la descripción de la subvención más relevante en los candidatos cacheados, como tras una nueva consulta."""
+    [top] = grant_api.search_grants('Energía', 'Todas', 'Todos', 'Todas')[:1]
+    for grants, _ in grant_api.cache.entries.values():
+        for grant in grants:
+            if grant.identifier == top.identifier:
+                grant.description = text
+
+
+def test_description_change_changes_etag(client, grant_api):
+    first = client.get('/api/search?sector=Energía')
+    etag = first.headers['ETag']
+    assert client.get('/api/search?sector=Energía', headers={'If-None-Match': etag}).status_code == 304
+
+    edit_description(grant_api, 'Descripción corregida por la fuente')
+    second = client.get('/api/search?sector=Energía', headers={'If-None-Match': etag})
+
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert 'Descripción corregida por la fuente' in second.get_data(as_text=True)
+
+
+def test_description_change_renders_a_new_grant_list(client, grant_api):
+    form = {'sector': 'Energía', 'location': 'Todas', 'company_type': 'Todos', 'region': 'Todas'}
+    assert client.post('/search_grants', data=form).status_code == 200
+
+    edit_description(grant_api, 'Descripción corregida por la fuente')
+    page = client.post('/search_grants', data=form).get_data(as_text=True)
+
+    assert 'Descripción corregida por la fuente' in page
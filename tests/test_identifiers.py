@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+from scraper.grant import stable_identifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRANT = ('IDAE', 'https://www.idae.es/ayudas/autoconsumo/?utm_source=boletin#plazos', 'Programa de Autoconsumo')
+SCRIPT = "from scraper.grant import stable_identifier; print(stable_identifier(%r, %r, %r))" % GRANT
+
+
+def test_identifier_is_the_same_in_other_processes():
+    identifiers = set()
+    for seed in ('0', '1', 'random'):
+        # Otro intérprete, con otra semilla de hash(): como tras un reinicio o en otro worker
+        output = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True,
+                                env=dict(os.environ, PYTHONHASHSEED=seed)).stdout
+        identifiers.add(output.strip())
+
+    assert identifiers == {stable_identifier(*GRANT)}
+
+
+def test_identifier_ignores_link_and_title_noise():
+    assert stable_identifier('IDAE', 'HTTPS://www.IDAE.es/ayudas/autoconsumo', 'programa de autoconsumo ') == \
+        stable_identifier(*GRANT)
+    assert stable_identifier('BOE', GRANT[1], GRANT[2]) != stable_identifier(*GRANT)
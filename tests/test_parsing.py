@@ -0,0 +1,72 @@
+import logging
+
+import pytest
+
+from benchmarks.common import load_fixture
+from scraper.keywords import REGION_KEYWORDS
+from scraper.web import parsing
+from scraper.web.cdti import CdtiScraper
+from scraper.web.idae import IdaeScraper
+from services.store import LocalStore
+
+PAGES = [('cdti', 'parse_links', 'cdti_section.html', ()),
+         ('cdti', 'parse_detail', 'cdti_detail.html', ('Programa Misiones',)),
+         ('idae', 'parse_links', 'idae_section.html', ()),
+         ('idae', 'parse_detail', 'idae_detail.html', ('Programa MOVES III',))]
+
+
+@pytest.fixture
+def scrapers(tmp_path):
+    store = LocalStore(str(tmp_path / 'parse.db'))
+    logger = logging.getLogger('tests')
+    return {'cdti': CdtiScraper(None, {}, REGION_KEYWORDS, logger, store),
+            'idae': IdaeScraper(None, {}, REGION_KEYWORDS, logger, store)}
+
+
+@pytest.fixture
+def parse_pool(monkeypatch):
+    monkeypatch.setenv('PARSE_WORKERS', '1')
+    monkeypatch.setattr(parsing, '_pool', None)
+    yield
+    if parsing._pool is not None:
+        parsing._pool.shutdown()
+
+
+def test_pool_results_equal_inline_parsing(scrapers, parse_pool):
+    for source, extractor, fixture, args in PAGES:
+        content = load_fixture(fixture)
+        inline = getattr(scrapers[source], extractor)(content, *args)
+
+        pooled = parsing.submit(scrapers[source], source, extractor, content, *args).result(timeout=60)
+
+        assert parsing._pool is not None
+        assert pooled and pooled == inline, (source, extractor)
+
+
+def test_identical_html_is_served_from_the_cache(scrapers, monkeypatch):
+    scraper = scrapers['idae']
+    content = load_fixture('idae_detail.html')
+    first = parsing.submit(scraper, 'idae', 'parse_detail', content, 'Programa MOVES III').result()
+
+    def fail(*args):
+        raise AssertionError('el extractor no debería ejecutarse')
+
+    monkeypatch.setattr(scraper, 'parse_detail', fail)
+    assert parsing.submit(scraper, 'idae', 'parse_detail', content, 'Programa MOVES III').result() == first
+    # Otros argumentos u otro HTML sí se extraen
+    with pytest.raises(AssertionError):
+        parsing.submit(scraper, 'idae', 'parse_detail', content, 'Otro título').result()
+    with pytest.raises(AssertionError):
+        parsing.submit(scraper, 'idae', 'parse_detail', content + b' ', 'Programa MOVES III').result()
+
+
+def test_version_bump_prunes_only_that_extractor(scrapers):
+    for source, extractor, fixture, args in PAGES:
+        parsing.submit(scrapers[source], source, extractor, load_fixture(fixture), *args).result()
+    cache = scrapers['cdti'].parse_cache
+
+    removed = cache.prune('cdti', dict(CdtiScraper.EXTRACTOR_VERSIONS, parse_detail=2))
+
+    assert removed == 1
+    rows = cache.store.query("SELECT source, extractor FROM parse_cache ORDER BY source, extractor")
+    assert rows == [('cdti', 'parse_links'), ('idae', 'parse_detail'), ('idae', 'parse_links')]
@@ -0,0 +1,27 @@
+import sys
+import types
+
+from utils.profiling import profiled
+
+
+def _profiled_call():
+    return profiled('prueba')(lambda: 'ok')()
+
+
+def test_sampled_call_writes_a_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('PROFILE_SAMPLE_RATE', '1')
+
+    assert _profiled_call() == 'ok'
+    assert len(list(tmp_path.glob('*.pstats'))) == 1
+
+
+def test_no_profile_under_gevent(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('PROFILE_SAMPLE_RATE', '1')
+    # Igual que tras monkey.patch_all(): los hilos son greenlets que comparten el hilo del perfilador
+    monkeypatch.setitem(sys.modules, 'gevent.monkey',
+                        types.SimpleNamespace(is_module_patched=lambda module: module == 'threading'))
+
+    assert _profiled_call() == 'ok'
+    assert not list(tmp_path.glob('*.pstats'))
@@ -0,0 +1,39 @@
+from scraper.query_cache import QueryCache
+
+
+NARROWER = [
+    ('Energía', 'Todas', 'Todos', 'Todas'),
+    ('Tecnología', 'UE', 'Todos', 'Todas'),
+    ('Todos', 'España', 'PYME', 'Galicia'),
+]
+
+
+def identifiers(grants):
+    # El orden puede variar: las estadísticas BM25 se acumulan sobre todo el catálogo ya visto
+    return sorted(grant.identifier for grant in grants)
+
+
+def test_canonical_key_folds_case_accents_and_wildcards():
+    cache = QueryCache(['Madrid'])
+    assert cache.canonical('energia', '', 'todos', 'madrid') == ('Energía', 'España', 'Todos', 'Madrid')
+
+
+def test_cached_wildcard_search_does_not_change_narrow_results(grant_api):
+    direct = grant_api.search_grants('Energía', 'Todas', 'Todos', 'Todas')
+
+    grant_api.cache.clear()
+    grant_api.search_grants('Todos', 'Todas', 'Todos', 'Todas')
+    after_wildcard = grant_api.search_grants('Energía', 'Todas', 'Todos', 'Todas')
+
+    assert direct
+    assert identifiers(after_wildcard) == identifiers(direct)
+
+
+def test_narrower_search_is_filtered_from_the_cached_broader_one(grant_api, fresh_grant_api, snapshot_calls):
+    grant_api.search_grants('Todos', 'Todas', 'Todos', 'Todas')
+    narrower = {criteria: grant_api.search_grants(*criteria) for criteria in NARROWER}
+
+    # Una sola consulta a cada fuente: las búsquedas más estrechas se filtran de su resultado sin recortar
+    assert snapshot_calls == {'boe': 1, 'eu_funding': 1, 'cdti': 1, 'idae': 1}
+    for criteria, results in narrower.items():
+        assert identifiers(results) == identifiers(fresh_grant_api.search_grants(*criteria)), criteria
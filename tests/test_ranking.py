@@ -0,0 +1,41 @@
+import random
+
+from scraper.grant import Grant
+from scraper.ranking import Ranker
+
+WORDS = ['energía', 'solar', 'eficiencia', 'industria', 'digital', 'pyme', 'hidrógeno', 'movilidad', 'agua', 'empleo']
+
+
+def make_grants(count):
+    rng = random.Random(3)
+    return [Grant(title=' '.join(rng.choices(WORDS, k=4)), description=' '.join(rng.choices(WORDS, k=12)),
+                  sector='Todos', location='España', region='Todas', company_type='Todos',
+                  amount='Consultar convocatoria', deadline='2030-01-31',
+                  publication_date=f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}",
+                  source='BOE - Boletín Oficial del Estado', link=f"https://www.boe.es/{i}",
+                  relevance_score=rng.randint(1, 10), identifier=f"BOE_{i}") for i in range(count)]
+
+
+def test_heap_top_k_matches_a_full_sort():
+    ranker = Ranker(recency_weight=0.2, urgency_weight=0.1)
+    grants = make_grants(300)
+    terms = ranker.query_terms(sector='Energía', text='solar eficiencia')
+
+    everything = ranker.rank(grants, terms, k=len(grants))
+    top = ranker.rank(grants, terms, k=25)
+
+    full_sort = sorted(everything, key=lambda grant: (grant.score, grant.publication_ordinal), reverse=True)
+    assert [(grant.identifier, grant.score) for grant in top] == \
+        [(grant.identifier, grant.score) for grant in full_sort[:25]]
+    assert top[0].score > top[-1].score
+
+
+def test_rank_scores_copies_and_leaves_the_candidates_untouched():
+    ranker = Ranker()
+    grants = make_grants(10)
+
+    ranked = ranker.rank(grants, ranker.query_terms(text='hidrógeno'), k=3)
+
+    assert len(ranked) == 3
+    assert all(grant.score is None for grant in grants)
+    assert not {id(grant) for grant in ranked} & {id(grant) for grant in grants}
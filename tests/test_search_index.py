@@ -0,0 +1,44 @@
+from scraper.grant import Grant
+from scraper.search_index import SearchIndex
+
+
+def make_grant(identifier, title, description=''):
+    return Grant(title=title, description=description, sector='Todos', location='España', region='Todas',
+                 company_type='Todos', amount='Consultar convocatoria', deadline='2030-01-31',
+                 publication_date='2026-10-01', source='IDAE - Instituto para la Diversificación y Ahorro de la Energía',
+                 link=f"https://www.idae.es/{identifier}", identifier=identifier)
+
+
+def build_index():
+    index = SearchIndex()
+    index.add([
+        make_grant('energia', 'Ayudas a la eficiencia en energía renovable'),
+        make_grant('agua', 'Subvenciones para la depuración de agua', 'Energías limpias en depuradoras'),
+        make_grant('empleo', 'Programa de empleo joven'),
+    ])
+    return index
+
+
+def test_accents_and_plurals_do_not_matter():
+    index = build_index()
+
+    for query in ('energia', 'ENERGÍAS', 'energía'):
+        matches, _ = index.search(query)
+        assert matches == {'energia', 'agua'}, query
+
+
+def test_typos_find_the_closest_indexed_term():
+    index = build_index()
+
+    matches, terms = index.search('enrgía')
+
+    assert matches == {'energia', 'agua'}
+    assert 'energi' in terms
+    assert index.search('eficiencai renovable')[0] == {'energia'}
+
+
+def test_every_term_must_match_and_stopwords_alone_match_nothing():
+    index = build_index()
+
+    assert index.search('energía empleo')[0] == set()
+    assert index.search('de la para') == (None, [])
@@ -0,0 +1,16 @@
+import json
+
+from utils.tracing import span
+
+
+def test_slow_searches_are_logged_under_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('SLOW_SEARCH_LOG', raising=False)
+    monkeypatch.setenv('SLOW_SEARCH_SECONDS', '0.000001')
+
+    with span('búsqueda', root=True):
+        with span('fuente'):
+            pass
+
+    lines = (tmp_path / 'traces' / 'slow_searches.jsonl').read_text().splitlines()
+    assert [json.loads(line)['name'] for line in lines] == ['búsqueda']
@@ -0,0 +1,36 @@
+import gc
+
+import pytest
+
+from services.container import ServiceContainer, parse_warm_up_searches
+
+
+def test_parse_warm_up_searches_fills_wildcards_and_keeps_the_search_without_filters():
+    searches = parse_warm_up_searches('Energía; |Todas|Pyme|Madrid ;*;Todos|*|Todos|Todas;')
+
+    assert searches == [('Energía', 'Todas', 'Todos', 'Todas'), ('Todos', 'Todas', 'Pyme', 'Madrid'),
+                        ('Todos', 'Todas', 'Todos', 'Todas')]
+
+
+def test_warm_up_before_fork_fills_the_cache_and_freezes_it(grant_api, monkeypatch):
+    frozen = []
+    monkeypatch.setattr(gc, 'freeze', lambda: frozen.append(True))
+
+    ServiceContainer(grant_api).warm_up(parse_warm_up_searches('*'), freeze=True)
+
+    assert frozen == [True]
+    monkeypatch.setattr(grant_api, '_fetch_snapshots', _unexpected_fetch)
+    assert grant_api.search_grants('Energía', 'Todas', 'Todos', 'Todas')
+
+
+def test_warm_up_in_background_caches_the_exact_search(grant_api, monkeypatch):
+    services = ServiceContainer(grant_api)
+    thread = services.warm_up_in_background([('Energía', 'Todas', 'Todos', 'Todas')])
+    thread.join()
+
+    monkeypatch.setattr(grant_api, '_fetch_candidates', _unexpected_fetch)
+    assert grant_api.search_grants('Energía', 'Todas', 'Todos', 'Todas')
+
+
+def _unexpected_fetch(*args):
+    pytest.fail('la búsqueda precalentada volvió a consultar las fuentes')
@@ -0,0 +1,43 @@
+import datetime
+import functools
+from typing import Optional
+
+ISO_FORMAT = "%Y-%m-%d"
+DISPLAY_FORMAT = "%d/%m/%Y"
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_iso(date_string: str) -> Optional[int]:
+    try:
+        return datetime.datetime.strptime(date_string, ISO_FORMAT).toordinal()
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_iso(date_string: str) -> str:
+    ordinal = _parse_iso(date_string)
+    if ordinal is None:
+        return date_string
+    return datetime.date.fromordinal(ordinal).strftime(DISPLAY_FORMAT)
+
+
+def parse_date_ordinal(date_string) -> Optional[int]:
+    """Convierte 'YYYY-MM-DD' en ordinal de fecha; None si no es una fecha válida."""
+    return _parse_iso(date_string) if isinstance(date_string, str) else None
+
+
+def format_date_string(date_string):
+    """Formatea 'YYYY-MM-DD' como 'DD/MM/YYYY'; devuelve el valor original si no es una fecha."""
+    return _format_iso(date_string) if isinstance(date_string, str) else date_string
+
+
+def reference_day(now: datetime.datetime = None):
+    """
+    Devuelve (ordinal de hoy, desfase) para calcular días restantes con aritmética
+    entera. El desfase reproduce `(deadline - now).days`: si ya ha pasado la
+    medianoche, el día en curso no cuenta completo.
+    """
+    now = now or datetime.datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return now.toordinal(), 1 if now > midnight else 0
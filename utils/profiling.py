@@ -0,0 +1,137 @@
+import cProfile
+import datetime
+import functools
+import hmac
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# Configuración por variables de entorno:
+#   PROFILE_TOKEN        token que habilita el perfilado bajo demanda (cabecera X-Profile-Token o ?profile=<token>)
+#   PROFILE_SAMPLE_RATE  fracción de llamadas perfiladas aleatoriamente (0.0 desactiva el muestreo)
+#   PROFILE_DIR          directorio donde se guardan los informes .pstats
+#   PROFILE_TOP_FRAMES   número de funciones más lentas resumidas en el log
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_QUERY_PARAM = 'profile'
+
+logger = logging.getLogger(__name__)
+_state = threading.local()
+
+# Categorías para resumir en qué se va el tiempo propio (tottime) de cada función
+_CATEGORIES = (
+    ('pausas', ('time.sleep',)),
+    ('http', ('socket', 'ssl', 'urllib3', 'http/client', 'requests/')),
+    ('parseo_html', ('bs4/', 'html/parser', 'soupsieve', 'lxml')),
+    ('regex', ("re.Pattern", '_sre', 're/__init__', 're/_', 'sre_')),
+)
+
+
+def _profile_dir() -> str:
+    return os.environ.get('PROFILE_DIR', 'profiles')
+
+
+def _gevent_active() -> bool:
+    """Con gevent, cProfile mezclaría en un mismo perfil todas las peticiones del hilo."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def _requested_by_user() -> bool:
+    """El perfilado se pide con el token configurado, nunca sin él."""
+    from flask import has_request_context, request
+
+    token = os.environ.get('PROFILE_TOKEN')
+    if not token or not has_request_context():
+        return False
+    supplied = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_PARAM)
+    return bool(supplied) and hmac.compare_digest(supplied, token)
+
+
+def _sampled() -> bool:
+    try:
+        rate = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+    except ValueError:
+        return False
+    return rate > 0 and random.random() < rate
+
+
+def _category(filename: str, funcname: str) -> str:
+    location = f"{filename}:{funcname}".replace('\\', '/')
+    for category, markers in _CATEGORIES:
+        if any(marker in location for marker in markers):
+            return category
+    return 'otros'
+
+
+def summarize_stats(stats: pstats.Stats, top: int = 10) -> Tuple[Dict[str, float], List[str]]:
+    """Devuelve el tiempo propio por categoría y las funciones con mayor tiempo acumulado."""
+    categories: Dict[str, float] = {}
+    frames = []
+    for (filename, line, funcname), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        category = _category(filename, funcname)
+        categories[category] = categories.get(category, 0.0) + tottime
+        frames.append((cumtime, tottime, ncalls, f"{os.path.basename(filename)}:{line}({funcname})"))
+
+    frames.sort(reverse=True)
+    lines = [
+        f"{cumtime:8.3f}s acum. {tottime:8.3f}s propio {ncalls:7d} llamadas  {location}"
+        for cumtime, tottime, ncalls, location in frames[:top]
+    ]
+    return categories, lines
+
+
+def _save_report(name: str, profiler: cProfile.Profile, elapsed: float):
+    directory = _profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    path = os.path.join(directory, f"{timestamp}_{name.replace('/', '_')}_{os.getpid()}.pstats")
+    profiler.dump_stats(path)
+
+    top = int(os.environ.get('PROFILE_TOP_FRAMES', '10'))
+    categories, lines = summarize_stats(pstats.Stats(profiler), top)
+    breakdown = ', '.join(f"{category} {seconds:.2f}s" for category, seconds in
+                          sorted(categories.items(), key=lambda item: item[1], reverse=True))
+    logger.info(f"Perfil de '{name}' ({elapsed:.2f}s) guardado en {path} - {breakdown}")
+    for line in lines:
+        logger.info(f"  {line}")
+
+
+def profiled(name: str):
+    """
+    Decorador que perfila la llamada con cProfile si la petición trae el token
+    de perfilado o si cae en la tasa de muestreo. Las llamadas anidadas dentro
+    de una llamada ya perfilada no abren un segundo perfil. No perfila nada
+    con los workers de gevent.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if (getattr(_state, 'active', False) or _gevent_active()
+                    or not (_requested_by_user() or _sampled())):
+                return func(*args, **kwargs)
+
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Otro perfilador ya está activo en el intérprete
+                return func(*args, **kwargs)
+
+            _state.active = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                _state.active = False
+                try:
+                    _save_report(name, profiler, time.perf_counter() - start)
+                except Exception as e:
+                    logger.error(f"Error guardando el perfil de '{name}': {e}")
+        return wrapper
+    return decorator
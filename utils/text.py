@@ -0,0 +1,56 @@
+import functools
+import re
+import unicodedata
+from typing import List
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+# Palabras vacías del español (ya sin acentos)
+STOPWORDS = frozenset([
+    'a', 'al', 'ante', 'como', 'con', 'de', 'del', 'desde', 'e', 'el', 'en', 'entre', 'es', 'esta', 'este',
+    'la', 'las', 'le', 'les', 'lo', 'los', 'mas', 'o', 'para', 'por', 'que', 'se', 'sin', 'sobre', 'su',
+    'sus', 'u', 'un', 'una', 'unas', 'unos', 'y',
+])
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin acentos ni signos de puntuación y con espacios simples."""
+    text = text.lower()
+    if not text.isascii():
+        # Las marcas diacríticas quedan separadas tras NFKD y desaparecen al pasar a ASCII
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM_RE.sub(' ', text).strip()
+
+
+def tokenize(text) -> List[str]:
+    """Palabras normalizadas de un texto; lista vacía si no es una cadena."""
+    if not isinstance(text, str):
+        return []
+    return normalize_text(text).split()
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """
+    Raíz ligera en español de una palabra normalizada: quita el plural y la
+    vocal final de género ("energías", "energía" -> "energi"; "luces" -> "luz").
+    """
+    if len(token) < 4 or token.isdigit():
+        return token
+    if token.endswith('s'):
+        if token.endswith('eses'):
+            return token[:-2]
+        if token.endswith('ces'):
+            return token[:-3] + 'z'
+        if token[-2] in 'aeo':
+            return token[:-2]
+        return token[:-1]
+    if token[-1] in 'aeo':
+        return token[:-1]
+    return token
+
+
+def analyze(text) -> List[str]:
+    """Términos de búsqueda de un texto: raíces de las palabras normalizadas sin palabras vacías ni letras sueltas."""
+    return [stem(token) for token in tokenize(text) if len(token) > 1 and token not in STOPWORDS]
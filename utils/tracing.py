@@ -0,0 +1,230 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from services.store import DEFAULT_DATA_DIR
+
+# Configuración por variables de entorno:
+#   TRACE_FILE            fichero JSON lines donde se exportan todos los spans (vacío desactiva la exportación)
+#   SLOW_SEARCH_SECONDS   duración a partir de la cual una búsqueda se guarda entera en el log de lentas
+#   SLOW_SEARCH_LOG       fichero JSON lines con el árbol de spans de cada búsqueda lenta (por defecto en DATA_DIR/traces)
+#
+# Los spans siguen el modelo de datos de OpenTelemetry (trace_id de 16 bytes,
+# span_id de 8, padre, tiempos en nanosegundos Unix, atributos y estado). Solo
+# se registran dentro de una traza abierta por un punto de entrada (root=True):
+# las rutas y RealGrantAPI.search_grants; fuera de ella los spans no cuestan nada.
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+_write_lock = threading.Lock()
+
+
+class _Trace:
+    """Spans terminados de una traza, hasta que termina su span raíz."""
+
+    __slots__ = ('trace_id', 'spans', 'lock')
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List['Span'] = []
+        self.lock = threading.Lock()
+
+    def add(self, span: 'Span') -> None:
+        with self.lock:
+            self.spans.append(span)
+
+
+class Span:
+    __slots__ = ('name', 'trace', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'status', 'error')
+
+    def __init__(self, name: str, trace: _Trace, parent: Optional['Span'], attributes: Dict):
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = 'OK'
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace.trace_id, 'span_id': self.span_id, 'parent_span_id': self.parent_id,
+            'name': self.name, 'start_time_unix_nano': self.start_ns, 'end_time_unix_nano': self.end_ns,
+            'duration_ms': round(self.duration_ms, 3), 'attributes': self.attributes,
+            'status': {'code': self.status, 'message': self.error},
+        }
+
+
+class _NoopSpan:
+    """Span de las operaciones que no forman parte de ninguna traza."""
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """Span activo en este contexto (o un span vacío si no hay traza)."""
+    return _current.get() or NOOP_SPAN
+
+
+@contextlib.contextmanager
+def span(name: str, root: bool = False, **attributes):
+    """
+    Abre un span hijo del activo. Con root=True y sin traza en curso abre una
+    traza nueva, que al cerrarse se exporta y, si es lenta, se guarda completa.
+    """
+    parent = _current.get()
+    if parent is None and not root:
+        yield NOOP_SPAN
+        return
+    trace = parent.trace if parent else _Trace()
+    current = Span(name, trace, parent, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'ERROR'
+        current.error = str(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+        trace.add(current)
+        if parent is None:
+            _finish(trace, current)
+
+
+def record_span(name: str, parent, start_ns: int, end_ns: int, **attributes) -> None:
+    """Registra un span ya medido (p. ej. en otro proceso) como hijo de parent."""
+    if not isinstance(parent, Span):
+        return
+    finished = Span(name, parent.trace, parent, attributes)
+    finished.start_ns, finished.end_ns = start_ns, end_ns
+    parent.trace.add(finished)
+
+
+def traced(name: str, root: bool = False):
+    """Decorador que ejecuta la función dentro de un span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, root=root):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_current_trace(func):
+    """Envuelve func para que, ejecutada en otro hilo (p. ej. un ThreadPoolExecutor), siga en la traza actual."""
+    parent = _current.get()
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+class TracedSession(requests.Session):
+    """Sesión de requests que registra cada petición HTTP como un span."""
+
+    def request(self, method, url, *args, **kwargs):
+        with span('http.fetch', **{'http.method': method, 'http.url': url}) as current:
+            response = super().request(method, url, *args, **kwargs)
+            current.set_attribute('http.status_code', response.status_code)
+            current.set_attribute('http.response_content_length', len(response.content))
+            return response
+
+
+def _append_lines(path: str, lines: List[str]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _write_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+
+
+def span_tree(spans: List[Span], root: Span) -> Dict:
+    """Árbol anidado de spans a partir del raíz, hijos en orden de inicio."""
+    children: Dict[str, List[Span]] = {}
+    for item in spans:
+        children.setdefault(item.parent_id, []).append(item)
+
+    def node(item: Span) -> Dict:
+        data = {'name': item.name, 'span_id': item.span_id, 'duration_ms': round(item.duration_ms, 3),
+                'attributes': item.attributes, 'status': item.status}
+        if item.error:
+            data['error'] = item.error
+        kids = sorted(children.get(item.span_id, []), key=lambda kid: kid.start_ns)
+        if kids:
+            data['children'] = [node(kid) for kid in kids]
+        return data
+
+    return node(root)
+
+
+def _slow_search_log() -> str:
+    """Por defecto junto a los demás datos persistentes, en DATA_DIR."""
+    default = os.path.join(os.environ.get('DATA_DIR', DEFAULT_DATA_DIR), 'traces', 'slow_searches.jsonl')
+    return os.environ.get('SLOW_SEARCH_LOG', default)
+
+
+def _slow_threshold() -> float:
+    try:
+        return float(os.environ.get('SLOW_SEARCH_SECONDS', '10'))
+    except ValueError:
+        return 10.0
+
+
+def _finish(trace: _Trace, root: Span) -> None:
+    try:
+        with trace.lock:
+            spans = list(trace.spans)
+        export_path = os.environ.get('TRACE_FILE', '')
+        if export_path:
+            _append_lines(export_path, [json.dumps(item.to_dict(), ensure_ascii=False, default=str) for item in spans])
+
+        threshold = _slow_threshold()
+        if threshold > 0 and root.duration_ms >= threshold * 1000:
+            tree = span_tree(spans, root)
+            record = {'trace_id': trace.trace_id, 'name': root.name, 'start_time_unix_nano': root.start_ns,
+                      'duration_ms': round(root.duration_ms, 3), 'spans': len(spans), 'tree': tree}
+            _append_lines(_slow_search_log(), [json.dumps(record, ensure_ascii=False, default=str)])
+            # Tiempo por tipo de span (suma de todos los del mismo nombre)
+            totals: Dict[str, List[float]] = {}
+            for item in spans:
+                if item is not root:
+                    totals.setdefault(item.name, []).append(item.duration_ms)
+            breakdown = ', '.join(f"{name} {sum(times) / 1000:.2f}s ({len(times)})" for name, times in
+                                  sorted(totals.items(), key=lambda entry: sum(entry[1]), reverse=True)[:6])
+            logger.warning(f"Búsqueda lenta '{root.name}' ({root.duration_ms / 1000:.2f}s, "
+                           f"traza {trace.trace_id}, {len(spans)} spans) - {breakdown}")
+    except Exception as e:
+        logger.error(f"Error exportando la traza {trace.trace_id}: {e}")
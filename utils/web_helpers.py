@@ -1,5 +1,26 @@
 import datetime
+import gzip
 import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Union
+
+from flask import request
+
+from scraper.amounts import format_amount_text
+from scraper.grant import Grant
+from utils.dates import format_date_string, parse_date_ordinal, reference_day
+
+# Detectar disponibilidad de Brotli (si no, solo gzip)
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Respuestas que se comprimen y tamaño mínimo a partir del cual compensa
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html')
+MIN_COMPRESS_SIZE = 500
 
 def register_template_filters(app):
     """Registra los filtros de Jinja2 en la aplicación Flask."""
@@ -7,30 +28,86 @@ def register_template_filters(app):
     app.jinja_env.filters['days_remaining'] = days_remaining_filter
     app.jinja_env.filters['format_amount'] = format_amount_filter
     app.jinja_env.filters['truncate_smart'] = truncate_smart_filter
+    app.jinja_env.filters['criteria_label'] = criteria_label
+
+def register_compression(app):
+    """Comprime con Brotli o gzip las respuestas JSON y HTML según Accept-Encoding."""
+    app.after_request(compress_response)
+
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    encoding = 'br' if BROTLI_AVAILABLE and accepted['br'] else 'gzip' if accepted['gzip'] else None
+    data = response.get_data()
+    if encoding is None or len(data) < MIN_COMPRESS_SIZE:
+        return response
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    # Cada codificación es una representación distinta: su ETag fuerte también
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+def matching_etag(etag: str) -> Optional[str]:
+    """La variante del ETag (sin comprimir, gzip o br) que el cliente ya tiene, o None."""
+    if_none_match = request.if_none_match
+    for variant in (etag, f"{etag}-br", f"{etag}-gzip"):
+        if if_none_match.contains(variant):
+            return variant
+    return None
+
+def multi_value(values: List[str], default: str) -> Union[str, List[str]]:
+    """
+    Valor de un parámetro de selección múltiple (repetido o separado por
+    comas): el valor por defecto, el único valor o la lista.
+    """
+    values = list(dict.fromkeys(item.strip() for value in values for item in value.split(',') if item.strip()))
+    if not values:
+        return default
+    return values[0] if len(values) == 1 else values
+
+def criteria_label(value) -> str:
+    """Texto de un criterio de búsqueda de uno o varios valores."""
+    return ', '.join(value) if isinstance(value, (list, tuple)) else value
 
 def datetime_filter(date_string):
     try:
-        date_obj = datetime.datetime.strptime(date_string, "%Y-%m-%d") if isinstance(date_string, str) else date_string
-        return date_obj.strftime("%d/%m/%Y")
+        if isinstance(date_string, str):
+            return format_date_string(date_string)
+        return date_string.strftime("%d/%m/%Y")
     except Exception:
         return date_string
 
 def days_remaining_filter(deadline_string):
     try:
-        deadline = datetime.datetime.strptime(deadline_string, "%Y-%m-%d") if isinstance(deadline_string, str) else deadline_string
-        days = (deadline - datetime.datetime.now()).days
+        # Las subvenciones procesadas ya traen los días restantes calculados
+        if isinstance(deadline_string, Grant):
+            return deadline_string.days_remaining
+        if isinstance(deadline_string, str):
+            ordinal = parse_date_ordinal(deadline_string)
+            if ordinal is None:
+                return 0
+            today, offset = reference_day()
+            return max(0, ordinal - today - offset)
+        days = (deadline_string - datetime.datetime.now()).days
         return max(0, days)
     except Exception:
         return 0
 
 def format_amount_filter(amount_string):
     try:
+        if isinstance(amount_string, Grant):
+            amount_string = amount_string.amount
         if isinstance(amount_string, str):
-            numbers = re.findall(r'[\d.,]+', amount_string)
-            if numbers:
-                number = numbers[0].replace(',', '')
-                formatted = f"{float(number):,.2f}".replace(',', ' ') if '.' in number else f"{int(number):,}".replace(',', ' ')
-                return amount_string.replace(numbers[0], formatted)
+            # Formato cacheado por texto: los mismos importes no se reanalizan en cada render
+            return format_amount_text(amount_string)
         return amount_string
     except Exception:
         return amount_string
@@ -43,4 +120,29 @@ def truncate_smart_filter(text, length=150):
         last_space = truncated.rfind(' ')
         return truncated[:last_space] + '...' if last_space > length * 0.8 else truncated + '...'
     except Exception:
-        return text
\ No newline at end of file
+        return text
+
+class FragmentCache:
+    """
+    Cache LRU de fragmentos HTML ya renderizados. La clave debe incluir todo lo
+    que cambia el resultado (versión de los datos, día de referencia...).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+        # Se renderiza fuera del cerrojo: dos peticiones simultáneas como mucho repiten el trabajo
+        html = render()
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html